@@ -0,0 +1,203 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import argparse
+import datetime
+import ipaddress
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)  # run as a script or with python -m benchmarks.load_harness, from a checkout
+
+from benchmarks import stand_ins  # noqa: E402
+
+TEST_DATA = os.path.join(REPO_DIR, "test-data")
+
+SCENARIOS = ("verify_ip", "verify_ip_bulk", "verify_domain", "web_services")
+INPUTS = {"verify_ip": "1000-ips.txt", "verify_ip_bulk": "1000-ips.txt", "verify_domain": "1000-domains.txt",
+          "web_services": "1000-ips.txt"}
+
+
+def read_lines(path):
+    with open(path) as input_file:
+        return [line.strip() for line in input_file if line.strip()]
+
+
+def loopback_scope(entries, path):
+    """ Writes the IPv4 entries moved into 127.0.0.0/8 (a.b.c.d -> 127.b.c.d) to path, so web_services probes the
+    HTTP stand-in instead of the real hosts
+    """
+
+    with open(path, "w") as scope:
+        for entry in entries:
+            try:
+                address = ipaddress.IPv4Address(entry)
+            except ValueError:
+                continue
+            scope.write(str(ipaddress.IPv4Address((127 << 24) | (int(address) & 0xFFFFFF))) + "\n")
+    return path
+
+
+def run_recon(arguments, workdir, env, log_path):
+    """ Runs the recon entry point to the end in workdir. Returns (seconds, peak RSS in MB, exit code) """
+
+    with open(log_path, "w") as log:
+        started = time.monotonic()
+        process = subprocess.Popen([sys.executable, "-m", "recon.recon"] + arguments, cwd=workdir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        pid, status, usage = os.wait4(process.pid, 0)
+        seconds = time.monotonic() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return seconds, usage.ru_maxrss / 1024, process.returncode  # ru_maxrss is in KB on Linux
+
+
+def scenario_arguments(scenario, scope_path, args, ports):
+    if scenario == "verify_ip_bulk":
+        return ["LOAD-BULK", "verify_ip", "-f", scope_path, "--bulk", "--bulk-server", f"127.0.0.1:{ports['bulk']}",
+                "--no-cache", "--dns-server", f"127.0.0.1:{ports['dns']}"]
+
+    arguments = ["LOAD", scenario, "-f", scope_path]
+    if scenario == "web_services":
+        arguments += ["--http-port", str(ports["http"]), "-c", str(args.concurrency), "--timeout", str(args.timeout)]
+        if ports["https"]:
+            arguments += ["--https-port", str(ports["https"])]
+        return arguments
+
+    arguments += ["-w", str(args.workers), "--no-cache", "--dns-server", f"127.0.0.1:{ports['dns']}"]
+    if args.backend == "native":
+        arguments += ["--backend", "native", "--whois-server", f"127.0.0.1:{ports['whois']}",
+                      "--whois-timeout", str(args.timeout)]
+    return arguments
+
+
+def report_line(result):
+    return (f"{result['scenario']:<15}{result['backend']:<8}{result['items']:>7}{result['seconds']:>10.2f}"
+            f"{result['items_per_second']:>11.1f}{result['peak_rss_mb']:>10.1f}{result['whois_subprocesses']:>8}"
+            f"{result['whois_queries']:>8}{result['dns_queries']:>8}{result['http_requests']:>8}"
+            f"{result['exit_code']:>6}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs recon against local whois, DNS and HTTP stand-ins and "
+                                                 "reports its throughput", prog="load_harness")
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f'Commands to run: {", ".join(SCENARIOS)} (default: all)')
+    parser.add_argument('--backend', choices=['system', 'native'], default='system',
+                        help='system puts a fake whois binary first on PATH, native points --whois-server at the '
+                             'stand-in (default: system)')
+    parser.add_argument('--limit', type=int, help='Only use the first LIMIT lines of each input file')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='recon -w (default: 8)')
+    parser.add_argument('-c', '--concurrency', type=int, default=50, help='web_services -c (default: 50)')
+    parser.add_argument('--timeout', type=float, default=2.0,
+                        help='web_services --timeout and native --whois-timeout (default: 2)')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Stand-in answer latency (default: 20)')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Random latency added (default: 10)')
+    parser.add_argument('--hang-rate', type=float, default=0.0,
+                        help='Share of queries the stand-ins never answer (default: 0)')
+    parser.add_argument('--throttle-every', type=int, default=0,
+                        help='Every n-th whois query gets a rate limit notice (default: 0, never)')
+    parser.add_argument('--a-records', type=int, default=2, help='A records per resolving name (default: 2)')
+    parser.add_argument('--nx-rate', type=float, default=0.05, help='Share of names that do not exist '
+                                                                     '(default: 0.05)')
+    parser.add_argument('--recon-args', default='',
+                        help='Extra arguments for the verify_ip(_bulk) and verify_domain runs, e.g. "--whois-rate 0"')
+    parser.add_argument('--web-args', default='',
+                        help='Extra arguments for the web_services run, e.g. "--connect-timeout 0"')
+    parser.add_argument('--results', default='load-results.jsonl',
+                        help='JSON lines file every result is appended to, to compare runs (default: '
+                             'load-results.jsonl)')
+    parser.add_argument('--keep', action='store_true', help='Keep the work directory with the recon output and logs')
+    args = parser.parse_args(argv)
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f"unknown scenario {scenario}, choose from {', '.join(SCENARIOS)}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+
+    behaviour = stand_ins.Behaviour(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                                    hang_rate=args.hang_rate, throttle_every=args.throttle_every)
+    workdir = tempfile.mkdtemp(prefix="recon-load-")
+
+    whois = stand_ins.WhoisStandIn(behaviour)
+    bulk = stand_ins.BulkWhoisStandIn(behaviour)
+    dns_server = stand_ins.DnsStandIn(behaviour, a_records=args.a_records, nx_rate=args.nx_rate)
+    http = stand_ins.HttpStandIn(behaviour, stand_ins.self_signed_context(workdir)).start()
+    ports = {"whois": stand_ins.serve(whois), "bulk": stand_ins.serve(bulk), "dns": stand_ins.serve(dns_server),
+             "http": http.http_port, "https": http.https_port}
+
+    whois_log = os.path.join(workdir, "whois-calls.log")
+    bin_dir = os.path.join(workdir, "bin")
+    stand_ins.write_fake_whois(bin_dir, ports["whois"], whois_log)
+    env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""),
+               PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+
+    print(f"stand-ins: whois 127.0.0.1:{ports['whois']}, bulk whois 127.0.0.1:{ports['bulk']}, "
+          f"dns 127.0.0.1:{ports['dns']}, http :{ports['http']}, "
+          f"https :{ports['https'] or '- (openssl not found)'}, work directory {workdir}\n")
+    print(f"{'scenario':<15}{'backend':<8}{'items':>7}{'seconds':>10}{'items/s':>11}{'RSS MB':>10}{'procs':>8}"
+          f"{'whois':>8}{'dns':>8}{'http':>8}{'exit':>6}")
+
+    results = []
+    for scenario in args.scenarios:
+        entries = read_lines(os.path.join(TEST_DATA, INPUTS[scenario]))[:args.limit]
+        scope_path = os.path.join(workdir, f"{scenario}-scope.txt")
+        if scenario == "web_services":
+            loopback_scope(entries, scope_path)
+        else:
+            with open(scope_path, "w") as scope:
+                scope.write("\n".join(entries) + "\n")
+
+        counts = (whois.queries.value + bulk.queries.value, dns_server.queries.value, http.requests.value)
+        calls_before = len(read_lines(whois_log)) if os.path.exists(whois_log) else 0
+        extra = args.web_args if scenario == "web_services" else args.recon_args
+        arguments = scenario_arguments(scenario, scope_path, args, ports) + extra.split()
+        seconds, peak_rss, exit_code = run_recon(arguments, workdir, env,
+                                                 os.path.join(workdir, f"{scenario}.log"))
+        calls = len(read_lines(whois_log)) if os.path.exists(whois_log) else 0
+
+        result = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "scenario": scenario,
+                  "backend": args.backend if scenario in ("verify_ip", "verify_domain") else "-",
+                  "items": len(read_lines(scope_path)), "seconds": seconds,
+                  "items_per_second": len(read_lines(scope_path)) / seconds if seconds else 0.0,
+                  "peak_rss_mb": peak_rss, "whois_subprocesses": calls - calls_before,
+                  "whois_queries": whois.queries.value + bulk.queries.value - counts[0], "whois_throttled": whois.throttled.value,
+                  "dns_queries": dns_server.queries.value - counts[1],
+                  "http_requests": http.requests.value - counts[2], "exit_code": exit_code,
+                  "settings": {"workers": args.workers, "concurrency": args.concurrency,
+                               "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                               "hang_rate": args.hang_rate, "throttle_every": args.throttle_every,
+                               "a_records": args.a_records, "extra_args": extra}}
+        results.append(result)
+        print(report_line(result))
+
+    with open(args.results, "a") as results_file:
+        for result in results:
+            results_file.write(json.dumps(result) + "\n")
+    print(f"\nResults appended to {args.results}")
+
+    if args.keep:
+        print(f"Output and logs kept in {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if any(result["exit_code"] for result in results) else 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,268 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))  # run from a checkout without installing recon
+
+from recon import parser_engine  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(BENCH_DIR, "fixtures", "whois")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "parser_baseline.json")
+
+PARSERS = {"domain": (parser_engine.parse_domain_whois, parser_engine.DOMAIN_PATTERNS),
+           "ip": (parser_engine.parse_ip_whois, parser_engine.IP_PATTERNS)}
+
+
+def load_fixtures(path):
+    """ [(name, kind, text)] of the recorded answers in path, named <format>.<domain|ip>.txt """
+
+    fixtures = []
+    for file_name in sorted(glob.glob(os.path.join(path, "*.txt"))):
+        name, kind = os.path.basename(file_name)[:-len(".txt")].rsplit(".", 1)
+        if kind not in PARSERS:
+            print(f"parser_bench Warning: skipping {file_name}, expected <format>.<domain|ip>.txt", file=sys.stderr)
+            continue
+        with open(file_name, encoding="utf-8") as fixture:
+            fixtures.append((name, kind, fixture.read()))
+    return fixtures
+
+
+def adversarial_inputs(size):
+    """ [(name, text)] of about size characters each, shaped to make badly written patterns backtrack: long runs
+    without a newline, repeated labels without values, dotted names that never reach the IP a pattern wants
+    """
+
+    def fill(unit):
+        return unit * (size // len(unit) + 1)
+
+    return [("long-line", fill("a")),
+            ("newlines", fill("\n")),
+            ("tabs-spaces", fill(" \t")),
+            ("dotted-spaces", fill(" .")),
+            ("dotted-names", fill("  " + "ns1.a." * 40 + "example ")),
+            ("colons", fill(":")),
+            ("labels-no-values", fill("Registrant:\nName Server:\nowner:\nCIDR:\n")),
+            ("label-then-spaces", "registrar:" + fill(" ") + "x"),
+            ("holder-commas", "Domain Holder: x\n" + fill("a,") + "\n"),
+            ("repeated-records", fill("Name Server: ns1.example.com\nOrganization: Example Inc.\n"))]
+
+
+def time_pattern(source, texts, repeat):
+    """ Runs in a worker process: best of repeat seconds for findall() of source over each text """
+
+    regex = parser_engine.CompiledPattern(source).regex
+    timings = []
+    for text in texts:
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            regex.findall(text)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+    return timings
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class PatternTimer:
+    """ Times patterns in a worker process, so a pattern that backtracks for minutes is killed at its deadline
+    instead of hanging the benchmark
+    """
+
+    def __init__(self):
+        self._pool = multiprocessing.Pool(1)
+
+    def time(self, source, texts, repeat, deadline):
+        """ Per text timings, or None when the pattern did not finish within deadline seconds """
+        result = self._pool.apply_async(time_pattern, (source, texts, repeat))
+        try:
+            return result.get(deadline)
+        except multiprocessing.TimeoutError:
+            self._pool.terminate()
+            self._pool = multiprocessing.Pool(1)
+            return None
+
+    def close(self):
+        self._pool.terminate()
+
+
+def run(fixtures, adversarial, repeat, budget):
+    """ Returns the results as a JSON friendly dict:
+        patterns :: {source: {kind, field, corpus: mean seconds per recorded answer, worst: slowest single input,
+                              worst_input}}
+        fields :: {field: mean seconds per recorded answer, as recon.parser_engine.extract() runs its patterns}
+        parsers :: {kind: {seconds: mean per answer, per_second: answers per second}}
+    """
+
+    results = {"patterns": {}, "fields": {}, "parsers": {}}
+    timer = PatternTimer()
+    try:
+        for kind, (parse, compiled_fields) in PARSERS.items():
+            corpus = [(name, text) for name, fixture_kind, text in fixtures if fixture_kind == kind]
+            inputs = corpus + adversarial
+            texts = [text for name, text in inputs]
+
+            for field, patterns in compiled_fields.items():
+                for pattern in patterns:
+                    deadline = budget * len(texts) * repeat * 4 + 5
+                    timings = timer.time(pattern.source, texts, repeat, deadline)
+                    entry = {"kind": kind, "field": field, "corpus": None, "worst": None, "worst_input": None}
+                    if timings is None:
+                        entry["worst"], entry["worst_input"] = float("inf"), "timed out"
+                    else:
+                        corpus_timings = timings[:len(corpus)]
+                        entry["corpus"] = sum(corpus_timings) / len(corpus_timings) if corpus_timings else 0.0
+                        worst = max(range(len(timings)), key=timings.__getitem__)
+                        entry["worst"], entry["worst_input"] = timings[worst], inputs[worst][0]
+                    results["patterns"][pattern.source] = entry
+
+            # the patterns as the parser runs them: format specific ones skipped, literal prefixes checked first
+            for field, patterns in compiled_fields.items():
+                total = 0.0
+                for name, text in corpus:
+                    lowered = text.lower()
+                    formats = parser_engine.fingerprint(text, lowered)
+                    total += best_of(lambda: parser_engine.extract(patterns, text, formats, lowered), repeat)
+                results["fields"][field] = total / len(corpus) if corpus else 0.0
+
+            total = sum(best_of(lambda: parse(text), repeat) for name, text in corpus)
+            seconds = total / len(corpus) if corpus else 0.0
+            results["parsers"][kind] = {"seconds": seconds, "per_second": 1 / seconds if seconds else None}
+    finally:
+        timer.close()
+    return results
+
+
+def check(results, budget, baseline=None, tolerance=2.0, min_delta=0.00005):
+    """ [failure message] for patterns over budget on any input, and for patterns, fields or parsers slower than
+    tolerance times their baseline (and by more than min_delta seconds, below which timings are noise)
+    """
+
+    failures = []
+    for source, entry in results["patterns"].items():
+        if entry["worst"] > budget:
+            failures.append(f"over budget: {entry['field']} pattern {source!r} took "
+                            f"{entry['worst'] * 1000:.1f} ms on {entry['worst_input']}")
+
+    if baseline:
+        def regressed(name, current, previous):
+            if current is not None and previous and current > previous * tolerance and current - previous > min_delta:
+                failures.append(f"regression: {name} {previous * 1000:.3f} ms -> {current * 1000:.3f} ms per answer")
+
+        for source, entry in results["patterns"].items():
+            previous = baseline.get("patterns", {}).get(source)
+            if previous:
+                regressed(f"{entry['field']} pattern {source!r}", entry["corpus"], previous["corpus"])
+        for field, seconds in results["fields"].items():
+            regressed(f"field {field}", seconds, baseline.get("fields", {}).get(field))
+        for kind, entry in results["parsers"].items():
+            regressed(f"parse_{kind}_whois", entry["seconds"], baseline.get("parsers", {}).get(kind, {}).get("seconds"))
+    return failures
+
+
+def report_lines(results):
+    lines = [f"{'pattern':<60}{'per answer ms':>15}{'answers/s':>12}{'worst ms':>12}  worst input"]
+    for source, entry in sorted(results["patterns"].items(), key=lambda item: -(item[1]["worst"] or 0)):
+        label = f"{entry['field']}: {source!r}"
+        label = label if len(label) <= 58 else label[:55] + "..."
+        corpus = entry["corpus"]
+        per_second = f"{1 / corpus:>12.0f}" if corpus else f"{'-':>12}"
+        per_answer = f"{corpus * 1000:>15.4f}" if corpus is not None else f"{'-':>15}"
+        lines.append(f"{label:<60}{per_answer}{per_second}{entry['worst'] * 1000:>12.2f}  {entry['worst_input']}")
+
+    lines.append("")
+    lines.append(f"{'field':<60}{'per answer ms':>15}{'answers/s':>12}")
+    for field, seconds in results["fields"].items():
+        per_second = f"{1 / seconds:>12.0f}" if seconds else f"{'-':>12}"
+        lines.append(f"{field:<60}{seconds * 1000:>15.4f}{per_second}")
+
+    lines.append("")
+    for kind, entry in results["parsers"].items():
+        lines.append(f"parse_{kind}_whois: {entry['seconds'] * 1000:.4f} ms per answer, "
+                     f"{entry['per_second'] or 0:.0f} answers/s")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times the whois parsing patterns over recorded answers and "
+                                                 "adversarial inputs, offline", prog="parser_bench")
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES,
+                        help='Directory of recorded answers named <format>.<domain|ip>.txt')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Runs per measurement, the fastest one counts (default: 5)')
+    parser.add_argument('--budget-ms', type=float, default=50.0,
+                        help='Most milliseconds one pattern may take on any single input (default: 50)')
+    parser.add_argument('--adversarial-size', type=int, default=100000,
+                        help='Characters in each adversarial input, 0 for none (default: 100000)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='JSON results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help='How many times slower than the baseline counts as a regression (default: 2)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Write the results to --baseline instead of comparing with it')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.fixtures)
+    adversarial = adversarial_inputs(args.adversarial_size) if args.adversarial_size else []
+    budget = args.budget_ms / 1000
+    print(f"{len(fixtures)} recorded answers, {len(adversarial)} adversarial inputs of {args.adversarial_size} "
+          f"characters\n")
+
+    results = run(fixtures, adversarial, args.repeat, budget)
+    for line in report_lines(results):
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+    baseline = None
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    failures = check(results, budget, baseline, args.tolerance)
+    if failures:
+        print()
+        for failure in failures:
+            print("FAIL", failure)
+        return 1
+    print("\nOK: every pattern within budget" + (", no regressions against the baseline" if baseline else ""))
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
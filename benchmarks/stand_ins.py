@@ -0,0 +1,362 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import asyncio
+import hashlib
+import ipaddress
+import os
+import random
+import shutil
+import socketserver
+import ssl
+import stat
+import subprocess
+import sys
+import threading
+import time
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+import dns.reversename
+
+# Local stand-ins for the services recon talks to, used by load_harness.py. Every answer is derived from a hash of
+# the query, so runs are repeatable, and every server counts what it served.
+
+
+def name_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.lower().encode(), digest_size=8).digest(), "little")
+
+
+class Behaviour:
+    """ Latency and failure settings shared by the stand-ins """
+
+    def __init__(self, latency=0.02, jitter=0.01, hang_rate=0.0, hang_seconds=30.0, throttle_every=0):
+        """
+        Params:
+            latency :: seconds before every answer
+            jitter :: up to this many seconds added at random
+            hang_rate :: share of queries (by hash, so the same ones every run) never answered
+            hang_seconds :: how long a hanging query keeps its connection open
+            throttle_every :: every n-th whois query gets a rate limit notice instead of its record, 0 for none
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.throttle_every = throttle_every
+
+    def delay(self):
+        return self.latency + random.uniform(0, self.jitter)
+
+    def hangs(self, query):
+        return self.hang_rate and (name_hash(query) % 10000) < self.hang_rate * 10000
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            self.value += 1
+            return self.value
+
+
+# whois (port 43 style)
+
+def ip_record(query):
+    network = ipaddress.ip_network(f"{query}/24", strict=False) if ":" not in query else \
+        ipaddress.ip_network(f"{query}/48", strict=False)
+    org = f"Example Org {name_hash(str(network.supernet(new_prefix=network.prefixlen - 8))) % 500}"
+    return (f"#\n# ARIN WHOIS data and services are subject to the Terms of Use\n#\n\n"
+            f"NetRange:       {network.network_address} - {network.broadcast_address}\n"
+            f"CIDR:           {network}\n"
+            f"NetName:        EXAMPLE-{name_hash(str(network)) % 100000}\n"
+            f"Organization:   {org} (EX-{name_hash(org) % 1000})\n\n"
+            f"OrgName:        {org}\nCity:           Reston\nStateProv:      VA\nCountry:        US\n")
+
+
+def domain_record(query):
+    registrant = f"Example Holdings {name_hash(query) % 200}"
+    return (f"   Domain Name: {query.upper()}\n   Registry Domain ID: {name_hash(query)}_DOMAIN_COM-VRSN\n"
+            f"   Registrar: Example Registrar, Inc.\n   Name Server: NS1.{query.upper()}\n"
+            f"   Name Server: NS2.{query.upper()}\nRegistrant Organization: {registrant}\n"
+            f"Tech Organization: {registrant}\n"
+            f">>> Last update of whois database: 2024-06-01T12:00:00Z <<<\n")
+
+
+def whois_answer(query):
+    try:
+        ipaddress.ip_address(query)
+    except ValueError:
+        return domain_record(query)
+    return ip_record(query)
+
+
+class WhoisStandIn(socketserver.ThreadingTCPServer):
+    """ Answers one query per connection, like a registry whois server, with generated ARIN / Verisign style
+    records. Throttled queries get ARIN's 'Query limit exceeded' notice
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, behaviour, address=("127.0.0.1", 0)):
+        self.behaviour = behaviour
+        self.queries = Counter()
+        self.throttled = Counter()
+        super().__init__(address, WhoisHandler)
+
+
+class WhoisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        query = self.rfile.readline().decode("utf-8", errors="replace").strip()
+        number = server.queries.next()
+
+        if server.behaviour.hangs(query):
+            time.sleep(server.behaviour.hang_seconds)
+            return
+        time.sleep(server.behaviour.delay())
+
+        if server.behaviour.throttle_every and number % server.behaviour.throttle_every == 0:
+            server.throttled.next()
+            answer = "Query limit exceeded, please try again later\n"
+        else:
+            answer = whois_answer(query.split()[-1] if query else query)
+        self.wfile.write(answer.encode())
+
+
+FAKE_WHOIS_BINARY = """#!{python} -IS
+# stand-in for the whois binary: logs the call and asks the local whois stand-in
+import socket, sys
+with open({log!r}, "a") as log:
+    log.write(sys.argv[-1] + "\\n")
+try:
+    with socket.create_connection(("127.0.0.1", {port})) as sock:
+        sock.sendall(sys.argv[-1].encode() + b"\\r\\n")
+        sys.stdout.write(b"".join(iter(lambda: sock.recv(4096), b"")).decode(errors="replace"))
+except OSError as e:
+    sys.stderr.write(str(e) + "\\n")
+"""
+
+
+def write_fake_whois(directory, port, log):
+    """ Writes a whois executable to directory that forwards to the stand-in on port and logs each call to log """
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "whois")
+    with open(path, "w") as binary:
+        binary.write(FAKE_WHOIS_BINARY.format(python=sys.executable, log=log, port=port))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+# bulk whois (IP to ASN, begin / verbose / end)
+
+BULK_COUNTRIES = ("US", "US", "US", "US", "DE", "GB", "NL", "CN", "BR", "JP")
+BULK_REGISTRIES = {"US": "arin", "DE": "ripencc", "GB": "ripencc", "NL": "ripencc", "CN": "apnic", "JP": "apnic",
+                   "BR": "lacnic"}
+
+
+def bulk_answer(ip):
+    """ Verbose bulk answer line for ip: the /24 (/48) as prefix, AS and country from the prefix's hash. Private
+    addresses get the NA line the real service sends for unrouted space
+    """
+    address = ipaddress.ip_address(ip)
+    if address.is_private:
+        return f"NA      | {ip:<16} | NA                  |    | other    |            | NA\n"
+    prefix = ipaddress.ip_network(f"{ip}/{24 if address.version == 4 else 48}", strict=False)
+    base = name_hash(str(prefix))
+    country = BULK_COUNTRIES[base % len(BULK_COUNTRIES)]
+    asn = 64512 + base % 1000
+    return (f"{asn:<7} | {ip:<16} | {str(prefix):<19} | {country} | {BULK_REGISTRIES[country]:<8} | 2010-01-01 | "
+            f"EXAMPLE-AS-{asn}, {country}\n")
+
+
+class BulkWhoisStandIn(socketserver.ThreadingTCPServer):
+    """ Speaks the netcat style bulk protocol of IP to ASN services: begin, optionally verbose, one IP per line,
+    end. Answers stream back line by line while the IPs are still coming in
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, behaviour, address=("127.0.0.1", 0)):
+        self.behaviour = behaviour
+        self.connections = Counter()
+        self.queries = Counter()
+        super().__init__(address, BulkWhoisHandler)
+
+
+class BulkWhoisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        server.connections.next()
+        time.sleep(server.behaviour.delay())  # once per connection, the answers follow back to back
+        self.wfile.write(b"Bulk mode; whois.stand-in [2024-06-01 12:00:00 +0000]\n")
+
+        number = 0
+        for raw in self.rfile:
+            line = raw.decode("utf-8", errors="replace").strip()
+            number += 1
+            if line in ("begin", ""):
+                continue
+            if line == "verbose":
+                self.wfile.write(b"AS      | IP               | BGP Prefix          | CC | Registry | Allocated  | "
+                                 b"AS Name\n")
+                continue
+            if line == "end":
+                break
+            server.queries.next()
+            try:
+                answer = bulk_answer(str(ipaddress.ip_address(line)))
+            except ValueError:
+                answer = f"Error: no ASN or IP match on line {number}.\n"
+            self.wfile.write(answer.encode())
+            self.wfile.flush()
+
+
+# DNS
+
+class DnsStandIn(socketserver.ThreadingUDPServer):
+    """ Answers A with a_records addresses per name (10.0.0.0/8, from the name's hash), AAAA with NODATA, PTR with
+    host-<ip>.example.net and names starting with nx, or nx_rate of all names, with NXDOMAIN
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, behaviour, a_records=2, nx_rate=0.05, address=("127.0.0.1", 0)):
+        self.behaviour = behaviour
+        self.a_records = a_records
+        self.nx_rate = nx_rate
+        self.queries = Counter()
+        super().__init__(address, DnsHandler)
+
+    def addresses(self, name):
+        base = name_hash(name)
+        return [str(ipaddress.IPv4Address((10 << 24) + (base + i * 7919) % (1 << 24))) for i in range(self.a_records)]
+
+
+class DnsHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        server = self.server
+        server.queries.next()
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return
+
+        question = query.question[0]
+        name = question.name.to_text().rstrip(".")
+        if server.behaviour.hangs(name):
+            return  # dropped, the client times out
+        time.sleep(server.behaviour.delay())
+
+        response = dns.message.make_response(query)
+        response.flags |= dns.flags.RA
+        soa = dns.rrset.from_text(question.name.parent() if len(question.name) > 1 else question.name, 300, "IN",
+                                  "SOA", "ns.example.net. hostmaster.example.net. 1 7200 900 1209600 120")
+
+        if question.rdtype == dns.rdatatype.PTR:
+            address = dns.reversename.to_address(question.name)
+            response.answer.append(dns.rrset.from_text(question.name, 300, "IN", "PTR",
+                                                       f"host-{address.replace('.', '-').replace(':', '-')}."
+                                                       f"example.net."))
+        elif name.startswith("nx") or (name_hash(name) % 10000) < server.nx_rate * 10000:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+            response.authority.append(soa)
+        elif question.rdtype == dns.rdatatype.A:
+            response.answer.append(dns.rrset.from_text(question.name, 300, "IN", "A", *server.addresses(name)))
+        else:
+            response.authority.append(soa)  # NODATA
+        sock.sendto(response.to_wire(), self.client_address)
+
+
+# HTTP / HTTPS
+
+STATUS_CODES = (200, 200, 200, 301, 302, 403, 404, 500, 503)
+
+
+def self_signed_context(directory):
+    """ Server TLS context with a throwaway certificate made by openssl, None when openssl is not installed """
+
+    if not shutil.which("openssl"):
+        return None
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+                    "-days", "1", "-subj", "/CN=localhost"], check=True, capture_output=True)
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+class HttpStandIn:
+    """ HTTP and, with a TLS context, HTTPS servers on every loopback address (127.0.0.0/8). The status code of a
+    request depends on the local address it was sent to, so a scope of 127.x.y.z addresses gets a repeatable
+    mix of answers. Addresses picked by hang_rate accept the connection and never answer
+    """
+
+    def __init__(self, behaviour, tls_context=None):
+        self.behaviour = behaviour
+        self.tls_context = tls_context
+        self.requests = Counter()
+        self.http_port = None
+        self.https_port = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    async def _handle(self, reader, writer):
+        try:
+            local_address = writer.get_extra_info("sockname")[0]
+            await reader.readuntil(b"\r\n\r\n")
+            self.requests.next()
+            if self.behaviour.hangs(local_address):
+                await asyncio.sleep(self.behaviour.hang_seconds)
+                return
+            await asyncio.sleep(self.behaviour.delay())
+            status = STATUS_CODES[name_hash(local_address) % len(STATUS_CODES)]
+            writer.write(f"HTTP/1.1 {status} Stand-in\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self):
+        http = await asyncio.start_server(self._handle, "0.0.0.0", 0, backlog=1024)
+        self.http_port = http.sockets[0].getsockname()[1]
+        if self.tls_context is not None:
+            https = await asyncio.start_server(self._handle, "0.0.0.0", 0, ssl=self.tls_context, backlog=1024)
+            self.https_port = https.sockets[0].getsockname()[1]
+        self._ready.set()
+        await asyncio.Event().wait()
+
+    def start(self):
+        threading.Thread(target=self._loop.run_until_complete, args=(self._serve(),), daemon=True).start()
+        self._ready.wait()
+        return self
+
+
+def serve(server):
+    """ Runs a socketserver stand-in on a daemon thread and returns its port """
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
@@ -12,33 +12,86 @@ Created, in part, with funding and support from the United States Government. (s
 DM22-0416
 """
 
+import collections
+import functools
 import re
-import subprocess
 import sys
 
-import dns.resolver
-import dns.reversename
+from recon import parser_engine
+from recon import profiling
+from recon.dns_resolver import DnsResolver
+from recon.scope_input import is_ip_address
+from recon.whois_client import server_name, system_whois
 
-from recon.whois_parser import domain_regex_dict, ip_regex_dict
+
+RECORD_FIELDS = (("whois_query", "domain", "whois_domain", "ip", "fqdn", "ips_set") +
+                 tuple(parser_engine.DOMAIN_FIELDS) + tuple(parser_engine.IP_FIELDS) +
+                 ("raw_domain_whois", "raw_ip_whois"))
+
+
+class WhoisRecord(collections.namedtuple("WhoisRecord", RECORD_FIELDS, defaults=(None,) * len(RECORD_FIELDS))):
+    """ Compact, read-only result of a Whois lookup, see Whois.record(). Has the same attribute names as Whois, so
+    it can be used wherever the output code reads one. The raw texts are None unless asked for, and so is every
+    field not given to the constructor
+    """
+    __slots__ = ()
 
 
 class Whois:
     # helper class Set to override set.__str__(self) method
-    class Set(set):
-        def __str__(self):
-            return ", ".join(map(repr,self))
+    Set = parser_engine.WhoisSet
+
+    # attributes filled in by filter_ip_whois(), shared by every address of the same netblock
+    IP_FIELDS = tuple(parser_engine.IP_FIELDS)
+
+    # attributes filled in by filter_domain_whois(), shared by every host of the same registrable domain
+    DOMAIN_FIELDS = tuple(parser_engine.DOMAIN_FIELDS)
 
-    def __init__(self, whois_query="google.com"):
+    def __init__(self, whois_query="google.com", cache=None, netblocks=None, backend=None, resolver=None,
+                 reverse_dns=False, ip_memo=None, public_suffixes=None, domain_memo=None, defer=False, keep_raw=False):
         """
         Initial instance vars:
         - Mark as None to initialize
         - If info is "REDACTED FOR PRIVACY" assign var lowercase str "private"
+
+        cache :: optional recon.cache.WhoisCache shared by every query in a run
+        netblocks :: optional recon.netblocks.NetblockIndex shared by every query in a run
+        backend :: callable returning the raw whois text of a query. Defaults to running the whois binary,
+                   recon.whois_client.WhoisClient() speaks port 43 directly
+        resolver :: recon.dns_resolver.DnsResolver shared by every query in a run. Defaults to a resolver of our
+                    own using /etc/resolv.conf and cache
+        reverse_dns :: for IP queries, fill fqdn with the PTR name of the address
+        ip_memo :: optional recon.memo.SingleFlight shared by every query in a run, mapping IP -> ip_fields(), so
+                   an IP shared by many domains is looked up once even by concurrent workers. Deferred instances
+                   keep the raw whois text in it only until it is parsed (see remember_parsed())
+        public_suffixes :: optional recon.public_suffix.PublicSuffixList. When given, the domain whois is run for
+                           the registrable domain (example.com for www.example.com), DNS and IP whois still for
+                           the host itself
+        domain_memo :: optional recon.memo.SingleFlight shared by every query in a run, mapping the whois'd domain
+                       -> domain_fields() (raw text until parsed when deferred), so hosts of the same registrable
+                       domain share one lookup
+        defer :: do not query from the constructor. The caller runs fetch() (network) and parse() (CPU) as two
+                 separate steps instead, e.g. fetch() on I/O worker threads and parse() elsewhere, then keeps only
+                 record()
+        keep_raw :: keep the raw whois text in ip_memo and domain_memo along with the parsed fields, so every
+                    record() of a --keep-raw run has it, not only the first one of each IP / domain
         """
 
         # query attributes (see RI below)
         self.whois_query = whois_query
+        self.cache = cache
+        self.netblocks = netblocks
+        self.backend = backend or system_whois
+        self.resolver = resolver or DnsResolver(cache=cache)
+        self.reverse_dns = reverse_dns
+        self.ip_memo = ip_memo
+        self.public_suffixes = public_suffixes
+        self.domain_memo = domain_memo
+        self.keep_raw = keep_raw
         self.ip = None
         self.domain = None
+        self.whois_domain = None  # the name the domain whois ran for, self.domain or its registrable domain
+        self.whois_queries = 0  # queries this instance sent to the backend, cache / memo / netblock hits not counted
 
         # values assigned for querying domain
         self.registrar = None
@@ -64,23 +117,22 @@ class Whois:
         self.raw_domain_whois = ""
         self.raw_ip_whois = ""
 
-        # whois_query regex matching
-        pat = '([0-9]{1,3}\.){3}[0-9]{1,3}'
-        re_obj = re.compile(pat)
-        mat_obj = re_obj.match(whois_query)
-
         # REPRESENTATION INVARIANT (RI):
         # whois_query input is exclusively an ip addr or a domain (xor)
         # bool(self.ip) != bool(self.domain) ==> true
-        if mat_obj:
+        if is_ip_address(whois_query):
             self.ip = whois_query
         else:
             self.domain = whois_query
 
+        # raw texts fetched but not parsed yet, "domain" and / or "ip" (see fetch() and parse())
+        self.unparsed = set()
+
         # TODO: Check what env/OS is running the script and act accordingly
         #       (ex. is whois installed?)
 
-        self.query()
+        if not defer:
+            self.query()
 
     def check_whois_install(self):
         """ Does whois exist on local machine?"""
@@ -90,7 +142,9 @@ class Whois:
 
     @staticmethod
     def whois_regex_process(patterns, data):
-        """ Iterate through patterns, match against data """
+        """ Iterate through patterns, match against data.
+        Kept for callers passing their own pattern lists, filter_*_whois() use the precompiled recon.parser_engine
+        """
 
         result_list = []
         for pattern in patterns:
@@ -111,96 +165,265 @@ class Whois:
         """ Filters raw data for domain queries"""
 
         self.whois_dict['domain'] = self.domain
-        self.registrar = self.whois_regex_process(
-            domain_regex_dict["registrar"], self.raw_domain_whois)
-        self.whois_dict['registrar'] = self.registrar
-        self.registrant_organization = self.whois_regex_process(
-            domain_regex_dict["registrant"], self.raw_domain_whois)
-        self.whois_dict['registrant_organization'] = (
-            self.registrant_organization)
-        self.tech_organization = self.whois_regex_process(
-            domain_regex_dict["tech_org"], self.raw_domain_whois)
-        self.whois_dict['tech_organization'] = self.tech_organization
-        self.name_server = self.whois_regex_process(
-            domain_regex_dict["name_server"], self.raw_domain_whois)
-        self.whois_dict['name_server'] = self.name_server
-        self.organisation = self.whois_regex_process(
-            domain_regex_dict["organisation"], self.raw_domain_whois)
-        self.whois_dict['organisation'] = self.organisation
+        with profiling.timer("parse_domain"):
+            fields = parser_engine.parse_domain_whois(self.raw_domain_whois)
+        for field, value in fields.items():
+            setattr(self, field, value)
+            self.whois_dict[field] = value
 
     def filter_ip_whois(self):
         """ Filters raw data for ip queries"""
 
         self.whois_dict['ip'] = self.ip
-        self.ip_cidr = self.whois_regex_process(
-            ip_regex_dict["ip_cidr"], self.raw_ip_whois)
-        self.whois_dict['ip_cidr'] = self.ip_cidr
-        self.ip_organization = self.whois_regex_process(
-            ip_regex_dict["ip_organization"], self.raw_ip_whois)
-        self.whois_dict['ip_organization'] = self.ip_organization
-        self.ip_city = self.whois_regex_process(
-            ip_regex_dict["ip_city"], self.raw_ip_whois)
-        self.whois_dict['ip_city'] = self.ip_city
-        self.ip_country = self.whois_regex_process(
-            ip_regex_dict["ip_country"], self.raw_ip_whois)
-        self.whois_dict['ip_country'] = self.ip_country
-        self.ip_region = self.whois_regex_process(
-            ip_regex_dict["ip_region"], self.raw_ip_whois)
-        self.whois_dict['ip_region'] = self.ip_region
-        self.ip_custname = self.whois_regex_process(
-            ip_regex_dict["ip_custname"], self.raw_ip_whois)
-        self.whois_dict['ip_custname'] = self.ip_custname
+        with profiling.timer("parse_ip"):
+            fields = parser_engine.parse_ip_whois(self.raw_ip_whois)
+        for field, value in fields.items():
+            setattr(self, field, value)
+            self.whois_dict[field] = value
 
         self.whois_dict['fqdn'] = self.fqdn
 
+    def ip_fields(self):
+        """ Returns the IP_FIELDS as a JSON friendly dict (lists instead of Whois.Set) """
+        return {field: sorted(getattr(self, field)) if getattr(self, field) else None for field in Whois.IP_FIELDS}
+
+    def apply_ip_fields(self, fields):
+        """ Inverse of ip_fields(): fills the ip attributes and whois_dict from a stored answer """
+
+        self.whois_dict['ip'] = self.ip
+        for field in Whois.IP_FIELDS:
+            value = Whois.Set(fields[field]) if fields.get(field) else None
+            setattr(self, field, value)
+            self.whois_dict[field] = value
+        self.whois_dict['fqdn'] = self.fqdn
+
+    def domain_fields(self):
+        """ Returns the DOMAIN_FIELDS as a JSON friendly dict (lists instead of Whois.Set) """
+        return {field: sorted(getattr(self, field)) if getattr(self, field) else None
+                for field in Whois.DOMAIN_FIELDS}
+
+    def apply_domain_fields(self, fields):
+        """ Inverse of domain_fields(): fills the domain attributes and whois_dict from a stored answer """
+
+        self.whois_dict['domain'] = self.domain
+        for field in Whois.DOMAIN_FIELDS:
+            value = Whois.Set(fields[field]) if fields.get(field) else None
+            setattr(self, field, value)
+            self.whois_dict[field] = value
+
     def lookup(self):
-        """ 1. Use dns.reversename to lookup FQDN for self.ip, or
-            2. Use dns.resolver to lookup ip addr for self.domain
+        """ 1. Use a PTR lookup to find the FQDN for self.ip, or
+            2. Use A lookups (and AAAA, when the resolver asks for them) to find the ip addrs for self.domain
+        Answers come from self.resolver, which caches them and reports DNS failures on stderr
         """
-        try:
-            if self.ip:
-                # only return fqdn if resolver is able to find domain
-                # ans = dns.resolver.resolve(self.ip)
-                name = dns.reversename.from_address(self.ip).to_text()
-                return name
-            else:
-                ans = dns.resolver.resolve(self.domain).rrset
-                # rrset elts have type dns.rdtypes.IN.A.A
-                # rr.to_text() returns 'address' slot
-                first_ip = ans[0].to_text()  # hitting first IP
-
-                if len(ans) > 1:  # if there is more than on IP then store in set
-                    self.ips_set = Whois.Set([rr.to_text() for rr in ans])
-
-                return first_ip  # default to return the first instance for now
-        # except dns.resolver.NXDOMAIN as e:  #  commenting out until fqdn resolves
-            # print("Whois.lookup() NXDOMAIN:", e, file=sys.stderr)
-        except dns.resolver.NoNameservers as e:
-            print("Whois.lookup() Warning:", e, file=sys.stderr)
-        except dns.exception.DNSException as e:
-            print("Whois.lookup() Error - DNS Exception:", e, file=sys.stderr)
-        except dns.exception.SyntaxError as e:
-            print("Whois.lookup() Error - SyntaxError:", e, file=sys.stderr)
+        if self.ip:
+            # only return fqdn if resolver is able to find domain
+            with profiling.timer("dns_lookup"):
+                return self.resolver.reverse(self.ip)
+
+        with profiling.timer("dns_lookup"):
+            addresses = self.resolver.addresses(self.domain)
+        if not addresses:
+            print(f"Whois.lookup() Warning: {self.domain} does not resolve", file=sys.stderr)
+            return None
+
+        first_ip = addresses[0]  # hitting first IP, IPv4 if there is one
+
+        if len(addresses) > 1:  # if there is more than on IP then store in set
+            self.ips_set = Whois.Set(addresses)
+
+        return first_ip  # default to return the first instance for now
+
+    def run_whois(self, query, kind):
+        """ Returns the raw whois text for query, from self.cache when it holds a fresh answer.
+        kind is "ip" or "domain" and is part of the cache key
+        """
+
+        if self.cache:
+            raw = self.cache.get(kind, query)
+            if raw is not None:
+                return raw
+
+        self.whois_queries += 1
+        with profiling.timer("whois", functools.partial(server_name, self.backend, query)):
+            raw = self.backend(query)
+
+        if self.cache and raw:  # an empty answer is most likely a failure, so do not keep it around
+            self.cache.put(kind, query, raw)
+        return raw
+
+    def query_ip(self):
+        """ Fills the ip attributes for self.ip, from self.ip_memo when another query already looked it up """
+
+        if self.ip_memo is None:
+            self.query_ip_fields()
+        else:
+            self.apply_ip_fields(self.ip_memo.get(self.ip, self.query_ip_fields))
+
+    def query_ip_fields(self):
+        """ Fills the ip attributes for self.ip and returns them as ip_fields(). If self.netblocks already holds a
+        block containing self.ip, that answer is reused and no whois is run
+        """
+
+        if self.netblocks is not None:
+            fields = self.netblocks.find(self.ip)
+            if fields is not None:
+                self.apply_ip_fields(fields)
+                return fields
+
+        self.raw_ip_whois = self.run_whois(self.ip, "ip")
+        self.filter_ip_whois()
+
+        fields = self.ip_fields()
+        if self.netblocks is not None:
+            self.netblocks.add(self.ip, self.ip_cidr, fields)
+        return fields
+
+    def set_whois_domain(self):
+        """ Picks the name the domain whois runs for: the registrable domain when self.public_suffixes is set """
+
+        self.whois_domain = self.domain
+        if self.public_suffixes is not None:
+            self.whois_domain = self.public_suffixes.registrable_domain(self.domain) or self.domain
+
+    def query_domain(self):
+        """ Fills the domain attributes for self.domain, from self.domain_memo when another host of the same
+        registrable domain already looked it up
+        """
+
+        self.set_whois_domain()
+        if self.domain_memo is None:
+            self.query_domain_fields()
+        else:
+            self.apply_domain_fields(self.domain_memo.get(self.whois_domain, self.query_domain_fields))
+
+    def query_domain_fields(self):
+        """ Runs the domain whois for self.whois_domain, fills the domain attributes and returns them as
+        domain_fields()
+        """
+        self.raw_domain_whois = self.run_whois(self.whois_domain, "domain")
+        self.filter_domain_whois()
+        return self.domain_fields()
 
     def query(self):
         """ Takes in domain or IP to query """
 
         if self.ip:
-            self.raw_ip_whois = subprocess.run(['whois', self.ip],
-                capture_output=True, text=True).stdout
-            self.filter_ip_whois()
-            # self.whois_dict['fqdn'] = self.lookup() TODO: resolve fqdn issue
+            if self.reverse_dns:
+                self.fqdn = self.lookup()
+            self.query_ip()
         else:
-            self.raw_domain_whois = subprocess.run( ['whois', self.domain],
-                capture_output=True, text=True).stdout
-            self.filter_domain_whois()
+            self.query_domain()
             assoc_ip_addr = self.lookup()
 
             if assoc_ip_addr:
                 self.ip = assoc_ip_addr
-                self.raw_ip_whois = subprocess.run(['whois', self.ip],
-                    capture_output=True, text=True).stdout
-                self.filter_ip_whois()
+                self.query_ip()
+
+    def memoised_whois(self, memo, query, kind):
+        """ run_whois() through memo (a recon.memo.SingleFlight), when there is one. Returns the raw text, or the
+        fields dict when another instance already parsed the answer, see remember_parsed()
+        """
+        if memo is None:
+            return self.run_whois(query, kind)
+        return memo.get(query, functools.partial(self.run_whois, query, kind))
+
+    def memo_value(self, fields, raw):
+        """ What remember_parsed() stores: the fields dict, with the raw text under "raw" when keep_raw is set """
+        if self.keep_raw:
+            fields = dict(fields, raw=raw)
+        return fields
+
+    def remember_parsed(self):
+        """ Replaces the raw texts this instance just parsed with their fields in domain_memo / ip_memo. The memos then
+        hold small dicts instead of whole answers for the rest of the run, and later hits skip the parsing
+        """
+        if "domain" in self.unparsed and self.domain_memo is not None:
+            self.domain_memo.replace(self.whois_domain, self.memo_value(self.domain_fields(), self.raw_domain_whois))
+        if "ip" in self.unparsed and self.ip_memo is not None:
+            self.ip_memo.replace(self.ip, self.memo_value(self.ip_fields(), self.raw_ip_whois))
+
+    def fetch(self):
+        """ Network half of query() for deferred instances: runs the DNS lookups and whois queries and keeps the raw
+        text for parse(). Answers found in self.netblocks are applied right away. Returns self
+        """
+
+        if self.ip:
+            if self.reverse_dns:
+                self.fqdn = self.lookup()
+            self.fetch_ip()
+        else:
+            self.set_whois_domain()
+            answer = self.memoised_whois(self.domain_memo, self.whois_domain, "domain")
+            if isinstance(answer, dict):  # parsed already
+                self.apply_domain_fields(answer)
+                self.raw_domain_whois = answer.get("raw", "")
+            else:
+                self.raw_domain_whois = answer
+                self.unparsed.add("domain")
+
+            assoc_ip_addr = self.lookup()
+            if assoc_ip_addr:
+                self.ip = assoc_ip_addr
+                self.fetch_ip()
+        return self
+
+    def fetch_ip(self):
+        if self.netblocks is not None:
+            fields = self.netblocks.find(self.ip)
+            if fields is not None:
+                self.apply_ip_fields(fields)
+                return
+
+        answer = self.memoised_whois(self.ip_memo, self.ip, "ip")
+        if isinstance(answer, dict):  # parsed already
+            self.apply_ip_fields(answer)
+            self.raw_ip_whois = answer.get("raw", "")
+        else:
+            self.raw_ip_whois = answer
+            self.unparsed.add("ip")
+
+    def parse(self):
+        """ CPU half of query() for deferred instances: filters the raw text fetch() collected. Returns self """
+
+        if "domain" in self.unparsed:
+            self.filter_domain_whois()
+        if "ip" in self.unparsed:
+            self.filter_ip_whois()
+        return self.apply_parsed()
+
+    def raw_texts(self):
+        """ [(kind, raw text)] fetch() collected and nobody parsed yet, the input of recon.parse_pool.parse_texts() """
+        return [(kind, self.raw_domain_whois if kind == "domain" else self.raw_ip_whois)
+                for kind in ("domain", "ip") if kind in self.unparsed]
+
+    def apply_parsed(self, parsed=()):
+        """ Finishes a deferred instance parsed elsewhere: parsed holds the field dicts for raw_texts(), in order.
+        Returns self
+        """
+
+        for (kind, raw), fields in zip(self.raw_texts(), parsed):
+            if kind == "domain":
+                self.apply_domain_fields(fields)
+            else:
+                self.apply_ip_fields(fields)
+
+        if "ip" in self.unparsed and self.netblocks is not None:
+            self.netblocks.add(self.ip, self.ip_cidr, self.ip_fields())
+        self.remember_parsed()
+        self.unparsed.clear()
+        return self
+
+    def record(self, keep_raw=False):
+        """ Returns the results as a WhoisRecord, without the raw whois text unless keep_raw is set. Dropping the
+        Whois for its record is what keeps the memory of a long batch flat
+        """
+
+        fields = {field: getattr(self, field) for field in Whois.DOMAIN_FIELDS + Whois.IP_FIELDS}
+        return WhoisRecord(whois_query=self.whois_query, domain=self.domain, whois_domain=self.whois_domain,
+                           ip=self.ip, fqdn=self.fqdn, ips_set=self.ips_set,
+                           raw_domain_whois=self.raw_domain_whois if keep_raw else None,
+                           raw_ip_whois=self.raw_ip_whois if keep_raw else None, **fields)
 
     def query_file(self, file):
         "Determine what files we can handle and in what format"
@@ -0,0 +1,53 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import collections
+import concurrent.futures
+import itertools
+
+
+def ordered_map(func, items, workers=1):
+    """ Runs func over items in a bounded thread pool and yields (item, result) pairs in input order.
+
+    Params:
+        func :: callable taking a single item, e.g. a Whois lookup
+        items :: any iterable, consumed lazily so large input files are never read into memory at once
+        workers :: number of lookups allowed to run at the same time. 1 keeps the old sequential behaviour
+
+    At most 2 * workers items are in flight, so a slow item at the head of the queue only holds back
+    output, it never lets the pool run away with the rest of the input.
+    """
+
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    items = iter(items)
+    window = workers * 2
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+
+        for item in itertools.islice(items, window):
+            pending.append((item, executor.submit(func, item)))
+
+        while pending:
+            item, future = pending.popleft()
+            result = future.result()
+
+            for next_item in itertools.islice(items, 1):
+                pending.append((next_item, executor.submit(func, next_item)))
+
+            yield item, result
@@ -0,0 +1,149 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import collections
+import ipaddress
+import socket
+import sys
+import threading
+
+from recon.whois_client import WhoisError
+
+BULK_SERVER = ("whois.cymru.com", 43)
+
+# one answer line of the verbose bulk protocol:
+# AS | IP | BGP Prefix | CC | Registry | Allocated | AS Name, with NA for what the server does not know
+BulkAnswer = collections.namedtuple("BulkAnswer", ("asn", "ip", "prefix", "country", "registry", "allocated",
+                                                   "as_name"))
+
+
+def normalise_ip(value):
+    """ The IP in the form the server echoes it back, None if value is not an IP """
+    try:
+        return str(ipaddress.ip_address(value.strip()))
+    except ValueError:
+        return None
+
+
+def parse_answer(line):
+    """ BulkAnswer of one answer line, None for the banner, column header, errors and anything else that is not an
+    answer. NA and empty columns become None
+    """
+
+    fields = [field.strip() for field in line.split("|")]
+    if len(fields) < 7:
+        return None
+    ip = normalise_ip(fields[1])
+    if ip is None:
+        return None  # column header
+    fields = [None if field in ("", "NA") else field for field in fields]
+    # the AS name may contain | itself
+    return BulkAnswer(fields[0], ip, fields[2], fields[3], fields[4], fields[5], " | ".join(filter(None, fields[6:]))
+                      or None)
+
+
+class BulkWhois:
+    """ Client for the bulk whois service of an IP to ASN mapping server (Team Cymru style): every IP goes over one
+    TCP connection between begin / verbose and end, and one pipe delimited line comes back per IP, in order.
+
+    Far cheaper than a whois conversation per address for thousands of IPs, but only knows the routed prefix, the
+    origin AS, the country and the registry of each IP, not the organization or customer names of the RIR record.
+    """
+
+    def __init__(self, server=BULK_SERVER, connect_timeout=10.0, read_timeout=60.0):
+        """
+        Params:
+            server :: (host, port) of the bulk whois service, e.g. a local stand-in server
+            connect_timeout :: seconds to wait for the TCP connection
+            read_timeout :: seconds to wait for each read, the server may take a while for the first answers
+        """
+        self.server = server
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    def lookup(self, ips):
+        """ Yields (ip, BulkAnswer or None) for every IP of ips, an iterable that is sent while answers stream back,
+        in the same order. Entries that are not IPs are skipped. Raises WhoisError when the server cannot be
+        reached or stops answering
+        """
+
+        host, port = self.server
+        try:
+            sock = socket.create_connection((host, port), timeout=self.connect_timeout)
+        except OSError as e:
+            raise WhoisError(f"{host}:{port} {e}") from e
+
+        sent = collections.deque()  # IPs sent but not answered yet, in order
+        sent_lock = threading.Lock()
+        writer_error = []
+
+        def write():
+            try:
+                sock.sendall(b"begin\nverbose\n")
+                for value in ips:
+                    ip = normalise_ip(value)
+                    if ip is None:
+                        print(f"BulkWhois.lookup() Warning: {value} is not an IP, skipped", file=sys.stderr)
+                        continue
+                    with sent_lock:
+                        sent.append(ip)
+                    sock.sendall(ip.encode() + b"\n")
+                sock.sendall(b"end\n")
+            except OSError as e:
+                writer_error.append(e)
+                close(sock)  # ends the reader too
+
+        # the server answers while the list is still going out, and stops reading when nobody reads its answers,
+        # so the IPs are written from a thread of their own
+        writer = threading.Thread(target=write, name="bulk-whois-writer", daemon=True)
+        sock.settimeout(self.read_timeout)
+        writer.start()
+
+        try:
+            for line in sock.makefile("r", encoding="utf-8", errors="replace"):
+                if line.startswith("Error:"):
+                    print(f"BulkWhois.lookup() Warning: {line.strip()}", file=sys.stderr)
+                answer = parse_answer(line)
+                if answer is None:
+                    continue
+                missed = []
+                with sent_lock:
+                    if not sent or (sent[0] != answer.ip and answer.ip not in sent):
+                        continue  # not asked for, or already answered
+                    while sent[0] != answer.ip:
+                        missed.append(sent.popleft())  # skipped by the server, e.g. after an error line
+                    sent.popleft()
+                for ip in missed:
+                    yield ip, None
+                yield answer.ip, answer
+        except OSError as e:  # includes socket.timeout
+            if not writer_error:
+                raise WhoisError(f"{host}:{port} {e}") from e
+        finally:
+            close(sock)  # also stops a writer still sending when the answers are no longer wanted
+            writer.join()
+
+        if writer_error:
+            raise WhoisError(f"{host}:{port} {writer_error[0]}")
+        for ip in sent:
+            yield ip, None  # the server closed before answering these
+
+
+def close(sock):
+    """ Shuts sock down before closing it, which wakes a thread blocked sending on it """
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
@@ -0,0 +1,118 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = "recon-output/cache/whois-cache.sqlite"
+
+# seconds an answer stays fresh, by kind of query. dns_a entries use the record's own TTL when it is known
+DEFAULT_TTLS = {"ip": 7 * 24 * 60 * 60,
+                "domain": 24 * 60 * 60,
+                "dns_a": 60 * 60}
+
+
+class WhoisCache:
+    """ Persistent cache of raw whois text and DNS answers, stored in sqlite.
+
+    Entries are keyed by (kind, query) where kind is "ip", "domain" or "dns_a". Every entry has its own expiry time,
+    and once the cache holds more than max_entries rows the least recently used ones are evicted.
+
+    The raw text is cached rather than the parsed fields, so a hit still goes through filter_ip_whois() /
+    filter_domain_whois() and picks up any change made to whois_parser.py.
+    """
+
+    EVICT_EVERY = 100  # puts between two eviction passes
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=100000, ttls=None, refresh=False):
+        """
+        Params:
+            path :: sqlite file, created along with its directory if missing
+            max_entries :: size cap, least recently used entries are evicted past it
+            ttls :: overrides for DEFAULT_TTLS
+            refresh :: never answer from the cache, but still store fresh answers in it
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # one connection shared by every worker thread, serialised by the lock
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS whois_cache ("
+                           "kind TEXT NOT NULL, query TEXT NOT NULL, value TEXT NOT NULL, "
+                           "expires_at REAL NOT NULL, last_access REAL NOT NULL, "
+                           "PRIMARY KEY (kind, query))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS whois_cache_lru ON whois_cache (last_access)")
+        self._conn.execute("DELETE FROM whois_cache WHERE expires_at < ?", (time.time(),))
+        self._conn.commit()
+
+    def get(self, kind, query):
+        """ Returns the cached text for (kind, query), or None if it is missing, expired or refresh is set """
+
+        if self.refresh:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM whois_cache WHERE kind = ? AND query = ?",
+                                     (kind, query)).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE whois_cache SET last_access = ? WHERE kind = ? AND query = ?",
+                               (now, kind, query))
+            self._conn.commit()
+            self.hits += 1
+        return row[0]
+
+    def put(self, kind, query, value, ttl=None):
+        """ Stores value for (kind, query). ttl defaults to the kind's entry in self.ttls """
+
+        if ttl is None:
+            ttl = self.ttls[kind]
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO whois_cache (kind, query, value, expires_at, last_access) "
+                               "VALUES (?, ?, ?, ?, ?)", (kind, query, value, now + ttl, now))
+            self._puts += 1
+            if self._puts % self.EVICT_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """ Drops the least recently used entries past max_entries. Caller must hold self._lock """
+
+        self._conn.execute("DELETE FROM whois_cache WHERE rowid IN ("
+                           "SELECT rowid FROM whois_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                           (self.max_entries,))
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+            self._conn.close()
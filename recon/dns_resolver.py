@@ -0,0 +1,204 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import asyncio
+import ipaddress
+import sys
+import threading
+import time
+
+import dns.asyncresolver
+import dns.exception
+import dns.nameserver
+import dns.resolver
+import dns.reversename
+
+from recon import profiling
+from recon.scope_input import is_ip_address
+
+DNS_PORT = 53
+NEGATIVE_TTL = 300  # seconds a missing name is remembered when the answer carries no SOA to take it from
+
+# record type -> kind under which recon.cache.WhoisCache keeps it. dns_a is the kind Whois.lookup() always used
+CACHE_KINDS = {"A": "dns_a", "AAAA": "dns_aaaa", "PTR": "dns_ptr"}
+
+
+def parse_nameserver(value):
+    """ '192.0.2.53', '192.0.2.53:5353', '2001:db8::53' or '[2001:db8::53]:5353' -> (address, port) """
+
+    address, port = value, DNS_PORT
+    if value.startswith("["):
+        address, _, port = value[1:].partition("]")
+        port = int(port.lstrip(":") or DNS_PORT)
+    elif value.count(":") == 1:
+        address, _, port = value.partition(":")
+        port = int(port)
+    ipaddress.ip_address(address)  # argparse turns the ValueError into a usage error
+    return address, port
+
+
+class DnsResolver:
+    """ Batch DNS lookups (A, AAAA, PTR) on dnspython's asyncio resolver.
+
+    Answers are kept in memory for their TTL, and names that do not exist (NXDOMAIN) or have no record of the
+    type (NODATA) for the negative TTL of the zone's SOA, so a name asked for twice in a run goes out once.
+    With a recon.cache.WhoisCache the answers also outlive the run. Failures (timeouts, SERVFAIL) are reported
+    on stderr and not remembered.
+
+    Safe to share between worker threads: each blocking call runs its own event loop.
+    """
+
+    def __init__(self, nameservers=None, concurrency=100, timeout=3.0, cache=None, rdtypes=("A",)):
+        """
+        Params:
+            nameservers :: [(address, port)] to ask instead of the ones in /etc/resolv.conf, e.g. a local stand-in
+            concurrency :: queries in flight at the same time within one batch
+            timeout :: seconds allowed for one query, retries included
+            cache :: optional recon.cache.WhoisCache
+            rdtypes :: record types addresses() asks for a name. ("A", "AAAA") adds the IPv6 addresses, and with
+                       them an IP whois and an output row for each in verify_domain
+        """
+        self.concurrency = concurrency
+        self.cache = cache
+        self.rdtypes = tuple(rdtypes)
+
+        self._resolver = dns.asyncresolver.Resolver(configure=not nameservers)
+        if nameservers:
+            self._resolver.nameservers = [dns.nameserver.Do53Nameserver(address, port)
+                                          for address, port in nameservers]
+        self._resolver.lifetime = timeout
+
+        self._answers = {}  # (record type, name) -> (expires at, tuple of record texts)
+        self._lock = threading.Lock()
+
+    def cached(self, name, rdtype):
+        """ Returns the remembered records of (name, rdtype), () for a remembered negative answer, or None """
+
+        key = (rdtype, name)
+        with self._lock:
+            entry = self._answers.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    return entry[1]
+                del self._answers[key]
+
+        if self.cache:
+            text = self.cache.get(CACHE_KINDS[rdtype], name)
+            if text is not None:
+                records = tuple(text.split("\n")) if text else ()
+                with self._lock:
+                    # the sqlite expiry is not read back, keep it in memory for the shortest sensible time
+                    self._answers[key] = (time.time() + NEGATIVE_TTL, records)
+                return records
+        return None
+
+    def remember(self, name, rdtype, records, ttl):
+        with self._lock:
+            self._answers[(rdtype, name)] = (time.time() + ttl, records)
+        if self.cache:
+            self.cache.put(CACHE_KINDS[rdtype], name, "\n".join(records), ttl=ttl)
+
+    @staticmethod
+    def negative_ttl(response):
+        """ Seconds a negative response may be remembered: min(SOA TTL, SOA MINIMUM) as in RFC 2308 """
+        try:
+            return max(0, response.resolve_chaining().minimum_ttl) if response is not None else NEGATIVE_TTL
+        except dns.exception.DNSException:
+            return NEGATIVE_TTL
+
+    async def _resolve(self, name, rdtype, limit):
+        records = self.cached(name, rdtype)
+        if records is not None:
+            return records
+
+        qname = dns.reversename.from_address(name) if rdtype == "PTR" else name
+        async with limit:
+            try:
+                answer = await self._resolver.resolve(qname, rdtype, raise_on_no_answer=False)
+            except dns.resolver.NXDOMAIN as e:
+                self.remember(name, rdtype, (), self.negative_ttl(e.response(e.qnames()[0])))
+                return ()
+            except dns.exception.DNSException as e:  # timeouts, SERVFAIL, no nameservers left
+                print(f"DnsResolver Warning: {rdtype} {name}:", e, file=sys.stderr)
+                return ()
+
+        records = tuple(rr.to_text().rstrip(".") if rdtype == "PTR" else rr.to_text() for rr in answer.rrset or ())
+        # answer.expiration holds the record TTL, or the negative TTL for NODATA
+        self.remember(name, rdtype, records, max(0, int(answer.expiration - time.time())))
+        return records
+
+    async def resolve_all(self, queries):
+        """ Resolves every (name, record type) at once and returns their record tuples in input order. PTR
+        queries take the IP address as name
+        """
+        limit = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._resolve(name, rdtype, limit) for name, rdtype in queries))
+
+    def resolve(self, queries):
+        """ Blocking wrapper around resolve_all() """
+        queries = list(queries)
+        hits = [self.cached(name, rdtype) for name, rdtype in queries]  # once each, an entry may expire meanwhile
+        if all(hit is not None for hit in hits):
+            return hits  # no event loop needed
+        with profiling.timer("dns_resolve"):
+            return asyncio.run(self.resolve_all(queries))
+
+    def addresses_batch(self, names, rdtypes=None):
+        """ {name: [addresses]} for every name, IPv4 first. Names that do not resolve map to []
+
+        rdtypes :: record types to ask for, self.rdtypes by default
+        """
+
+        rdtypes = rdtypes or self.rdtypes
+        names = list(dict.fromkeys(names))
+        records = iter(self.resolve((name, rdtype) for name in names for rdtype in rdtypes))
+        return {name: [address for rdtype in rdtypes for address in next(records)] for name in names}
+
+    def reverse_batch(self, addresses):
+        """ {address: first PTR name or None} for every IP address """
+
+        addresses = list(dict.fromkeys(addresses))
+        records = self.resolve((address, "PTR") for address in addresses)
+        return {address: names[0] if names else None for address, names in zip(addresses, records)}
+
+    def addresses(self, name, rdtypes=None):
+        return self.addresses_batch([name], rdtypes)[name]
+
+    def reverse(self, address):
+        return self.reverse_batch([address])[address]
+
+    def prefetch(self, entries, reverse=False, chunk_size=500):
+        """ Passes entries (scope names or IP addresses) through unchanged, resolving them chunk_size at a time
+        ahead of the workers, which then find the answers in memory. reverse asks PTR for the IP addresses
+        """
+
+        chunk = []
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                yield from self._prefetch_chunk(chunk, reverse)
+                chunk = []
+        yield from self._prefetch_chunk(chunk, reverse)
+
+    def _prefetch_chunk(self, chunk, reverse):
+        ips = []
+        names = []
+        for entry in chunk:
+            (ips if is_ip_address(entry) else names).append(entry)
+
+        if names:
+            self.addresses_batch(names)
+        if ips and reverse:
+            self.reverse_batch(ips)
+        return chunk
@@ -0,0 +1,181 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import asyncio
+import collections
+import ipaddress
+import ssl
+import urllib.parse
+
+from recon import profiling
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def insecure_ssl_context():
+    """ TLS without certificate or hostname checks, same as curl -k """
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def parse_status_line(line):
+    """ b'HTTP/1.1 301 Moved Permanently\\r\\n' -> 301, None if the line is not an HTTP status line """
+    parts = line.decode("latin-1").split(" ")
+    if len(parts) >= 2 and parts[0].upper().startswith("HTTP/") and parts[1].strip().isdigit():
+        return int(parts[1])
+    return None
+
+
+class HttpProber:
+    """ Sends HEAD requests with asyncio streams and returns the status code of the first response, the way
+    `curl -I -k -s --max-time 4` did. Redirects are not followed.
+
+    concurrency caps the requests in flight overall and per_host caps them per host name, so a list with many
+    entries for one host does not hammer it.
+
+    Before any request, every host:port is checked with a plain TCP connect and a short connect_timeout, all at
+    once. URLs whose port is closed or filtered get None straight away, so a dead host costs one connect timeout
+    instead of a full request timeout per scheme.
+    """
+
+    def __init__(self, concurrency=50, per_host=4, timeout=4.0, ports=None, connect_timeout=1.0,
+                 connect_concurrency=256, extra_ports=()):
+        """
+        Params:
+            concurrency :: requests in flight at the same time
+            per_host :: requests in flight at the same time to one host
+            timeout :: seconds allowed for connecting, sending and reading the status line of one request
+            ports :: {"http": port, "https": port} used when a URL does not name its own port
+            connect_timeout :: seconds allowed for the TCP connect pre-check, 0 or None skips the pre-check
+            connect_concurrency :: pre-check connects in flight at the same time
+            extra_ports :: ports beyond http / https to look for web services on, see web_urls()
+        """
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.ports = dict(DEFAULT_PORTS, **(ports or {}))
+        self.connect_timeout = connect_timeout
+        self.connect_concurrency = connect_concurrency
+        self.extra_ports = tuple(extra_ports)
+        self.ssl_context = insecure_ssl_context()
+
+    def target(self, url):
+        """ (host, port) a URL connects to """
+        parts = urllib.parse.urlsplit(url)
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        return parts.hostname, port or self.ports.get(parts.scheme)
+
+    def web_urls(self, entries):
+        """ Yields (url, extra) for every entry (host, host:port or IP): its http:// and https:// URLs, then, when
+        the entry names no port, both URLs of every extra port. Only extra URLs that answer are worth reporting
+        """
+
+        for entry in entries:
+            for scheme in DEFAULT_PORTS:
+                yield f"{scheme}://{entry}", False
+            if ":" not in entry.split("/")[0]:  # host:port and IPv6 addresses are left as they are
+                for port in self.extra_ports:
+                    for scheme in DEFAULT_PORTS:
+                        yield f"{scheme}://{entry}:{port}", True
+
+    async def is_open(self, host, port, limit):
+        """ True if a TCP connection to host:port is accepted within connect_timeout """
+
+        if not host or not port:
+            return False
+        async with limit:
+            try:
+                with profiling.timer("tcp_connect"):
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port),
+                                                            self.connect_timeout)
+            except (OSError, asyncio.TimeoutError, UnicodeError, ValueError):
+                return False
+        writer.close()
+        return True
+
+    async def head(self, url):
+        """ Returns the status code for url, or None when there was no (valid) response in time """
+
+        parts = urllib.parse.urlsplit(url)
+        host = parts.hostname
+        if not host:
+            return None
+
+        port = parts.port or self.ports[parts.scheme]
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        tls = None
+        server_hostname = None
+        if parts.scheme == "https":
+            tls = self.ssl_context
+            try:
+                ipaddress.ip_address(host)
+            except ValueError:
+                server_hostname = host  # SNI only makes sense for names
+
+        host_header = parts.netloc.rsplit("@", 1)[-1]
+        request = (f"HEAD {path} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: recon\r\nAccept: */*\r\n"
+                   f"Connection: close\r\n\r\n").encode("latin-1", errors="replace")
+
+        writer = None
+        try:
+            reader, writer = await asyncio.open_connection(host, port, ssl=tls, server_hostname=server_hostname)
+            writer.write(request)
+            await writer.drain()
+            return parse_status_line(await reader.readline())
+        except (OSError, ssl.SSLError, asyncio.IncompleteReadError, ValueError, UnicodeError):
+            return None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def _probe(self, url, limit, host_limits):
+        host = urllib.parse.urlsplit(url).hostname
+        async with limit, host_limits[host]:
+            try:
+                with profiling.timer("http_head", url.partition(":")[0]):
+                    return await asyncio.wait_for(self.head(url), self.timeout)
+            except asyncio.TimeoutError:
+                return None
+
+    async def _checked_probe(self, url, checks, limit, host_limits):
+        if checks is not None and not await checks[self.target(url)]:
+            return None  # closed or filtered, no request needed
+        return await self._probe(url, limit, host_limits)
+
+    async def probe_all(self, urls):
+        """ Probes every url at once, within the concurrency limits. Returns the status codes in input order.
+        The requests to a host:port start as soon as its own connect pre-check succeeds, http and https together
+        """
+
+        checks = None
+        if self.connect_timeout:
+            connect_limit = asyncio.Semaphore(self.connect_concurrency)
+            checks = {target: asyncio.ensure_future(self.is_open(*target, connect_limit))
+                      for target in dict.fromkeys(self.target(url) for url in urls)}
+
+        limit = asyncio.Semaphore(self.concurrency)
+        host_limits = collections.defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        return await asyncio.gather(*(self._checked_probe(url, checks, limit, host_limits) for url in urls))
+
+    def probe(self, urls):
+        """ Blocking wrapper around probe_all() """
+        return asyncio.run(self.probe_all(list(urls)))
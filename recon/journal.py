@@ -0,0 +1,103 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import ipaddress
+import os
+import threading
+
+from recon.netblocks import address_key
+from recon.scope_input import AddressSet
+
+
+class Journal:
+    """ Append-only list of the queries an assessment run has finished, one per line, so an interrupted run can
+    be resumed with --resume without querying or writing anything twice.
+
+    Completion is tracked per query, not per line offset, so it works whatever order parallel workers finish in.
+    Queries are marked pending with mark(), called by the output sink once all their rows are buffered (see
+    recon.sinks.ResultSink.write_many()), and only written to the journal by flush(), which is hooked to the sink's
+    flush: a query is journalled in the same flush as its rows, never before and never a flush later.
+    """
+
+    def __init__(self, path, resume=False):
+        """
+        Params:
+            path :: journal file, e.g. recon-output/verify-domain/<assessment id>-journal.txt
+            resume :: load the queries already in the journal. Without it the journal starts over
+        """
+        self.path = path
+        self._addresses = AddressSet()  # IPs are kept as intervals so a resumed /12 stays small
+        self._names = set()
+        self._pending = []
+        # reentrant: the sinks' signal handler flushes the journal, maybe while the main thread is in is_done()
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        if resume and os.path.exists(path):
+            with open(path, "r") as file_to_read:
+                for line in file_to_read:
+                    if line.strip():
+                        self._remember(line.strip())
+
+        self._file = open(path, "a" if resume else "w")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self._names) + sum(end - start + 1 for start, end in zip(self._addresses.starts,
+                                                                          self._addresses.ends))
+
+    def _remember(self, query):
+        try:
+            key = address_key(ipaddress.ip_address(query))
+        except ValueError:
+            self._names.add(query)
+            return
+        self._addresses.add(key, key)
+
+    def is_done(self, query):
+        """ True if query was finished by this or a previous run """
+        with self._lock:
+            try:
+                return address_key(ipaddress.ip_address(query)) in self._addresses
+            except ValueError:
+                return query in self._names
+
+    def mark(self, query):
+        """ Marks query as finished, it is written to the journal on the next flush() """
+        with self._lock:
+            self._remember(query)
+            self._pending.append(query)
+
+    def flush(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._pending:
+                self._file.write("".join(query + "\n" for query in self._pending))
+                self._pending = []
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._file.close()
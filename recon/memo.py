@@ -0,0 +1,72 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import concurrent.futures
+import threading
+
+
+class SingleFlight:
+    """ Run-wide memo shared by worker threads, where each key is computed at most once.
+
+    The first thread to ask for a key computes it. Threads asking for the same key meanwhile wait for that
+    result instead of starting a second computation, and every later call gets the stored value. A computation
+    that raises is not remembered: the waiting threads get the exception, and the next call tries again.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._futures = {}  # key -> concurrent.futures.Future, done once the value is known
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._futures)
+
+    def __contains__(self, key):
+        future = self._futures.get(key)
+        return future is not None and future.done()
+
+    def get(self, key, compute):
+        """ Returns the value for key, calling compute() for it only if no other call did or is doing so """
+
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = concurrent.futures.Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            return future.result()  # waits while the leader is still computing
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._futures[key]
+            future.set_exception(e)
+            raise
+        future.set_result(value)
+        return value
+
+    def replace(self, key, value):
+        """ Stores value for key in place of the one computed, e.g. the parsed fields of a raw whois answer. Calls
+        already waiting for the old value still get the old value
+        """
+        future = concurrent.futures.Future()
+        future.set_result(value)
+        with self._lock:
+            self._futures[key] = future
@@ -0,0 +1,168 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import bisect
+import ipaddress
+import json
+import os
+import threading
+
+IPV6_OFFSET = 1 << 32  # IPv6 keys are shifted past the IPv4 space so both versions share one sorted index
+
+
+def address_key(address):
+    """ Maps an IPv4/IPv6 address (str or ipaddress object) to the integer used as index key """
+    address = ipaddress.ip_address(address)
+    if address.version == 6:
+        return int(address) + IPV6_OFFSET
+    return int(address)
+
+
+def network_bounds(cidr):
+    """ Returns the (start, end) index keys of a CIDR string such as '104.16.0.0/13' """
+    network = ipaddress.ip_network(cidr.strip(), strict=False)
+    return address_key(network.network_address), address_key(network.broadcast_address)
+
+
+def split_cidrs(cidrs):
+    """ Whois CIDR values may hold several blocks per line ('104.16.0.0/13, 104.24.0.0/14'). Yields each
+    block string, skipping anything that does not parse
+    """
+    for value in cidrs or ():
+        for cidr in value.split(","):
+            try:
+                ipaddress.ip_network(cidr.strip(), strict=False)
+            except ValueError:
+                continue
+            yield cidr.strip()
+
+
+class NetblockIndex:
+    """ Interval index of the netblocks seen so far in a run.
+
+    Intervals are kept disjoint in three parallel lists (starts, ends, values) sorted by start, so finding the
+    block an address falls in is a single bisect. When a block overlaps blocks already stored, the stored ones win
+    and only the uncovered gaps of the new block are added: they were learnt from a query inside them, so they are
+    at least as specific.
+    """
+
+    def __init__(self, path=None):
+        """
+        path :: optional JSON file the index is loaded from and saved to, so it can be reused between runs
+        """
+        self.path = path
+        self.starts = []
+        self.ends = []
+        self.values = []
+        self.hits = 0
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def find(self, address):
+        """ Returns the value stored for the block holding address, or None """
+
+        try:
+            key = address_key(address)
+        except ValueError:
+            return None
+
+        with self._lock:
+            pos = bisect.bisect_right(self.starts, key) - 1
+            if pos >= 0 and key <= self.ends[pos]:
+                self.hits += 1
+                return self.values[pos]
+        return None
+
+    def add(self, address, cidrs, value):
+        """ Stores value for the most specific block in cidrs that holds address.
+
+        Params:
+            address :: the IP that was queried
+            cidrs :: CIDR strings from the whois answer (Whois.ip_cidr)
+            value :: what find() should return for any address in the block
+
+        Return:
+            True if a block was stored
+        """
+
+        try:
+            key = address_key(address)
+        except ValueError:
+            return False
+
+        best = None
+        for cidr in split_cidrs(cidrs):
+            start, end = network_bounds(cidr)
+            if start <= key <= end and (best is None or end - start < best[1] - best[0]):
+                best = (start, end)
+
+        if best is None:  # answer does not say which block the address belongs to
+            return False
+
+        with self._lock:
+            self._insert(best[0], best[1], value)
+        return True
+
+    def _insert(self, start, end, value):
+        """ Adds the parts of [start, end] not already covered. Caller must hold self._lock """
+
+        pos = bisect.bisect_right(self.starts, start) - 1
+        if pos < 0 or self.ends[pos] < start:
+            pos += 1
+
+        cursor = start
+        while cursor <= end:
+            if pos < len(self.starts) and self.starts[pos] <= cursor:  # cursor is inside a stored block, skip it
+                cursor = self.ends[pos] + 1
+                pos += 1
+                continue
+
+            gap_end = end
+            if pos < len(self.starts):
+                gap_end = min(end, self.starts[pos] - 1)
+
+            self.starts.insert(pos, cursor)
+            self.ends.insert(pos, gap_end)
+            self.values.insert(pos, value)
+            cursor = gap_end + 1
+            pos += 1
+
+    def load(self):
+        with open(self.path, "r") as file_to_read:
+            blocks = json.load(file_to_read)
+
+        with self._lock:
+            for start, end, value in blocks:
+                self._insert(start, end, value)
+
+    def save(self):
+        """ Writes the index to self.path, if one was given """
+
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with self._lock:
+            blocks = list(zip(self.starts, self.ends, self.values))
+
+        with open(self.path, "w") as file_to_write:
+            json.dump(blocks, file_to_write)
@@ -0,0 +1,158 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import collections
+import concurrent.futures
+import itertools
+import json
+import os
+
+from recon import parser_engine
+from recon import profiling
+
+PARSERS = {"domain": parser_engine.parse_domain_whois, "ip": parser_engine.parse_ip_whois}
+
+
+def parse_texts(texts):
+    """ [(kind, raw whois text)] -> [{attribute name: WhoisSet or None}], kind is "domain" or "ip" """
+    parsed = []
+    for kind, raw in texts:
+        with profiling.timer("parse_" + kind):
+            parsed.append(PARSERS[kind](raw))
+    return parsed
+
+
+def parse_chunk(chunk, profile=False):
+    """ Runs in the worker processes: parse_texts() for every job of a chunk. Returns the parsed jobs and, with
+    profile, the [(stage, seconds)] samples of the parsing, which the run's profiler in the parent does not see
+    """
+
+    if not profile:
+        return [parse_texts(texts) for texts in chunk], []
+
+    profiler = profiling.enable()  # the worker's own, for this chunk only
+    try:
+        parsed = [parse_texts(texts) for texts in chunk]
+    finally:
+        profiling.disable()
+    return parsed, [(stage, seconds) for stage, samples in profiler.stages.items() for seconds in samples]
+
+
+class ParsePool:
+    """ Parses raw whois text in worker processes, so the regexes run outside the GIL and away from the threads
+    waiting on the network.
+
+    Jobs are sent in chunks of chunk_size to keep the pickling overhead low, at most 2 * processes chunks are in
+    flight, and results come back in input order.
+    """
+
+    def __init__(self, processes=None, chunk_size=64):
+        """
+        Params:
+            processes :: worker processes, defaults to the number of CPUs
+            chunk_size :: jobs sent to a worker at once
+        """
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=processes)
+        self.window = (processes or os.cpu_count() or 1) * 2
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def map(self, jobs):
+        """ jobs :: iterable of (payload, [(kind, raw whois text)]), consumed lazily.
+        Yields (payload, [parsed fields, one dict per text]) in input order. Only the texts go to the workers
+        """
+
+        jobs = iter(jobs)
+        pending = collections.deque()
+
+        def submit():
+            chunk = list(itertools.islice(jobs, self.chunk_size))
+            if chunk:
+                texts = [job_texts for payload, job_texts in chunk]
+                pending.append((chunk, self._executor.submit(parse_chunk, texts, profiling.enabled())))
+            return bool(chunk)
+
+        while len(pending) < self.window and submit():
+            pass
+
+        while pending:
+            chunk, future = pending.popleft()
+            with profiling.timer("parse_pool_wait"):  # the parsing itself happens in the workers
+                results, samples = future.result()
+            for stage, seconds in samples:
+                profiling.record(stage, seconds)
+            submit()
+            for (payload, job_texts), parsed in zip(chunk, results):
+                yield payload, parsed
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class RawArchive:
+    """ JSON lines file of the WhoisRecords of a run, raw whois text included, one line per scope entry:
+    {"query": ..., "records": [record, ...]}. The reparse command rebuilds the output files from it offline
+    """
+
+    def __init__(self, path, mode="a"):
+        self.path = path
+        self._file = open(path, mode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def record_dict(record):
+        """ WhoisRecord -> JSON friendly dict, sets become sorted lists """
+        return {key: sorted(value) if isinstance(value, set) else value for key, value in record._asdict().items()}
+
+    def write(self, query, records):
+        self._file.write(json.dumps({"query": query, "records": [self.record_dict(r) for r in records]}) + "\n")
+
+    def flush(self):
+        if not self._file.closed:  # the sink this is hooked to may flush one last time after the archive closed
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    @staticmethod
+    def read(path, record_class, set_class):
+        """ Yields (query, [record_class]) for every line of the archive at path. Lists become set_class again """
+
+        with open(path) as archive:
+            for line in archive:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                records = [record_class(**{key: set_class(value) if isinstance(value, list) else value
+                                           for key, value in record.items()})
+                           for record in entry["records"]]
+                yield entry["query"], records
+
+
+def parse_all(jobs, pool=None):
+    """ ParsePool.map() when a pool is given, otherwise the same parsing done in this process """
+    if pool is not None:
+        return pool.map(jobs)
+    return ((payload, parse_texts(texts)) for payload, texts in jobs)
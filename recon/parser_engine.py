@@ -0,0 +1,198 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import re
+
+from recon.whois_parser import domain_regex_dict, ip_regex_dict, format_specific_patterns, format_signatures
+
+# Whois attribute name -> key of the pattern list in whois_parser.py
+DOMAIN_FIELDS = {"registrar": "registrar",
+                 "registrant_organization": "registrant",
+                 "tech_organization": "tech_org",
+                 "name_server": "name_server",
+                 "organisation": "organisation"}
+IP_FIELDS = {"ip_cidr": "ip_cidr",
+             "ip_organization": "ip_organization",
+             "ip_city": "ip_city",
+             "ip_country": "ip_country",
+             "ip_region": "ip_region",
+             "ip_custname": "ip_custname"}
+
+
+class WhoisSet(set):
+    """ set of lowercase matches, printed the way the CSV files and terminal output expect """
+    def __str__(self):
+        return ", ".join(map(repr, self))
+
+
+def alternates(source):
+    """ True if source has a | outside of any group: 'a|b', not 'a(b|c)' or 'a[|]'. A | inside a group closed
+    before it was opened counts too, literal_prefix() strips a leading '(?:' whose alternatives start the match
+    """
+
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 1  # escaped, whatever it is
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            if source[i + 1:i + 2] == "^":
+                i += 1
+            if source[i + 1:i + 2] == "]":  # a ] right after [ or [^ is part of the class
+                i += 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth <= 0:
+            return True
+        i += 1
+    return False
+
+
+def literal_prefix(source):
+    """ Returns the lowercase text every match of the pattern source starts with, e.g. 'registrar:' for
+    'registrar:\\s*(?P<val>.+)', or '' when the pattern does not start with plain text or has alternatives at the
+    top level, which may start with anything
+    """
+
+    if source.startswith("(?:"):
+        source = source[3:]
+    if alternates(source):
+        return ""
+
+    literal = []
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char == "\\" and i + 1 < len(source) and not source[i + 1].isalnum():  # escaped punctuation like \.
+            char = source[i + 1]
+            i += 1
+        elif char in ".^$*+?{}[]|()\\":
+            break
+        literal.append(char)
+        i += 1
+
+    if literal and i < len(source) and source[i] in "*?{":  # last char is optional
+        literal.pop()
+    return "".join(literal).lower()
+
+
+class CompiledPattern:
+    """ A pattern from whois_parser.py compiled once, plus the registry formats it is restricted to (empty = any)
+    and the literal text its matches start with, used to skip the regex when that text is not in the response
+    """
+
+    __slots__ = ("source", "regex", "formats", "literal")
+
+    def __init__(self, source, fmt=None):
+        """
+        Params:
+            source :: the regex
+            fmt :: registry format (key of whois_parser.format_signatures), or a tuple of them, the pattern is
+                   restricted to. None for a pattern tried on every response
+        """
+        self.source = source
+        self.regex = re.compile(source, re.IGNORECASE)
+        self.formats = frozenset((fmt,) if isinstance(fmt, str) else fmt or ())
+        self.literal = literal_prefix(source)
+
+
+def compile_fields(regex_dict, fields):
+    """ Compiles the pattern lists of regex_dict into {attribute name: [CompiledPattern]}.
+
+    Patterns with more than one group are left out: re.findall() returns tuples for them, which
+    Whois.whois_regex_process() has always skipped, so they can never add a value. Most are the multi-line
+    registrant patterns with [\\s\\S]* segments, and leaving them out is what keeps parsing linear in the response size.
+    """
+
+    compiled = {}
+    for attribute, key in fields.items():
+        compiled[attribute] = []
+        for source in regex_dict[key]:
+            pattern = CompiledPattern(source, format_specific_patterns.get(source))
+            if pattern.regex.groups <= 1:
+                compiled[attribute].append(pattern)
+    return compiled
+
+
+DOMAIN_PATTERNS = compile_fields(domain_regex_dict, DOMAIN_FIELDS)
+IP_PATTERNS = compile_fields(ip_regex_dict, IP_FIELDS)
+
+_known_patterns = {source for patterns in domain_regex_dict.values() for source in patterns}
+for _source in format_specific_patterns:
+    if _source not in _known_patterns:  # keeps format_specific_patterns in step with the pattern lists
+        raise ValueError(f"format_specific_patterns entry is not in domain_regex_dict: {_source!r}")
+
+
+def fingerprint(data, lowered=None):
+    """ Returns the set of registry formats (keys of whois_parser.format_signatures) recognised in data.
+    Signatures are plain substrings, much cheaper to look for than case-insensitive regexes.
+
+    lowered :: data.lower(), if the caller already has it
+    """
+    if lowered is None:
+        lowered = data.lower()
+    return {fmt for fmt, markers in format_signatures.items() if any(marker in lowered for marker in markers)}
+
+
+def extract(patterns, data, formats=None, lowered=None):
+    """ Runs the compiled patterns against data and returns a WhoisSet of the lowercase matches, or None.
+
+    formats :: result of fingerprint(). Format specific patterns only run when one of their formats is in it, or
+               when formats is empty (nothing recognised, so try everything)
+    lowered :: data.lower(). When given, patterns whose literal prefix is not in it are skipped without running
+    """
+
+    result_list = []
+    for pattern in patterns:
+        if pattern.formats and formats and pattern.formats.isdisjoint(formats):
+            continue
+        if lowered is not None and pattern.literal and pattern.literal not in lowered:
+            continue
+        result_list += [match.lower() for match in pattern.regex.findall(data)]
+
+    if not result_list:
+        return None
+    return WhoisSet(result_list)
+
+
+def parse(compiled_fields, data):
+    """ Parses raw whois text into {attribute name: WhoisSet or None} using compiled_fields """
+
+    if not data:
+        return {attribute: None for attribute in compiled_fields}
+
+    lowered = data.lower()
+    formats = fingerprint(data, lowered)
+    return {attribute: extract(patterns, data, formats, lowered) for attribute, patterns in compiled_fields.items()}
+
+
+def parse_domain_whois(data):
+    """ Parse-only API for raw domain whois text, no network involved. Keys are the Whois attribute names:
+    registrar, registrant_organization, tech_organization, name_server, organisation
+    """
+    return parse(DOMAIN_PATTERNS, data)
+
+
+def parse_ip_whois(data):
+    """ Parse-only API for raw IP whois text, no network involved. Keys are the Whois attribute names:
+    ip_cidr, ip_organization, ip_city, ip_country, ip_region, ip_custname
+    """
+    return parse(IP_PATTERNS, data)
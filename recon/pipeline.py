@@ -0,0 +1,190 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import queue
+import sys
+import threading
+import time
+import traceback
+
+_DONE = object()  # end of input marker, see Stage.input_done()
+
+
+class Stage:
+    """ One step of a Pipeline: worker threads taking items from a bounded inbox, running func on them and handing
+    what it returns to the stages after it. A full inbox blocks whoever feeds it, so a slow stage holds back the
+    ones before it instead of letting items pile up in memory.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=None, batch_size=1):
+        """
+        Params:
+            name :: shown in the summary and in warnings
+            func :: called with one item, or with a list of up to batch_size items when batch_size > 1. Returns an
+                    iterable of items for the next stages, or None
+            workers :: threads running func
+            queue_size :: items the inbox holds before feeding it blocks, defaults to 2 * workers * batch_size
+            batch_size :: items handed to func at once. A worker never waits to fill a batch, it takes what is
+                          queued, so a trickle of input is still handled item by item
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.batch_size = batch_size
+        self.inbox = queue.Queue(queue_size or 2 * workers * batch_size)
+        self.downstream = []
+
+        self.processed = 0
+        self.emitted = 0
+        self.errors = 0
+        self.first_done = None  # time.monotonic() when the first item was finished
+
+        self._feeders = 0
+        self._running = workers
+        self._lock = threading.Lock()
+        self.done = threading.Event()  # set once every worker has finished
+
+    def feed(self, stage):
+        """ Sends what this stage emits to stage as well """
+        self.downstream.append(stage)
+        stage._feeders += 1
+
+    def put(self, item):
+        self.inbox.put(item)
+
+    def input_done(self):
+        """ Called once by every feeder when it has nothing more to send. The last call closes the inbox """
+        with self._lock:
+            self._feeders -= 1
+            closed = self._feeders <= 0
+        if closed:
+            self.inbox.put(_DONE)  # taken and put back by each worker in turn
+
+    def _take(self):
+        """ Blocks for the next item, then takes whatever else is queued up to batch_size. None once closed """
+
+        item = self.inbox.get()
+        if item is _DONE:
+            self.inbox.put(_DONE)
+            return None
+
+        items = [item]
+        while len(items) < self.batch_size:
+            try:
+                item = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                self.inbox.put(_DONE)  # seen again by the next _take()
+                break
+            items.append(item)
+        return items
+
+    def _work(self):
+        for items in iter(self._take, None):
+            try:
+                outputs = list(self.func(items if self.batch_size > 1 else items[0]) or ())
+            except Exception:
+                outputs = []
+                with self._lock:
+                    self.errors += 1
+                print(f"pipeline.Stage Warning: {self.name} failed on {items!r}", file=sys.stderr)
+                traceback.print_exc()
+
+            for output in outputs:
+                for stage in self.downstream:
+                    stage.put(output)
+
+            with self._lock:
+                self.processed += len(items)
+                self.emitted += len(outputs)
+                if self.first_done is None:
+                    self.first_done = time.monotonic()
+
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            for stage in self.downstream:
+                stage.input_done()
+            self.done.set()
+
+    def start(self):
+        for number in range(self.workers):
+            threading.Thread(target=self._work, name=f"{self.name}-{number}", daemon=True).start()
+
+
+class Pipeline:
+    """ Stages connected by bounded queues, all running at the same time: an item leaves the first stage and
+    reaches the last one while later items are still being read from the source.
+
+        pipeline = Pipeline()
+        resolve = pipeline.stage("resolve", resolve_names, workers=2, batch_size=50)
+        pipeline.stage("probe", probe_names, workers=4, after=[resolve])
+        pipeline.run(names)
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.started = None
+        self.finished = None
+
+    def stage(self, name, func, workers=1, after=None, queue_size=None, batch_size=1):
+        """ Adds a Stage (see Stage.__init__()) fed by the stages in after, or by the source when after is None """
+
+        stage = Stage(name, func, workers=workers, queue_size=queue_size, batch_size=batch_size)
+        for upstream in after or ():
+            upstream.feed(stage)
+        self.stages.append(stage)
+        return stage
+
+    def run(self, items):
+        """ Feeds items (any iterable, read lazily in this thread) to the first stages and returns once every
+        stage has finished. An exception raised by items only ends the input, what was read still runs through
+        """
+
+        heads = [stage for stage in self.stages if not stage._feeders]
+        for stage in heads:
+            stage._feeders = 1
+
+        self.started = time.monotonic()
+        for stage in self.stages:
+            stage.start()
+
+        try:
+            for item in items:
+                for stage in heads:
+                    stage.put(item)
+        except Exception:
+            print("pipeline.Pipeline Warning: reading the input failed, finishing what was read", file=sys.stderr)
+            traceback.print_exc()
+        finally:
+            for stage in heads:
+                stage.input_done()
+
+        for stage in self.stages:
+            stage.done.wait()
+        self.finished = time.monotonic()
+
+    def summary(self):
+        """ One line per stage: items in and out, failures and how long after the start its first item was done """
+
+        lines = []
+        for stage in self.stages:
+            first = f"{stage.first_done - self.started:.2f}s" if stage.first_done is not None else "-"
+            lines.append(f"{stage.name}: {stage.processed} in, {stage.emitted} out, {stage.errors} failed, "
+                         f"first done after {first}")
+        if self.finished is not None:
+            lines.append(f"total: {self.finished - self.started:.2f}s")
+        return lines
@@ -0,0 +1,140 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+_profiler = None  # the Profiler of the run once enable() was called
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def percentile(ordered, fraction):
+    """ Nearest-rank percentile of an already sorted list """
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def stats(samples):
+    """ {count, total, p50, p95, max} of a list of durations in seconds """
+    ordered = sorted(samples)
+    return {"count": len(ordered), "total": sum(ordered), "p50": percentile(ordered, 0.50),
+            "p95": percentile(ordered, 0.95), "max": ordered[-1] if ordered else None}
+
+
+class Timer:
+    """ Context manager adding the time spent in its block to a Profiler """
+
+    __slots__ = ("profiler", "stage", "key", "started")
+
+    def __init__(self, profiler, stage, key=None):
+        self.profiler = profiler
+        self.stage = stage
+        self.key = key
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        key = self.key() if callable(self.key) else self.key
+        self.profiler.add(self.stage, elapsed, key)
+
+
+class Profiler:
+    """ Durations per stage, and per key within a stage (e.g. per whois server). Safe to share between threads """
+
+    def __init__(self):
+        self.stages = collections.defaultdict(list)
+        self.keys = collections.defaultdict(lambda: collections.defaultdict(list))
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, key=None):
+        with self._lock:
+            self.stages[stage].append(seconds)
+            if key is not None:
+                self.keys[stage][key].append(seconds)
+
+    def summary(self):
+        """ JSON friendly {"wall": seconds, "stages": {stage: stats}, "keys": {stage: {key: stats}}} """
+        with self._lock:
+            return {"wall": time.perf_counter() - self.started,
+                    "stages": {stage: stats(samples) for stage, samples in sorted(self.stages.items())},
+                    "keys": {stage: {str(key): stats(samples) for key, samples in sorted(keys.items())}
+                             for stage, keys in sorted(self.keys.items())}}
+
+    def report_lines(self):
+        """ The summary as aligned text lines, slowest stages first """
+
+        summary = self.summary()
+        lines = [f"{'stage':<32}{'count':>9}{'total s':>11}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+
+        def line(name, row):
+            return (f"{name:<32}{row['count']:>9}{row['total']:>11.3f}{row['p50'] * 1000:>10.2f}"
+                    f"{row['p95'] * 1000:>10.2f}{row['max'] * 1000:>10.2f}")
+
+        for stage, row in sorted(summary["stages"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(line(stage, row))
+            for key, key_row in sorted(summary["keys"].get(stage, {}).items(), key=lambda item: -item[1]["total"]):
+                lines.append(line("  " + key, key_row))
+        lines.append(f"wall clock {summary['wall']:.3f}s")
+        return lines
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, "w") as report:
+            json.dump(self.summary(), report, indent=2)
+
+
+def enable():
+    """ Starts collecting timings for the rest of the run and returns the Profiler """
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def disable():
+    global _profiler
+    _profiler = None
+
+
+def enabled():
+    return _profiler is not None
+
+
+def record(stage, seconds, key=None):
+    """ Adds a sample timed elsewhere, e.g. in a worker process, when profiling is enabled """
+    if _profiler is not None:
+        _profiler.add(stage, seconds, key)
+
+
+def timer(stage, key=None):
+    """ Times a block as one sample of stage, when profiling is enabled. Otherwise a shared no-op context manager,
+    so instrumented code costs a function call and a global lookup.
+
+    key :: sub-key the sample is also counted under, e.g. the whois server, or a callable returning it, which is
+           only called when profiling
+    """
+    if _profiler is None:
+        return _NULL_TIMER
+    return Timer(_profiler, stage, key)
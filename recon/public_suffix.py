@@ -0,0 +1,82 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import os
+
+# copy of https://publicsuffix.org/list/public_suffix_list.dat (MPL 2.0), bundled so lookups never need the network.
+# Replace the file to update the list
+DEFAULT_LIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "public_suffix_list.dat")
+
+PRIVATE_SECTION = "// ===BEGIN PRIVATE DOMAINS==="
+
+
+def ascii_name(name):
+    """ Lowercase ASCII (punycode) form of a name, so list entries match what DNS and the scope files hold """
+    name = name.lower().rstrip(".")
+    try:
+        return name.encode("idna").decode("ascii")
+    except UnicodeError:
+        return name
+
+
+class PublicSuffixList:
+    """ The rules of the public suffix list, used to find the registrable domain of a host name: the public suffix
+    plus one label, e.g. example.co.uk for www.example.co.uk. That is the name registries hold whois records for.
+
+    Only the ICANN section is used by default. The private section lists suffixes such as github.io, whose hosts
+    share the whois record of the company running the suffix rather than having their own
+    """
+
+    def __init__(self, path=DEFAULT_LIST_PATH, include_private=False):
+        self.path = path
+        self.rules = set()  # co.uk
+        self.wildcards = set()  # parents of *. rules: *.ck -> ck
+        self.exceptions = set()  # !www.ck -> www.ck
+
+        with open(path, encoding="utf-8") as list_file:
+            for line in list_file:
+                line = line.strip()
+                if line == PRIVATE_SECTION and not include_private:
+                    break
+                if not line or line.startswith("//"):
+                    continue
+
+                rule = line.split()[0]
+                if rule.startswith("!"):
+                    self.exceptions.add(ascii_name(rule[1:]))
+                elif rule.startswith("*."):
+                    self.wildcards.add(ascii_name(rule[2:]))
+                else:
+                    self.rules.add(ascii_name(rule))
+
+    def public_suffix(self, name):
+        """ 'www.example.co.uk' -> 'co.uk'. Names under no rule get their last label, as the list's '*' rule says """
+
+        labels = ascii_name(name).split(".")
+        for i in range(len(labels)):  # longest candidate first, so the first match is the prevailing rule
+            candidate = ".".join(labels[i:])
+            if candidate in self.exceptions:
+                return ".".join(labels[i + 1:])
+            if candidate in self.rules or (i + 1 < len(labels) and ".".join(labels[i + 1:]) in self.wildcards):
+                return candidate
+        return labels[-1]
+
+    def registrable_domain(self, name):
+        """ 'www.example.co.uk' -> 'example.co.uk', or None when name is itself a public suffix """
+
+        name = ascii_name(name)
+        suffix = self.public_suffix(name)
+        if name == suffix:
+            return None
+        return ".".join(name.split(".")[-suffix.count(".") - 2:])
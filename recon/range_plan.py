@@ -0,0 +1,91 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import collections
+import re
+import sys
+
+from recon import netblocks
+from recon import scope_input
+
+DEFAULT_MAX_QUERIES = 256  # whois queries one range may use before the rest of it is left uncovered
+
+# allocation lines of the raw answer: ARIN's NetRange, the inetnum / inet6num of the other RIRs. Either a range
+# (a - b) or, for LACNIC, a CIDR
+NETRANGE_PATTERN = re.compile(r"^\s*(?:NetRange|inetnum|inet6num):[ \t]*(?P<val>\S[^\r\n]*)",
+                              re.IGNORECASE | re.MULTILINE)
+
+# first / last / queried are address strings, queried and whois are None for the part of a range left uncovered.
+# fetched is True when the answer came from a whois server, False for cache and netblock hits
+PlannedBlock = collections.namedtuple("PlannedBlock", ("first", "last", "queried", "whois", "fetched"))
+
+
+def answer_blocks(whois):
+    """ (start, end) address keys (see recon.netblocks.address_key()) of every block a WhoisRecord names: its CIDRs
+    and, when it holds the raw text, the NetRange / inetnum lines
+    """
+
+    blocks = [netblocks.network_bounds(cidr) for cidr in netblocks.split_cidrs(whois.ip_cidr)]
+    for match in NETRANGE_PATTERN.finditer(whois.raw_ip_whois or ""):
+        kind, value = scope_input.classify(match.group("val"))
+        if kind == "range":
+            blocks.append((netblocks.address_key(value[0]), netblocks.address_key(value[1])))
+    return blocks
+
+
+def covering_block(key, blocks):
+    """ The smallest of blocks containing the address key, None if none does. Answers often name the parent
+    allocation too, the reassignment inside it is what the address belongs to
+    """
+    containing = [block for block in blocks if block[0] <= key <= block[1]]
+    return min(containing, key=lambda block: block[1] - block[0]) if containing else None
+
+
+def address_count(block):
+    return netblocks.address_key(block.last) - netblocks.address_key(block.first) + 1
+
+
+def walk_range(first, last, lookup, max_queries=DEFAULT_MAX_QUERIES):
+    """ Yields PlannedBlocks covering the addresses first to last (ipaddress objects) in order, with one whois
+    query per allocation instead of one per address: the first uncovered address is looked up, the block its answer
+    names is assigned to the part of the range it overlaps, and the walk goes on after the block.
+
+    An address whose answer names no block containing it, or whose lookup failed, covers only itself. Once
+    max_queries answers came from a whois server (None for no limit) the rest of the range is yielded as one
+    uncovered block, answers from the cache or the netblock index do not count.
+
+    lookup :: callable taking an address string and returning (WhoisRecord, fetched): the record with raw_ip_whois
+              for the NetRange / inetnum lines, or None when the whois failed, and whether a whois server was asked
+    """
+
+    address_class = type(first)
+    offset = netblocks.IPV6_OFFSET if first.version == 6 else 0
+    start, end = netblocks.address_key(first), netblocks.address_key(last)
+
+    queries = 0
+    while start <= end:
+        address = str(address_class(start - offset))
+        if max_queries and queries >= max_queries:
+            print(f"range_plan.walk_range() Warning: stopped after {queries} whois queries, {address} - {last} is "
+                  f"not covered", file=sys.stderr)
+            yield PlannedBlock(address, str(last), None, None, False)
+            return
+
+        whois, fetched = lookup(address)
+        queries += fetched
+        block = covering_block(start, answer_blocks(whois)) if whois is not None else None
+        block_end = min(end, block[1]) if block else start
+
+        yield PlannedBlock(address, str(address_class(block_end - offset)), address, whois, fetched)
+        start = block_end + 1
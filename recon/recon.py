@@ -25,11 +25,53 @@ recon RVA123 verify_domain --file domains.txt
 recon RVA123 web_services -f domains.txt
 """
 import argparse
-import subprocess
+import contextlib
+import functools
+import ipaddress
+import itertools
 import os
 import sys
 
 from recon import Whois as who
+from recon import batch
+from recon import bulk_whois
+from recon import cache as whois_cache
+from recon import dns_resolver
+from recon import http_probe
+from recon import journal
+from recon import memo
+from recon import netblocks
+from recon import parse_pool
+from recon import pipeline
+from recon import profiling
+from recon import public_suffix
+from recon import range_plan
+from recon import rir_stats
+from recon import scope_input
+from recon import sinks
+from recon import subdomain_stream
+from recon import throttle
+from recon import whois_client
+
+WEB_SERVICES_CHUNK = 500  # input lines probed together by enumerate_web_services()
+BULK_WHOIS_CHUNK = 1000  # IPs sent over one bulk whois connection by bulk_scope()
+PIPELINE_DNS_WORKERS = 4  # threads of the resolve stage of scoping_pipeline(), each resolving a batch at once
+PIPELINE_PROBE_WORKERS = 4  # threads of its probe stage, sharing the prober's concurrency
+
+# output columns
+LOCATION_COLUMNS = ["ip", "cidr", "organization", "city", "region", "country", "custName"]
+DOMAIN_COLUMNS = ["domain name", "organisation", "registrar", "registrant organization", "tech organization",
+                  "name server", "ip", "ip cidr", "ip organization", "ip city", "ip region", "ip country",
+                  "ip custName"]
+WEB_SERVICE_COLUMNS = ["URL", "STATUS CODE"]
+BLOCK_COLUMNS = ["first ip", "last ip", "addresses", "queried ip", "cidr", "organization", "city", "region", "country",
+                 "custName"]
+DNS_COLUMNS = ["ip", "fqdn"]
+
+# where each command writes its output, and its --profile report
+OUTPUT_PATHS = {"verify_ip": "recon-output/verify-address", "verify_domain": "recon-output/verify-domain",
+                "web_services": "recon-output/web-service", "subdomains": "recon-output/subdomains",
+                "pipeline": "recon-output/pipeline"}
 
 
 class Bcolors:
@@ -52,6 +94,166 @@ def create_path(path):
     return path
 
 
+def read_entries(file_to_read):
+    """ Yields every stripped, non-empty line of an open input file """
+    for line in file_to_read:
+        if line.strip():  # cleaning file of any empty lines
+            yield line.strip()
+
+
+def read_scope(file_to_read, run_journal=None):
+    """ Yields the IPs and domains of an open scope file: normalised, deduplicated, CIDRs and ranges expanded.
+    See recon.scope_input.iter_scope(). Queries run_journal already holds are skipped
+    """
+    for kind, value in scope_input.iter_scope(file_to_read):
+        if run_journal is None or not run_journal.is_done(value):
+            yield value
+
+
+def prefetch_dns(scope, whois_options, reverse=False):
+    """ Resolves the scope entries in batches ahead of the workers when whois_options holds a DnsResolver """
+    resolver = whois_options.get("resolver")
+    return resolver.prefetch(scope, reverse=reverse) if resolver else scope
+
+
+def bulk_scope(bulk, scope, answers):
+    """ Yields the IPs of scope as their answers from bulk, a recon.bulk_whois.BulkWhois, arrive. The answers are
+    put in the answers dict for the consumer to take out again, so it stays small. scope is read BULK_WHOIS_CHUNK
+    IPs at a time here, in the consumer's thread, and each chunk is asked over its own connection
+    """
+    for chunk in iter(lambda: list(itertools.islice(scope, BULK_WHOIS_CHUNK)), []):
+        for ip, answer in bulk.lookup(chunk):
+            answers[ip] = answer
+            yield ip
+
+
+def fetch_whois(query, whois_options=None):
+    """ Worker half of a batch lookup: a deferred Whois() that has run its DNS and whois queries but not parsed
+    them yet, see Whois.fetch(). The consumer finishes it with parse() and keeps only its record().
+    Raises recon.whois_client.WhoisError when a whois server kept refusing the query, see recon.throttle
+    """
+    return who.Whois(whois_query=query, defer=True, **(whois_options or {})).fetch()
+
+
+def skip_failed(fetch):
+    """ Wraps a fetch function so a query whose whois kept failing gives None instead of ending the run. The
+    consumer leaves it out of the output and the journal, so --resume tries it again
+    """
+
+    @functools.wraps(fetch)
+    def wrapper(query, *args, **kwargs):
+        try:
+            return fetch(query, *args, **kwargs)
+        except whois_client.WhoisError as e:
+            print(f"{Bcolors.WARNING}{query} skipped: {e}{Bcolors.ENDC}", file=sys.stderr)
+            return None
+    return wrapper
+
+
+def parse_stage(lookups, pool=None, whois_of=lambda fetched: [fetched]):
+    """ Parses the deferred Whois() objects of batch.ordered_map() results, in the worker processes of pool (a
+    recon.parse_pool.ParsePool) when given. Yields the same (item, fetched) pairs in the same order, parsed.
+
+    whois_of :: returns the list of deferred Whois() objects held by one fetched result
+    """
+
+    jobs = (((item, fetched), [text for whois in whois_of(fetched) for text in whois.raw_texts()]
+             if fetched is not None else [])
+            for item, fetched in lookups)
+
+    for (item, fetched), parsed in parse_pool.parse_all(jobs, pool):
+        parsed = iter(parsed)
+        for whois in whois_of(fetched) if fetched is not None else ():
+            whois.apply_parsed([next(parsed) for text in whois.raw_texts()])
+        yield item, fetched
+
+
+def record_texts(record):
+    """ [(kind, raw text)] of an archived WhoisRecord, see recon.parse_pool.parse_texts() """
+    return [(kind, raw) for kind, raw in (("domain", record.raw_domain_whois), ("ip", record.raw_ip_whois)) if raw]
+
+
+def open_archive(path, assessment_id, keep_raw, resume, sink):
+    """ Opens the raw whois archive of an assessment run when keep_raw is set, flushed along with the sink """
+
+    if not keep_raw:
+        return contextlib.nullcontext()
+
+    archive = parse_pool.RawArchive(f"{path}/{assessment_id}-raw-whois.jsonl", mode="a" if resume else "w")
+    sink.on_flush(archive.flush)
+    return archive
+
+
+def location_row(ip, whois):
+    """ Row of LOCATION_COLUMNS for a Whois() or WhoisRecord """
+    return [ip, whois.ip_cidr, whois.ip_organization, whois.ip_city, whois.ip_region, whois.ip_country,
+            whois.ip_custname]
+
+
+def block_row(block):
+    """ Row of BLOCK_COLUMNS for a recon.range_plan.PlannedBlock """
+    whois = block.whois or who.WhoisRecord()
+    return [block.first, block.last, range_plan.address_count(block), block.queried, whois.ip_cidr,
+            whois.ip_organization, whois.ip_city, whois.ip_region, whois.ip_country, whois.ip_custname]
+
+
+def domain_rows(domain, whois, ips_dict):
+    """ Rows of DOMAIN_COLUMNS for a domain: one for the first IP, one for every additional IP in ips_dict """
+
+    domain_whois = [domain, whois.organisation, whois.registrar, whois.registrant_organization,
+                    whois.tech_organization, whois.name_server]
+
+    rows = [domain_whois + [whois.ip, whois.ip_cidr, whois.ip_organization, whois.ip_city,
+                            whois.ip_region, whois.ip_country, whois.ip_custname]]
+
+    if ips_dict:
+        for key, ip_whois in ips_dict.items():
+            rows.append(domain_whois + [key, ip_whois.ip_cidr, ip_whois.ip_organization,
+                                        ip_whois.ip_city, ip_whois.ip_region,
+                                        ip_whois.ip_country, ip_whois.ip_custname])
+    return rows
+
+
+def open_journal(path, assessment_id, resume):
+    """ Opens the journal of an assessment run, see recon.journal.Journal. Open it before the output sink and hook
+    it to the sink with hook_journal(), so it is closed after the sink's last flush
+    """
+
+    run_journal = journal.Journal(f"{path}/{assessment_id}-journal.txt", resume=resume)
+    if resume and len(run_journal):
+        print(f"{Bcolors.OKBLUE}Resuming {assessment_id}: {len(run_journal)} queries already done{Bcolors.ENDC}\n")
+    return run_journal
+
+
+def hook_journal(run_journal, sink, *companions):
+    """ Writes the journal on each flush of the output sink, after the companion sinks (None is skipped) were
+    flushed too
+    """
+    for companion in companions:
+        if companion is not None:
+            sink.on_flush(companion.flush)
+    sink.on_flush(run_journal.flush)
+
+
+def positive_int(value):
+    """ argparse type for options such as --workers that need to be 1 or more """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} must be 1 or more")
+    return number
+
+
+def port_list(value):
+    """ argparse type for comma separated TCP ports, '8080,8443' -> (8080, 8443) """
+    try:
+        ports = tuple(int(port) for port in value.split(",") if port.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a comma separated list of ports")
+    if not all(0 < port < 65536 for port in ports):
+        raise argparse.ArgumentTypeError(f"{value} holds a port outside 1-65535")
+    return ports
+
+
 def country_message(query, country, message=''):
     """ Message to print out based on query's country origin.
     Query can be an IP or a domain name
@@ -69,73 +271,239 @@ def country_message(query, country, message=''):
         print(f"{Bcolors.WARNING} {query} could not determine location. Country extracted is None.{Bcolors.ENDC}\n")
 
 
-def verify_ip_address(assessment_id, ip=None, file=None):
+def ip_message(whois, reverse_dns=False):
+    """ Whois information about an IP for country_message() """
+
+    message = f"\n\tIP Organization: {whois.ip_organization}\n"
+    if whois.ip_custname:
+        message += f"\tCustName: {whois.ip_custname}\n"
+    if reverse_dns:
+        message += f"\tFQDN: {whois.fqdn}\n"
+    return message
+
+
+def offline_country(whois, country_index):
+    """ Returns whois (a WhoisRecord) with its country taken from country_index, a recon.rir_stats.CountryIndex,
+    and a line about the RIR delegation for country_message()
+    """
+
+    delegation = country_index.lookup(whois.ip)
+    if delegation is None:
+        return whois, "\tRIR delegation: not found\n"
+
+    if delegation.country:
+        whois = whois._replace(ip_country=who.Whois.Set([delegation.country.lower()]))
+    return whois, f"\tRIR delegation: {delegation.registry}, {delegation.status}\n"
+
+
+def bulk_fields(whois, answer):
+    """ Returns whois (a WhoisRecord) with the country of answer, a recon.bulk_whois.BulkAnswer, and its BGP prefix
+    and AS name as CIDR and organization where whois has none, and a line about the AS for country_message()
+    """
+
+    if answer is None:
+        return whois, "\tBulk whois: no answer\n"
+    if answer.asn is None:
+        return whois, f"\tBulk whois: not routed ({answer.registry})\n"
+
+    fields = {}
+    if answer.country:
+        fields["ip_country"] = who.Whois.Set([answer.country.lower()])
+    if answer.prefix and not whois.ip_cidr:
+        fields["ip_cidr"] = who.Whois.Set([answer.prefix.lower()])
+    if answer.as_name and not whois.ip_organization:
+        fields["ip_organization"] = who.Whois.Set([f"{answer.as_name.lower()} (as{answer.asn})"])
+    return whois._replace(**fields), f"\tAS{answer.asn}: {answer.as_name}, {answer.prefix} ({answer.registry})\n"
+
+
+def verify_ip_address(assessment_id, ip=None, file=None, workers=1, whois_options=None, output_format="csv",
+                      resume=False, pool=None, keep_raw=False, country_index=None, whois_details=False, bulk=None):
     """ This function takes in an IP or a file listed with IPs and outputs a file that contains the
         IP, organization, CIDR, city region, country, and custName.
 
         IF a single IP was entered, then the output will only appear on the terminal
 
-        Output File: recon-output/verify-address-*-Location-Lookups.csv
-
-        Input file: List of ips, where each item is entered line by line with no commas separating them
+        IF workers > 1, up to that many whois lookups run at the same time. Output rows and terminal messages are
+        still written in the same order as the input file
+
+        whois_options :: extra keyword arguments for every Whois(), e.g. {"cache": WhoisCache()}
+        output_format :: csv, jsonl or sqlite (see recon.sinks)
+        resume :: skip the IPs a previous, interrupted run of the same assessment finished
+        pool :: recon.parse_pool.ParsePool to parse the whois answers in, instead of this process
+        keep_raw :: archive the raw whois answers, so reparse_assessment() can rebuild the output offline
+        country_index :: recon.rir_stats.CountryIndex to take the country from, offline. No whois is run then
+                         unless whois_details is set, for the organization, CIDR and custName
+        bulk :: recon.bulk_whois.BulkWhois to take the country, BGP prefix and AS of every IP from, asked over one
+                connection per BULK_WHOIS_CHUNK IPs. No whois is run then unless whois_details is set, as above
+
+        Output File: recon-output/verify-address-*-Location-Lookups.csv (.jsonl, .sqlite)
+        DNS File: recon-output/verify-address-*-DNS-Lookups.txt, when whois_options has reverse_dns
+        Raw File: recon-output/verify-address-*-raw-whois.jsonl, when keep_raw is set
+        Journal File: recon-output/verify-address-*-journal.txt (finished IPs, used by resume)
+
+        Input file: List of ips, where each item is entered line by line with no commas separating them. CIDRs
+                    (10.0.0.0/24) and ranges (10.0.0.1-10.0.0.50 or 10.0.0.1-50) are expanded, duplicates skipped
         Input IP: single ip
     """
-    path = create_path("recon-output/verify-address")
+    path = create_path(OUTPUT_PATHS["verify_ip"])
+    whois_options = whois_options or {}
 
     # files to output
-    location_file_name = f"{path}/{assessment_id}-Location-Lookups.csv"
-    dns_file_name = f"{path}/{assessment_id}-DNS-Lookups.txt" # TODO: Use once fqdn is fixed
+    location_file_name = f"{path}/{assessment_id}-Location-Lookups"
+    dns_file_name = f"{path}/{assessment_id}-DNS-Lookups"
+    reverse_dns = whois_options.get("reverse_dns", False)
+    no_whois = (country_index is not None or bulk is not None) and not whois_details
 
     if file:
         file = file.name
 
-        with open(file, "r") as file_to_read:
-            for line in file_to_read:
-                if line.strip():  # cleaning file of any empty lines
-                    extracted_ip = line.strip()
-                    whois = who.Whois(whois_query=extracted_ip)
-
-                    if whois.ip_custname:
-                        message = f"\n\tIP Organization: {whois.ip_organization}\n" \
-                                  f"\tCustName: {whois.ip_custname}\n"
-                    else:
-                        message = f"\n\tIP Organization: {whois.ip_organization}\n"
-
-                    country_message(query=extracted_ip, country=whois.ip_country, message=message)
-
-                    if os.path.exists(location_file_name) is False:  # set headers
-                        with open(location_file_name, "w") as file_to_write:
-                            file_to_write.write("ip; cidr; organization; city; region; country; custName\n")
-
-                    with open(location_file_name, "a") as location_file:
-                        location_file.writelines(f'{extracted_ip}; {whois.ip_cidr}; {whois.ip_organization}; '
-                                                 f'{whois.ip_city}; {whois.ip_region}; {whois.ip_country}; '
-                                                 f'{whois.ip_custname} \n')
-
-        print(f'\n{Bcolors.OKBLUE}More information about each IP can be found in: {location_file_name}{Bcolors.ENDC}')
+        with open(file, "r") as file_to_read, \
+                open_journal(path, assessment_id, resume) as run_journal, \
+                sinks.open_sink(output_format, location_file_name, LOCATION_COLUMNS,
+                                truncate=not resume) as location_sink, \
+                (sinks.open_sink(output_format, dns_file_name, DNS_COLUMNS, extension=".txt", truncate=not resume)
+                 if reverse_dns else contextlib.nullcontext()) as dns_sink, \
+                open_archive(path, assessment_id, keep_raw, resume, location_sink) as archive:
+            hook_journal(run_journal, location_sink, dns_sink)
+            scope = prefetch_dns(read_scope(file_to_read, run_journal), whois_options, reverse=reverse_dns)
+
+            answers = {}  # bulk answers by IP
+            if bulk is not None:
+                scope = bulk_scope(bulk, scope, answers)  # answers arrive as the rows are written
+
+            if no_whois:  # fast path, no whois at all
+                resolver = whois_options.get("resolver")
+                records = ((ip, who.WhoisRecord(whois_query=ip, ip=ip,
+                                                fqdn=resolver.reverse(ip) if reverse_dns and resolver else None))
+                           for ip in scope)
+            else:
+                lookups = batch.ordered_map(functools.partial(skip_failed(fetch_whois), whois_options=whois_options),
+                                            scope, workers=workers)
+                # only the compact records are kept
+                records = ((ip, whois.record(keep_raw=keep_raw) if whois is not None else None)
+                           for ip, whois in parse_stage(lookups, pool))
+
+            for extracted_ip, whois in records:  # results come back in input order
+                if whois is None:
+                    continue  # whois kept failing, left for --resume
+                message = ip_message(whois) if not no_whois else "\n"
+                if country_index is not None:
+                    whois, delegation = offline_country(whois, country_index)
+                    message += delegation
+                if bulk is not None:
+                    whois, autonomous_system = bulk_fields(whois, answers.pop(extracted_ip, None))
+                    message += autonomous_system
+                if archive:
+                    archive.write(extracted_ip, [whois])
+
+                country_message(query=extracted_ip, country=whois.ip_country, message=message)
+
+                if dns_sink:
+                    dns_sink.write([extracted_ip, whois.fqdn])
+                # marked in the same flush as its row, see ResultSink.write_many()
+                location_sink.write_many([location_row(extracted_ip, whois)],
+                                         on_written=functools.partial(run_journal.mark, extracted_ip))
+
+        print(f'\n{Bcolors.OKBLUE}More information about each IP can be found in: {location_sink.path}{Bcolors.ENDC}')
 
     else:  # assume single IP entered
         ip = ip.strip()
-        whois = who.Whois(whois_query=ip)
-
-        if whois.ip_custname:
-            message = f"\n\tIP Organization: {whois.ip_organization}\n" \
-                      f"\tCustName: {whois.ip_custname}\n"
+        if no_whois:
+            whois = who.WhoisRecord(whois_query=ip, ip=ip)
+            if reverse_dns and whois_options.get("resolver"):
+                whois = whois._replace(fqdn=whois_options["resolver"].reverse(ip))
         else:
-            message = f"\n\tIP Organization: {whois.ip_organization}\n"
+            whois = who.Whois(whois_query=ip, **whois_options).record()
+
+        message = ip_message(whois, reverse_dns) if not no_whois else "\n"
+        if country_index is not None:
+            whois, delegation = offline_country(whois, country_index)
+            message += delegation
+        if bulk is not None:
+            whois, autonomous_system = bulk_fields(whois, next(bulk.lookup([ip]), (ip, None))[1])
+            message += autonomous_system
 
         country_message(query=ip, country=whois.ip_country, message=message)
 
 
-def verify_domain_helper(whois=None):
+def plan_ip_ranges(assessment_id, ip=None, file=None, workers=1, whois_options=None, output_format="csv",
+                   expand=False, max_queries=range_plan.DEFAULT_MAX_QUERIES):
+    """ Takes in an IP range or a file listed with IPs, CIDRs and ranges, and verifies each range with one whois per
+    allocation instead of one per address (see recon.range_plan.walk_range()): a /16 held by a handful of
+    organizations costs a handful of queries. Single IPs are a range of one.
+
+        IF workers > 1, up to that many ranges are walked at the same time, each one in order
+
+        whois_options :: extra keyword arguments for every Whois(), e.g. {"cache": WhoisCache()}
+        expand :: also write a row for every address of every block to the usual location file
+        max_queries :: whois queries one range may use, the rest of it is written as an uncovered block
+
+        Output File: recon-output/verify-address-*-Range-Blocks.csv (.jsonl, .sqlite), one row per block
+        Expanded File: recon-output/verify-address-*-Location-Lookups.csv, when expand is set
+    """
+    path = create_path(OUTPUT_PATHS["verify_ip"])
+    whois_options = whois_options or {}
+    fetch = skip_failed(fetch_whois)
+
+    def lookup(address):
+        fetched = fetch(address, whois_options=whois_options)
+        if fetched is None:
+            return None, True  # the server was asked, and kept failing
+        return fetched.parse().record(keep_raw=True), fetched.whois_queries > 0  # raw text for NetRange
+
+    def walk(address_range):
+        return list(range_plan.walk_range(*address_range, lookup, max_queries=max_queries))
+
+    def scope_ranges(lines):
+        for kind, value in scope_input.iter_scope(lines, expand=False):
+            if kind == "domain":
+                print(f"{Bcolors.WARNING}{value} skipped: only IPs, CIDRs and ranges can be planned{Bcolors.ENDC}",
+                      file=sys.stderr)
+                continue
+            if kind == "ip":
+                address = ipaddress.ip_address(value)
+                yield address, address
+            else:
+                yield value
+
+    with (open(file.name, "r") if file else contextlib.nullcontext([ip])) as lines, \
+            sinks.open_sink(output_format, f"{path}/{assessment_id}-Range-Blocks", BLOCK_COLUMNS,
+                            truncate=True) as block_sink, \
+            (sinks.open_sink(output_format, f"{path}/{assessment_id}-Location-Lookups", LOCATION_COLUMNS,
+                             truncate=True) if expand else contextlib.nullcontext()) as location_sink:
+        addresses = queries = 0
+        for address_range, blocks in batch.ordered_map(walk, scope_ranges(lines), workers=workers):
+            for block in blocks:
+                addresses += range_plan.address_count(block)
+                queries += block.fetched
+                block_sink.write(block_row(block))
+
+                whois = block.whois or who.WhoisRecord()
+                country_message(query=f"{block.first} - {block.last}", country=whois.ip_country,
+                                message=ip_message(whois))
+                if location_sink and block.whois is not None:
+                    first, last = ipaddress.ip_address(block.first), ipaddress.ip_address(block.last)
+                    for key in range(int(first), int(last) + 1):
+                        address = str(type(first)(key))
+                        location_sink.write(location_row(address, whois._replace(ip=address)))
+
+    print(f'\n{Bcolors.OKBLUE}{addresses} addresses covered with {queries} whois queries{Bcolors.ENDC}')
+    print(f'{Bcolors.OKBLUE}Blocks can be found in: {block_sink.path}{Bcolors.ENDC}')
+    if location_sink:
+        print(f'{Bcolors.OKBLUE}Every address can be found in: {location_sink.path}{Bcolors.ENDC}')
+
+
+def verify_domain_helper(whois=None, whois_options=None, whois_ips=None):
     """ Helper to verify_domain(). This was added to handle domains that point to more than one IP.
 
     Params:
-        whois :: initial Whois() for a single domain
+        whois :: initial Whois() (or its WhoisRecord) for a single domain
+        whois_options :: extra keyword arguments for the Whois() of every additional IP
+        whois_ips :: {IP: WhoisRecord} of the additional IPs when they were already looked up, see fetch_domain()
 
     Return:
         whois_ip_dict :: A dictionary that holds all the IPs and their corresponding whois information. Key = IP,
-                        value == Whois()
+                        value == Whois() or WhoisRecord
         ip_country_set :: A set with all of the domain's associated IPs countries
         whois_info_message :: a formatted string that will contain selected whois information about every IP found.
                                 Info includes: domain organisation, IP(s), IP country(s), IP organization
@@ -152,7 +520,10 @@ def verify_domain_helper(whois=None):
         for ip in ips_set:
             if ip != whois.ip:  # we do not want to waste time querying on the same IP already stored in the backend
 
-                whois_ip = who.Whois(whois_query=ip)
+                if whois_ips is not None:
+                    whois_ip = whois_ips[ip]
+                else:
+                    whois_ip = who.Whois(whois_query=ip, **(whois_options or {}))
                 whois_ip_dict[ip] = whois_ip  # for every additional IP, key == IP and value == whois object
 
                 if whois_ip.ip_country:
@@ -190,93 +561,172 @@ def join_ips_country(ip_country_set, first_connected_country):
     return ip_country
 
 
-def verify_domain_name(assessment_id, domain=None, file=None):
-    """ This function takes in a domain name or a file listed with domain names and outputs a file that contains the
-            domain name, organisation, registrar, registrant organization, tech organization, name server,
-                ip, ip cidr, ip organization, ip city, ip region, ip country, ip custName"
+def fetch_domain(domain, whois_options=None):
+    """ Runs every DNS and whois query needed for a single domain. This is the unit of work handed to the worker
+    pool by verify_domain_name(), so it must not print or write any output itself.
 
-        IF a single domain was entered, then the output will only appear on the terminal
+    Return:
+        (deferred Whois() of the domain, {additional IP: deferred Whois()}), to be finished by verify_domain_lookup()
+    """
 
-        Output File: recon-output/verify-domain-*-domain-ownership.csv
+    whois = fetch_whois(domain, whois_options)
+    whois_ips = {ip: fetch_whois(ip, whois_options) for ip in (whois.ips_set or ()) if ip != whois.ip}
+    return whois, whois_ips
 
-        Input file: List of domains, where each item is entered line by line with no commas separating them
-        Input domain: single domain
+
+def fetched_whois(fetched):
+    """ The deferred Whois() objects of a fetch_domain() result, see parse_stage() """
+    whois, whois_ips = fetched
+    return [whois] + list(whois_ips.values())
+
+
+def verify_domain_lookup(domain, whois_options=None, fetched=None, keep_raw=False):
+    """ Runs every whois lookup needed for a single domain, or only finishes them when fetched (the result of
+    fetch_domain()) is given. keep_raw keeps the raw whois text in the records of fetched.
+
+    Return:
+        whois :: the Whois() for the domain and the first IP it resolved to, a WhoisRecord when fetched is given
+        ips_dict :: see verify_domain_helper()
+        country :: countries of every IP found for the domain, see join_ips_country()
+        message :: formatted whois information for country_message()
     """
 
-    path = create_path("recon-output/verify-domain")
+    if fetched is None:
+        whois = who.Whois(whois_query=domain, **(whois_options or {}))
+        whois_ips = None
+    else:
+        whois, whois_ips = fetched
+        whois = whois.parse().record(keep_raw)
+        whois_ips = {ip: whois_ip.parse().record(keep_raw) for ip, whois_ip in whois_ips.items()}
 
-    output_file = f"{path}/{assessment_id}-domain-ownership.csv"
+    ips_dict, ip_country, message = verify_domain_helper(whois=whois, whois_options=whois_options,
+                                                         whois_ips=whois_ips)
 
-    if file:
-        file = file.name
+    # if there are > 1 IP then join countries found to be used for country message
+    country = join_ips_country(ip_country, whois.ip_country)
+
+    return whois, ips_dict, country, message
+
+
+def verify_domain_name(assessment_id, domain=None, file=None, workers=1, whois_options=None, output_format="csv",
+                       resume=False, pool=None, keep_raw=False):
+    """ This function takes in a domain name or a file listed with domain names and outputs a file that contains the
+            domain name, organisation, registrar, registrant organization, tech organization, name server,
+                ip, ip cidr, ip organization, ip city, ip region, ip country, ip custName"
+
+        IF a single domain was entered, then the output will only appear on the terminal
 
-        with open(file, "r") as file_to_read:
-            for line in file_to_read:
-                if line.strip():  # cleaning file of any empty lines
-                    domain = line.strip()
-                    whois = who.Whois(whois_query=domain)
+        IF workers > 1, up to that many domains are looked up at the same time. Output rows and terminal messages are
+        still written in the same order as the input file
 
-                    ips_dict, ip_country, message = verify_domain_helper(whois=whois)
+        whois_options :: extra keyword arguments for every Whois(), e.g. {"cache": WhoisCache()}
+        output_format :: csv, jsonl or sqlite (see recon.sinks)
+        resume :: skip the domains a previous, interrupted run of the same assessment finished
+        pool :: recon.parse_pool.ParsePool to parse the whois answers in, instead of this process
+        keep_raw :: archive the raw whois answers, so reparse_assessment() can rebuild the output offline
 
-                    # if there are > 1 IP then join countries found to be used for country message
-                    country = join_ips_country(ip_country, whois.ip_country)
+        Output File: recon-output/verify-domain-*-domain-ownership.csv (.jsonl, .sqlite)
+        Raw File: recon-output/verify-domain-*-raw-whois.jsonl, when keep_raw is set
+        Journal File: recon-output/verify-domain-*-journal.txt (finished domains, used by resume)
 
-                    country_message(query=domain, country=country, message=message)
+        Input file: List of domains, where each item is entered line by line with no commas separating them.
+                    Duplicates are skipped
+        Input domain: single domain
+    """
 
-                    if os.path.exists(output_file) is False:  # set headers
-                        with open(output_file, "w") as file_to_write:
-                            file_to_write.write("domain name; organisation; registrar; registrant organization; "
-                                                "tech organization; name server; ip; ip cidr; ip organization; "
-                                                "ip city; ip region; ip country; ip custName\n")
+    path = create_path(OUTPUT_PATHS["verify_domain"])
+    whois_options = whois_options or {}
 
-                    with open(output_file, "a") as file_to_write:
-                        file_to_write.writelines(f'{domain}; {whois.organisation}; {whois.registrar}; '
-                                                 f'{whois.registrant_organization}; '
-                                                 f'{whois.tech_organization}; {whois.name_server}; {whois.ip}; '
-                                                 f'{whois.ip_cidr}; {whois.ip_organization}; '
-                                                 f'{whois.ip_city}; {whois.ip_region}; {whois.ip_country}; '
-                                                 f'{whois.ip_custname}\n')
+    output_file = f"{path}/{assessment_id}-domain-ownership"
 
-                        if ips_dict:
-                            for key, ip_whois in ips_dict.items():
-                                file_to_write.writelines(f'{domain}; {whois.organisation}; {whois.registrar}; '
-                                                         f'{whois.registrant_organization}; '
-                                                        f'{whois.tech_organization}; {whois.name_server}; {key}; '
-                                                        f'{ip_whois.ip_cidr}; {ip_whois.ip_organization}; '
-                                                        f'{ip_whois.ip_city}; {ip_whois.ip_region}; {ip_whois.ip_country}; '
-                                                         f'{ip_whois.ip_custname} \n')
+    if file:
+        file = file.name
 
-        print(f'\n{Bcolors.OKBLUE}More information about each domain can be found in: {output_file}{Bcolors.ENDC}')
+        with open(file, "r") as file_to_read, \
+                open_journal(path, assessment_id, resume) as run_journal, \
+                sinks.open_sink(output_format, output_file, DOMAIN_COLUMNS, truncate=not resume) as output_sink, \
+                open_archive(path, assessment_id, keep_raw, resume, output_sink) as archive:
+            hook_journal(run_journal, output_sink)
+            lookups = batch.ordered_map(functools.partial(skip_failed(fetch_domain), whois_options=whois_options),
+                                        prefetch_dns(read_scope(file_to_read, run_journal), whois_options),
+                                        workers=workers)
+
+            # parsed off the worker threads, and only the compact records are kept
+            for domain, fetched in parse_stage(lookups, pool, whois_of=fetched_whois):
+                if fetched is None:
+                    continue  # whois kept failing, left for --resume
+                whois, ips_dict, country, message = verify_domain_lookup(domain, whois_options, fetched, keep_raw)
+                country_message(query=domain, country=country, message=message)
+                if archive:
+                    archive.write(domain, [whois] + list((ips_dict or {}).values()))
+
+                # marked in the same flush as all its rows, see ResultSink.write_many()
+                output_sink.write_many(domain_rows(domain, whois, ips_dict),
+                                       on_written=functools.partial(run_journal.mark, domain))
+
+        print(f'\n{Bcolors.OKBLUE}More information about each domain can be found in: {output_sink.path}{Bcolors.ENDC}')
 
     else:  # assume single domain entered
         domain = domain.strip()
-        whois = who.Whois(whois_query=domain)
-        ips_dict, ip_country, message = verify_domain_helper(whois=whois)
-        country = join_ips_country(ip_country, whois.ip_country)
+        whois, ips_dict, country, message = verify_domain_lookup(domain, whois_options=whois_options)
 
         country_message(query=domain, country=country, message=message)
 
 
-def enumerate_web_services(assessment_id, file=None):
-    """ Web services can take in a file filled with a list of domains, IPs, or mixed (IPs and domains)
-        and curl to http and https.
+def reparse_assessment(assessment_id, command, output_format="csv", pool=None):
+    """ Rebuilds the output file of an earlier verify_ip or verify_domain file run from its raw whois archive (see
+    keep_raw), without any network access. Useful after a change to whois_parser.py.
 
-        For every curl response, the status code is extracted and each item in the file is stored with their status code
-         in the appropriate outputted file.
-
-         File outputted: *successful.txt, *informational.txt, *redirection.txt, *client_error.txt, *server_error.txt,
-                        *reachable.txt (combination of successful, informational, and redirection) , & *unreachable.txt
+    Params:
+        command :: "verify_ip" or "verify_domain", the run to rebuild
+        pool :: recon.parse_pool.ParsePool to parse in, instead of this process
 
-        Input file: List of domains, IPs, or mixed (IPs and domains) where each item should be
-                    entered line by line with no commas separating them
-        """
-    if file:
-        file = file.name  # argparse validates the file exists and is readable, thus can assume we can use it
+    Input File: recon-output/verify-*/*-raw-whois.jsonl
+    Output File: the run's own output file, replaced
+    """
 
-    path = create_path("recon-output/web-service/")
+    if command == "verify_ip":
+        path = OUTPUT_PATHS["verify_ip"]
+        output_file, columns = f"{path}/{assessment_id}-Location-Lookups", LOCATION_COLUMNS
+    else:
+        path = OUTPUT_PATHS["verify_domain"]
+        output_file, columns = f"{path}/{assessment_id}-domain-ownership", DOMAIN_COLUMNS
+
+    archive_path = f"{path}/{assessment_id}-raw-whois.jsonl"
+    if not os.path.isfile(archive_path):
+        print(f"{Bcolors.FAIL}No raw whois archive at {archive_path}, run {command} with --keep-raw first{Bcolors.ENDC}")
+        return
+
+    entries = parse_pool.RawArchive.read(archive_path, who.WhoisRecord, who.Whois.Set)
+    jobs = ((entry, [text for record in entry[1] for text in record_texts(record)]) for entry in entries)
+
+    count = 0
+    with sinks.open_sink(output_format, output_file, columns, truncate=True) as output_sink:
+        for (query, records), parsed in parse_pool.parse_all(jobs, pool):
+            parsed = iter(parsed)
+            for i, record in enumerate(records):
+                # answers taken from the netblock index have no raw text and keep their archived fields
+                for text in record_texts(record):
+                    record = record._replace(**next(parsed))
+                records[i] = record
+
+            if command == "verify_ip":
+                output_sink.write(location_row(query, records[0]))
+            else:
+                whois_ips = {record.ip: record for record in records[1:]}
+                ips_dict, ip_country, message = verify_domain_helper(whois=records[0], whois_ips=whois_ips)
+                for row in domain_rows(query, records[0], ips_dict):
+                    output_sink.write(row)
+            count += 1
+
+    print(f'\n{Bcolors.OKBLUE}Rebuilt {count} entries from {archive_path} into: {output_sink.path}{Bcolors.ENDC}')
+
+
+def write_web_status(output_sinks, prefix_url, status_code):
+    """ Writes a probed URL to the status buckets of output_sinks (a recon.sinks.SinkGroup) and the terminal.
+    status_code is None when there was no response in time
+    """
 
-    # list to test url with both  http and https
-    prefix_list = ['http://', 'https://']
     # assigning proper names to status codes
     status_codes_dict = {"informational": [100, 199], "successful": [200, 299],
                          "redirection": [300, 399], "client error": [400, 499],
@@ -285,112 +735,182 @@ def enumerate_web_services(assessment_id, file=None):
     specific_codes_dict = {403: "Forbidden", 404: "Not Found", 502: "Bad Gateway", 503: "Service Unavailable",
                            504: "Gateway Timeout"}
 
-    with open(file, "r") as file_to_read:
-        for url in file_to_read:
-            url = url.strip()
-            match = False
-            reachable = False
-            if url:  # condition to bypass blank lines in file
-                for prefix in prefix_list:
+    match = False
 
-                    prefix_url = prefix + url
+    if status_code is not None:  # making sure you have a response
 
-                    curl_response = subprocess.run(["curl", "-I", prefix_url, "-k", "-s", "--max-time", "4"],
-                                                   capture_output=True, text=True).stdout
+        for general_status, code in status_codes_dict.items():
+            if code[0] <= status_code <= code[1]:
+                match = True
 
-                    if curl_response:  # making sure you have a response
+                if reachable_code_range[0] <= status_code <= reachable_code_range[1]:
+                    output_sinks.write("reachable", [prefix_url, status_code])
 
-                        curl_response = curl_response.split(" ")
-                        status_code = curl_response[1]
+                output_sinks.write(general_status, [prefix_url, status_code])
 
-                        if status_code.isdigit():
-
-                            status_code = int(status_code)
+                if status_code in specific_codes_dict.keys():  # only output specific code mapping to terminal
+                    print(f"{prefix_url} has status code {status_code} "
+                          f"({specific_codes_dict[status_code]}) - {general_status}")
+                else:
+                    print(f"{prefix_url} has status code {status_code} - {general_status}")
 
-                            for general_status, code in status_codes_dict.items():
-                                if code[0] <= status_code <= code[1]:
-                                    match = True
+    else:  # the connection was timed out and did not get a response
+        status_code = "None"
 
-                                    output_file_name = path + assessment_id + "-web-services-" + general_status + ".txt"
-                                    reachable_output_file = path + assessment_id + "-web-services-reachable.txt"
+    if not match:  # if the status code does not fall in the status_codes_dict then
+        # Need to change to logger but will keep
+        print(f'{Bcolors.WARNING}{prefix_url} unreachable {Bcolors.ENDC} (maybe timed-out)')
 
-                                    if reachable_code_range[0] <= status_code <= reachable_code_range[1]:
-                                        reachable = True
+        output_sinks.write("unreachable", [prefix_url, status_code])  # odd cases stored here
 
-                                    if os.path.exists(output_file_name) is False:  # set headers
-                                        with open(output_file_name, "w") as file_to_write:
-                                            file_to_write.write("URL, STATUS CODE\n")
 
-                                    if os.path.exists(reachable_output_file) is False:  # set headers
-                                        with open(reachable_output_file, "w") as file_to_write:
-                                            file_to_write.write("URL, STATUS CODE\n")
+def probe_web_urls(prober, output_sinks, entries):
+    """ Probes the http and https URLs (and extra ports) of entries at once and writes them with write_web_status().
+    URLs of extra ports are only written when they answered
+    """
 
-                                    with open(output_file_name, "a") as file_to_append, \
-                                            open(reachable_output_file, "a") as reachable_file:
+    web_urls = list(prober.web_urls(entries))
+    for (prefix_url, extra), status_code in zip(web_urls, prober.probe(url for url, extra in web_urls)):
+        if status_code is not None or not extra:
+            write_web_status(output_sinks, prefix_url, status_code)
 
-                                        if reachable:
-                                            reachable_file.write(f"{prefix_url}, {status_code} \n")
 
-                                        file_to_append.write(f"{prefix_url}, {status_code} \n")
+def enumerate_web_services(assessment_id, file=None, prober=None, output_format="csv"):
+    """ Web services can take in a file filled with a list of domains, IPs, or mixed (IPs and domains)
+        and sends a HEAD request to http and https.
 
-                                        if status_code in specific_codes_dict.keys():  # only output specific code mapping to terminal
-                                            print(f"{prefix_url} has status code {status_code} "
-                                                  f"({specific_codes_dict[status_code]}) - {general_status}")
-                                        else:
-                                            print(f"{prefix_url} has status code {status_code} - {general_status}")
+        For every response, the status code is extracted and each item in the file is stored with their status code
+         in the appropriate outputted file.
 
-                    else:  # the connection was timed out and did not get a response
-                        status_code = "None"
+         File outputted: *successful.txt, *informational.txt, *redirection.txt, *client_error.txt, *server_error.txt,
+                        *reachable.txt (combination of successful, informational, and redirection) , & *unreachable.txt
 
-                    if not match:  # if the status code does not fall in the status_codes_dict then
-                        output_file_name = path + assessment_id + "-web-services-unreachable.txt"  # odd cases stored here
+        Input file: List of domains, IPs, or mixed (IPs and domains) where each item should be
+                    entered line by line with no commas separating them
 
-                        # Need to change to logger but will keep
-                        print(f'{Bcolors.WARNING}{prefix_url} unreachable {Bcolors.ENDC} (maybe timed-out)')
+        prober :: recon.http_probe.HttpProber holding the concurrency limits and timeout, defaults are used if None.
+                  The file is probed WEB_SERVICES_CHUNK lines at a time, every URL of a chunk concurrently. Hosts
+                  whose ports refuse or ignore the TCP connect pre-check go to *unreachable.txt without a request,
+                  and the prober's extra ports are listed only when they answer
+        output_format :: csv (the .txt lists), jsonl or sqlite (see recon.sinks)
+        """
+    if file:
+        file = file.name  # argparse validates the file exists and is readable, thus can assume we can use it
 
-                        if os.path.exists(output_file_name) is False:  # set headers
-                            with open(output_file_name, "w") as file_to_write:
-                                file_to_write.write("URL, STATUS CODE\n")
+    path = create_path(OUTPUT_PATHS["web_services"] + "/")
+    prober = prober or http_probe.HttpProber()
 
-                        with open(output_file_name, "a") as file_to_append:
-                            file_to_append.write(f"{prefix_url}, {status_code} \n")
+    with open(file, "r") as file_to_read, \
+            sinks.SinkGroup(output_format, path + assessment_id + "-web-services-", WEB_SERVICE_COLUMNS,
+                            extension=".txt", delimiter=", ") as output_sinks:
+        entries = read_entries(file_to_read)  # blank lines are bypassed here
 
-            url = ''
+        for chunk in iter(lambda: list(itertools.islice(entries, WEB_SERVICES_CHUNK)), []):
+            probe_web_urls(prober, output_sinks, chunk)
 
     print(f'\n {Bcolors.OKBLUE}Outputted files can be found at: {path}{Bcolors.ENDC}')  # need to change to logger
 
 
-def enumerate_sub_domains(assessment_id, domain=None):
-    """ Takes in a a single domain and uses assetfinder to get a list of subdomains for the domain
-    outputs the list of subdomains in recon-output/subdomains/<assessmentid>--subdomains.txt """
-    path = create_path("recon-output/subdomains/")
-    output_file = f'{path}{assessment_id}-{domain}-subdomains.txt'
+def enumerate_sub_domains(assessment_id, domain=None, file=None, concurrency=4,
+                          timeout=subdomain_stream.SUBDOMAIN_TIMEOUT):
+    """ Takes in a single domain, or a file listed with domains, and uses assetfinder to get a list of subdomains
+    for every domain. assetfinder's output is streamed line by line and deduplicated in process, so memory stays
+    flat even for wildcard-heavy domains (see recon.subdomain_stream)
+
+    IF a file was entered, up to concurrency assetfinder processes run at the same time. Each one is stopped after
+    timeout seconds (None for no limit), keeping the names it found
+
+    Output File: recon-output/subdomains/<assessmentid>-<domain>-subdomains.txt, one per domain
+    """
+    path = create_path(OUTPUT_PATHS["subdomains"] + "/")
+
+    if file:
+        with open(file.name, "r") as file_to_read:
+            domains = [value for kind, value in scope_input.iter_scope(file_to_read) if kind == "domain"]
+    else:
+        domains = [domain.strip()]
 
-    domain = domain.strip()
+    def enumerate_one(name):
+        output_file = f'{path}{assessment_id}-{name}-subdomains.txt'
+        try:
+            return output_file, subdomain_stream.write_subdomains(name, output_file, timeout=timeout)
+        except FileNotFoundError:
+            print(f"{Bcolors.FAIL}{subdomain_stream.SUBDOMAIN_COMMAND[0]} is not installed{Bcolors.ENDC}")
+            return output_file, 0
 
-    subdom_cmd = ["assetfinder", "-subs-only", domain]
+    for name, (output_file, count) in batch.ordered_map(enumerate_one, domains, workers=concurrency):
+        print(f'\n{Bcolors.OKBLUE}{count} subdomains of {name} stored in: {output_file}{Bcolors.ENDC}')
 
-    # GNU awk expression: '!x[$0]++'
-    # 1. awk syntax has 'pattern {action}' pair expression.
-    # 2. '$0' contents of stdin (line)
-    # 3. Omitting {...} means awk does default action of '{print $0}'
-    # 4. Successful/non-zero pattern match updates values and does action
-    # 4. 'x' is an associative array
-    # 5. 'x[$0]' will index the 'x' array on line contents
-    # 6. Indexing x on unseen $0 adds key-value pair of ($0, 0), return value
-    # 7. '!e' will do non-zero check of evaluated expression e
-    # 8. 'e++' increment value of expr e after evaluation
-    # 9. Upon completion, x will contain number of occurences for each line
-    filter_cmd = ["awk", "!x[$0]++"]
 
-    with open(output_file, "wb") as file_to_write:
-        subdom_proc = subprocess.Popen(subdom_cmd, stdout=subprocess.PIPE)
-        filter_proc = subprocess.Popen(filter_cmd, stdin=subdom_proc.stdout, stdout=subprocess.PIPE)
-        for c in iter(lambda: filter_proc.stdout.read(1), b''):
-            sys.stdout.buffer.write(c)
-            file_to_write.write(c)
+def scoping_pipeline(assessment_id, domain, workers=1, whois_options=None, prober=None, output_format="csv",
+                     enum_timeout=subdomain_stream.SUBDOMAIN_TIMEOUT):
+    """ Runs subdomains -> DNS -> verify_domain -> web_services for a single domain as one pipeline: every
+    subdomain assetfinder prints is resolved, whois verified and probed while assetfinder is still running, so
+    the first results show up within seconds instead of after each command has gone through the whole list.
 
-    print(f'\n{Bcolors.OKBLUE}Subdomain list stored in: {output_file}{Bcolors.ENDC}')  # need to change to logger
+    The stages are linked by bounded queues (see recon.pipeline), a slow stage holds back the ones before it.
+    Names that do not resolve are kept in the subdomains file only.
+
+        resolve :: PIPELINE_DNS_WORKERS threads, each resolving whatever names are queued in one batch
+        verify :: workers threads running the whois lookups of verify_domain_name(), rows in no particular order
+        probe :: PIPELINE_PROBE_WORKERS threads sending the HEAD requests of enumerate_web_services()
+
+        whois_options :: extra keyword arguments for every Whois(), its resolver is also used by the resolve stage
+        prober :: recon.http_probe.HttpProber, defaults are used if None
+        output_format :: csv, jsonl or sqlite (see recon.sinks)
+        enum_timeout :: seconds assetfinder may run, None for no limit
+
+        Output Files: recon-output/pipeline/<assessmentid>-<domain>-subdomains.txt,
+                      *-domain-ownership.csv (.jsonl, .sqlite) and the *-web-services-*.txt buckets
+    """
+
+    path = create_path(OUTPUT_PATHS["pipeline"] + "/")
+    domain = domain.strip().lower()
+    whois_options = whois_options or {}
+    resolver = whois_options.get("resolver") or dns_resolver.DnsResolver(cache=whois_options.get("cache"))
+    prober = prober or http_probe.HttpProber()
+    fetch = skip_failed(fetch_domain)
+
+    base_path = f"{path}{assessment_id}-{domain}-"
+
+    def resolve(names):
+        found = resolver.addresses_batch(names)
+        return [name for name in names if found[name]]
+
+    def verify(name):
+        fetched = fetch(name, whois_options=whois_options)
+        if fetched is None:
+            return  # whois kept failing
+        whois, ips_dict, country, message = verify_domain_lookup(name, whois_options, fetched)
+        country_message(query=name, country=country, message=message)
+        for row in domain_rows(name, whois, ips_dict):
+            output_sink.write(row)
+
+    def probe(names):
+        probe_web_urls(prober, output_sinks, names)
+
+    def subdomains():
+        try:
+            yield from subdomain_stream.stream_subdomains(domain, base_path + "subdomains.txt", timeout=enum_timeout)
+        except FileNotFoundError:
+            print(f"{Bcolors.FAIL}{subdomain_stream.SUBDOMAIN_COMMAND[0]} is not installed{Bcolors.ENDC}")
+
+    run = pipeline.Pipeline()
+    resolved = run.stage("resolve", resolve, workers=PIPELINE_DNS_WORKERS,
+                         batch_size=max(1, resolver.concurrency // PIPELINE_DNS_WORKERS))
+    run.stage("verify", verify, workers=workers, after=[resolved])
+    run.stage("probe", probe, workers=PIPELINE_PROBE_WORKERS, after=[resolved],
+              batch_size=max(1, prober.concurrency // (2 * PIPELINE_PROBE_WORKERS)))
+
+    with sinks.open_sink(output_format, base_path + "domain-ownership", DOMAIN_COLUMNS) as output_sink, \
+            sinks.SinkGroup(output_format, base_path + "web-services-", WEB_SERVICE_COLUMNS,
+                            extension=".txt", delimiter=", ") as output_sinks:
+        run.run(subdomains())
+
+    print()
+    for line in run.summary():
+        print(f"{Bcolors.OKBLUE}{line}{Bcolors.ENDC}")
+    print(f'\n {Bcolors.OKBLUE}Outputted files can be found at: {path}{Bcolors.ENDC}')
 
 
 def main():
@@ -410,12 +930,17 @@ def main():
     web_services = subparser.add_parser('web_services', help="-f, --file (A File that contains a list of domains, ips, "
                                                              "or a mixed list, containing both ips and domains, "
                                                              "to enumerate web services)")
-    subdomains = subparser.add_parser('subdomains', help="-d, --domain (A single domain to enumerate sub domains)")
+    subdomains = subparser.add_parser('subdomains', help="-d, --domain (A single domain to enumerate sub domains) "
+                                                         "OR -f, --file (A File that contains a list of domains)")
+    scoping = subparser.add_parser('pipeline', help="-d, --domain (Enumerate the sub domains of a domain, resolve, "
+                                                    "verify and probe each one as soon as it is found)")
+    reparse = subparser.add_parser('reparse', help="--from verify_ip|verify_domain (Rebuild the output of an earlier "
+                                                   "--keep-raw file run from its raw whois, without network access)")
 
     # Options that need to be mutually exclusive
     verify_ip.add_mutually_exclusive_group()
-    verify_domain = verify_domain.add_mutually_exclusive_group()
-    subdomains = subdomains.add_mutually_exclusive_group()
+    verify_domain_group = verify_domain.add_mutually_exclusive_group()
+    subdomains_group = subdomains.add_mutually_exclusive_group(required=True)
 
     # arguments for every subparser
     verify_ip.add_argument('-i', '--ip', type=str,
@@ -423,34 +948,309 @@ def main():
     verify_ip.add_argument('-f', '--file', type=argparse.FileType('r'),
                            help='A File that contains a list of ips to be verified')
 
-    verify_domain.add_argument('-d', '--domain', type=str,
-                               help='A single domain to be verified')
-    verify_domain.add_argument('-f', '--file', type=argparse.FileType('r'),
-                               help='A File that contains a list of domains to be verified')
+    verify_ip.add_argument('--reverse-dns', action='store_true',
+                           help='Also look up the PTR name of every IP, written to <assessment_id>-DNS-Lookups.txt')
+    verify_ip.add_argument('--offline-country', action='store_true',
+                           help='Take the country from the offline RIR delegation index instead of whois, see '
+                                '--rir-stats. No whois is run unless --whois-details is given')
+    verify_ip.add_argument('--whois-details', action='store_true',
+                           help='With --offline-country or --bulk, still run whois for the organization, CIDR and '
+                                'custName')
+    verify_ip.add_argument('--plan-ranges', action='store_true',
+                           help='Verify the CIDRs and ranges of -f, or the one given with -i, with one whois per '
+                                'allocation instead of per address: each answer\'s NetRange / CIDR covers the range up '
+                                'to its end. Writes one row per block to <assessment_id>-Range-Blocks.csv')
+    verify_ip.add_argument('--expand', action='store_true',
+                           help='With --plan-ranges, also write a row for every address to the usual location file')
+    verify_ip.add_argument('--max-queries', type=positive_int, default=range_plan.DEFAULT_MAX_QUERIES,
+                           help=f'With --plan-ranges, whois queries one range may use before the rest of it is '
+                                f'written as uncovered (default: {range_plan.DEFAULT_MAX_QUERIES})')
+    verify_ip.add_argument('--bulk', action='store_true',
+                           help=f'Take the country, BGP prefix and AS name of every IP from a bulk whois service, '
+                                f'{BULK_WHOIS_CHUNK} IPs per connection, instead of one whois per IP. '
+                                f'See --bulk-server')
+    verify_ip.add_argument('--bulk-server', type=whois_client.parse_server,
+                           default=':'.join(map(str, bulk_whois.BULK_SERVER)),
+                           help=f'HOST[:PORT] of the bulk whois service for --bulk, speaking the begin / verbose / '
+                                f'end protocol (default: {bulk_whois.BULK_SERVER[0]})')
+    verify_ip.add_argument('--rir-stats', action='append', metavar='PATH',
+                           help='delegated-<rir>-extended file, or a directory of them, to (re)build the offline '
+                                'index from. May be repeated, e.g. once per RIR')
+    verify_ip.add_argument('--rir-index', default=rir_stats.DEFAULT_INDEX_PATH,
+                           help=f'Binary file the offline index is saved to and loaded from '
+                                f'(default: {rir_stats.DEFAULT_INDEX_PATH})')
+
+    for domain_parser in (verify_domain, scoping):
+        domain_parser.add_argument('--no-apex-grouping', action='store_true',
+                                   help='Run the domain whois for every host as given, instead of once per '
+                                        'registrable domain (example.com for www.example.com)')
+        domain_parser.add_argument('--ipv6', action='store_true',
+                                   help='Also resolve the AAAA records of every domain, adding an IP whois and an '
+                                        'output row for each IPv6 address')
+
+    verify_domain_group.add_argument('-d', '--domain', type=str,
+                                     help='A single domain to be verified')
+    verify_domain_group.add_argument('-f', '--file', type=argparse.FileType('r'),
+                                     help='A File that contains a list of domains to be verified')
+
+    for batch_parser in (verify_ip, verify_domain):
+        batch_parser.add_argument('--resume', action='store_true',
+                                  help='Continue an interrupted -f, --file run of the same assessment, skipping what '
+                                       'it already finished')
+        batch_parser.add_argument('--keep-raw', action='store_true',
+                                  help='Archive the raw whois answers of a -f, --file run to '
+                                       '<assessment_id>-raw-whois.jsonl, for the reparse command')
+
+    # whois lookup options shared by verify_ip, verify_domain and pipeline
+    for batch_parser in (verify_ip, verify_domain, scoping):
+        batch_parser.add_argument('-w', '--workers', type=positive_int, default=1,
+                                  help='Number of whois lookups to run at the same time (default: 1)')
+        batch_parser.add_argument('--no-cache', action='store_true',
+                                  help=f'Do not read or write the whois/DNS cache ({whois_cache.DEFAULT_CACHE_PATH})')
+        batch_parser.add_argument('--refresh', action='store_true',
+                                  help='Ignore cached answers and query again, storing the fresh answers in the cache')
+        batch_parser.add_argument('--netblock-reuse', action='store_true',
+                                  help='Skip the whois of an IP whose CIDR block an earlier answer already covered, '
+                                       'and give it that answer. Faster, but an IP in a reassigned sub-block gets '
+                                       'the organization of the parent allocation the earlier answer named')
+        batch_parser.add_argument('--netblock-file', type=str,
+                                  help='With --netblock-reuse, JSON file to load known netblocks from and save them '
+                                       'to at the end of the run')
+        batch_parser.add_argument('--backend', choices=['system', 'native'], default='system',
+                                  help='system runs the whois binary, native speaks the whois protocol (port 43) '
+                                       'directly and follows referrals itself (default: system)')
+        batch_parser.add_argument('--whois-server', type=whois_client.parse_server,
+                                  help='HOST[:PORT] to send native whois queries to instead of whois.iana.org')
+        batch_parser.add_argument('--dns-server', type=dns_resolver.parse_nameserver, action='append',
+                                  help='Nameserver to resolve with instead of /etc/resolv.conf, as ip or ip:port. '
+                                       'May be repeated')
+        batch_parser.add_argument('--dns-concurrency', type=positive_int, default=100,
+                                  help='DNS queries in flight at the same time (default: 100)')
+        batch_parser.add_argument('--dns-timeout', type=float, default=3.0,
+                                  help='Seconds allowed for one DNS query, retries included (default: 3)')
+        batch_parser.add_argument('--whois-timeout', type=float, default=10.0,
+                                  help='Seconds allowed for the whole answer of one native whois server, or for the '
+                                       'whois binary to finish a query, referrals included (default: 10)')
+        batch_parser.add_argument('--whois-mirror', type=whois_client.parse_mirror, action='append', default=[],
+                                  metavar='PRIMARY=HOST[:PORT]',
+                                  help='A native whois server holding the same data as the PRIMARY server, for '
+                                       '--whois-hedge. May be repeated')
+        batch_parser.add_argument('--whois-hedge', action='store_true',
+                                  help='When a native whois server has not answered within its p95 answer time, '
+                                       'send the query to its --whois-mirror too and use the first answer')
+        batch_parser.add_argument('--whois-rate', type=float, default=4.0,
+                                  help='Whois queries per second allowed to one server, 0 to disable rate limiting, '
+                                       'backoff and retries (default: 4). With --backend system the server is '
+                                       'guessed from the IPv4 /8 or the TLD, queries it cannot be guessed for '
+                                       'share one limit')
+        batch_parser.add_argument('--whois-burst', type=positive_int, default=8,
+                                  help='Whois queries allowed to one server at once after a quiet period (default: 8)')
+        batch_parser.add_argument('--whois-max-concurrency', type=positive_int, default=8,
+                                  help='Most whois queries in flight to one server, the limit starts lower and '
+                                       'adapts to throttling (default: 8)')
+        batch_parser.add_argument('--whois-retries', type=int, default=3,
+                                  help='Retries of a throttled, failed or empty whois answer (default: 3)')
+        batch_parser.add_argument('--whois-backoff', type=float, default=5.0,
+                                  help='Seconds a whois server is left alone after a throttle or failure, doubled '
+                                       'for each one in a row (default: 5)')
+
+    for parsing_parser in (verify_ip, verify_domain, reparse):
+        parsing_parser.add_argument('--parse-processes', type=positive_int,
+                                    help='Parse whois answers in this many worker processes instead of the main '
+                                         'process, for large batches')
+
+    for output_parser in (verify_ip, verify_domain, web_services, scoping, reparse):
+        output_parser.add_argument('--format', choices=sinks.FORMATS, default='csv', dest='output_format',
+                                   help='Output format: the semicolon separated csv (comma separated .txt lists for '
+                                        'web_services), jsonl or a sqlite table (default: csv)')
 
     web_services.add_argument('-f', '--file', type=argparse.FileType('r'),
                               help='A File that contains a list of domains, ips, '
                                    'or a mixed list (containing both ips and domains) to enumerate web services',
                               required=True)
 
-    subdomains.add_argument('-d', '--domain', type=str,
-                            help='A single domain to enumerate sub domains')
+    # web probing options shared by web_services and pipeline
+    for probe_parser in (web_services, scoping):
+        probe_parser.add_argument('-c', '--concurrency', type=positive_int, default=50,
+                                  help='Number of requests in flight at the same time (default: 50)')
+        probe_parser.add_argument('--per-host', type=positive_int, default=4,
+                                  help='Number of requests in flight at the same time to a single host (default: 4)')
+        probe_parser.add_argument('--timeout', type=float, default=4.0,
+                                  help='Seconds to wait for each response (default: 4)')
+        probe_parser.add_argument('--http-port', type=int, default=80,
+                                  help='Port used for http:// when an entry does not name one (default: 80)')
+        probe_parser.add_argument('--https-port', type=int, default=443,
+                                  help='Port used for https:// when an entry does not name one (default: 443)')
+        probe_parser.add_argument('--connect-timeout', type=float, default=1.0,
+                                  help='Seconds allowed for the TCP connect check run on every host and port before '
+                                       'any request, hosts that fail it are unreachable. 0 skips the check '
+                                       '(default: 1)')
+        probe_parser.add_argument('--extra-ports', type=port_list, default=(),
+                                  help='Comma separated ports to also look for http and https services on, e.g. '
+                                       '8080,8443. Only the ones that answer are listed')
+
+    scoping.add_argument('-d', '--domain', type=str, required=True,
+                         help='The domain whose sub domains are enumerated, verified and probed')
+
+    subdomains_group.add_argument('-d', '--domain', type=str,
+                                  help='A single domain to enumerate sub domains')
+    subdomains_group.add_argument('-f', '--file', type=argparse.FileType('r'),
+                                  help='A File that contains a list of domains to enumerate sub domains for')
+    subdomains.add_argument('-c', '--concurrency', type=positive_int, default=4,
+                            help='Number of assetfinder processes to run at the same time with -f (default: 4)')
+
+    for enumerate_parser in (subdomains, scoping):
+        enumerate_parser.add_argument('--enum-timeout', type=float, default=subdomain_stream.SUBDOMAIN_TIMEOUT,
+                                      help=f'Seconds assetfinder may run for one domain before it is stopped, keeping '
+                                           f'the names found so far. 0 for no limit '
+                                           f'(default: {subdomain_stream.SUBDOMAIN_TIMEOUT:g})')
+
+    reparse.add_argument('--from', choices=['verify_ip', 'verify_domain'], dest='source', required=True,
+                         help='The command whose output is rebuilt')
+
+    for command_parser in (verify_ip, verify_domain, web_services, subdomains, scoping, reparse):
+        command_parser.add_argument('--profile', action='store_true',
+                                    help='Time the whois, DNS, parsing, web requests and output writes of the run, '
+                                         'print a summary and save it to <assessment_id>-profile.json next to the '
+                                         'output')
 
     args = parser.parse_args()
 
-    if args.cmd == 'verify_ip':
-        verify_ip_address(args.assessment_id, args.ip, args.file)
-
-    if args.cmd == 'verify_domain':
-        verify_domain_name(args.assessment_id, args.domain, args.file)
+    profiler = profiling.enable() if getattr(args, 'profile', False) else None
+
+    whois_options = {}
+    if args.cmd in ('verify_ip', 'verify_domain', 'pipeline'):
+        if not args.no_cache:
+            whois_options['cache'] = whois_cache.WhoisCache(refresh=args.refresh)
+        if args.netblock_reuse:
+            whois_options['netblocks'] = netblocks.NetblockIndex(path=args.netblock_file)
+        if args.whois_hedge and (args.backend != 'native' or not args.whois_mirror):
+            parser.error("--whois-hedge needs --backend native and at least one --whois-mirror")
+        if args.backend == 'native':
+            mirrors = {}
+            for primary, mirror in args.whois_mirror:
+                mirrors.setdefault(primary, []).append(mirror)
+            whois_options['backend'] = whois_client.WhoisClient(read_timeout=args.whois_timeout,
+                                                                server=args.whois_server,
+                                                                deadline=args.whois_timeout, mirrors=mirrors,
+                                                                hedge=args.whois_hedge)
+        else:
+            whois_options['backend'] = functools.partial(whois_client.system_whois, timeout=args.whois_timeout)
+        if args.whois_rate > 0:
+            backend = whois_options['backend']
+            whois_options['backend'] = throttle.WhoisScheduler(backend, rate=args.whois_rate, burst=args.whois_burst,
+                                                               max_concurrency=args.whois_max_concurrency,
+                                                               max_retries=args.whois_retries,
+                                                               backoff=args.whois_backoff)
+        whois_options['resolver'] = dns_resolver.DnsResolver(nameservers=args.dns_server,
+                                                             concurrency=args.dns_concurrency,
+                                                             timeout=args.dns_timeout,
+                                                             cache=whois_options.get('cache'),
+                                                             rdtypes=("A", "AAAA") if getattr(args, 'ipv6', False)
+                                                             else ("A",))
+    if args.cmd in ('verify_domain', 'pipeline'):
+        # domains behind the same CDN or load balancer share IPs, look each one up once per run
+        whois_options['ip_memo'] = memo.SingleFlight()
+        if not args.no_apex_grouping:
+            # www., mail., vpn. ... of a domain all get the whois record of the registrable domain
+            whois_options['public_suffixes'] = public_suffix.PublicSuffixList()
+            whois_options['domain_memo'] = memo.SingleFlight()
+        if getattr(args, 'keep_raw', False):
+            whois_options['keep_raw'] = True  # the memos hold parsed fields, the archive needs the raw text too
+    if args.cmd == 'verify_ip' and args.reverse_dns:
+        whois_options['reverse_dns'] = True
+
+    country_index = None
+    if args.cmd == 'verify_ip' and (args.offline_country or args.rir_stats):
+        if args.rir_stats:
+            country_index = rir_stats.CountryIndex.build(args.rir_stats)
+            country_index.save(args.rir_index)
+            print(f"{Bcolors.OKBLUE}Indexed {len(country_index)} RIR delegations into {args.rir_index}{Bcolors.ENDC}")
+        elif os.path.isfile(args.rir_index):
+            country_index = rir_stats.CountryIndex.load(args.rir_index)
+        else:
+            parser.error(f"--offline-country needs --rir-stats, no index at {args.rir_index} yet")
+        if not args.offline_country:
+            country_index = None  # only (re)built the index
+
+    if args.cmd == 'verify_ip' and args.plan_ranges and (args.bulk or args.offline_country or args.resume):
+        parser.error("--plan-ranges runs its own whois per block, it does not work with --bulk, --offline-country "
+                     "or --resume")
+
+    bulk = None
+    if args.cmd == 'verify_ip' and args.bulk:
+        if args.offline_country:
+            parser.error("--bulk and --offline-country both set the country, choose one")
+        bulk = bulk_whois.BulkWhois(server=args.bulk_server, read_timeout=max(args.whois_timeout, 60.0))
+
+    pool = None
+    if getattr(args, 'parse_processes', None):
+        pool = parse_pool.ParsePool(processes=args.parse_processes)
+
+    # file runs skip the queries whose whois kept failing (see skip_failed()), a single IP or domain and the bulk
+    # service have nothing to skip to
+    status = None
+    try:
+        if args.cmd == 'verify_ip' and args.plan_ranges:
+            plan_ip_ranges(args.assessment_id, args.ip, args.file, workers=args.workers, whois_options=whois_options,
+                           output_format=args.output_format, expand=args.expand, max_queries=args.max_queries)
+        elif args.cmd == 'verify_ip':
+            verify_ip_address(args.assessment_id, args.ip, args.file, workers=args.workers,
+                              whois_options=whois_options, output_format=args.output_format, resume=args.resume,
+                              pool=pool, keep_raw=args.keep_raw, country_index=country_index,
+                              whois_details=args.whois_details, bulk=bulk)
+
+        if args.cmd == 'verify_domain':
+            verify_domain_name(args.assessment_id, args.domain, args.file, workers=args.workers,
+                               whois_options=whois_options, output_format=args.output_format, resume=args.resume,
+                               pool=pool, keep_raw=args.keep_raw)
+    except whois_client.WhoisError as e:
+        failed = "Bulk whois" if bulk is not None else "Whois"
+        hint = ". Run again with --resume to continue" if args.file else ""
+        print(f"{Bcolors.FAIL}{failed} failed: {e}{hint}{Bcolors.ENDC}", file=sys.stderr)
+        status = 1
+
+    if args.cmd == 'reparse':
+        reparse_assessment(args.assessment_id, args.source, output_format=args.output_format, pool=pool)
+
+    prober = None
+    if args.cmd in ('web_services', 'pipeline'):
+        prober = http_probe.HttpProber(concurrency=args.concurrency, per_host=args.per_host, timeout=args.timeout,
+                                       ports={"http": args.http_port, "https": args.https_port},
+                                       connect_timeout=args.connect_timeout, extra_ports=args.extra_ports)
 
     if args.cmd == 'web_services':
-        enumerate_web_services(args.assessment_id, args.file)  # accepts file only
+        enumerate_web_services(args.assessment_id, args.file, prober=prober,
+                               output_format=args.output_format)  # accepts file only
 
     if args.cmd == 'subdomains':
-        enumerate_sub_domains(args.assessment_id, args.domain)
+        enumerate_sub_domains(args.assessment_id, args.domain, args.file, concurrency=args.concurrency,
+                              timeout=args.enum_timeout or None)
+
+    if args.cmd == 'pipeline':
+        scoping_pipeline(args.assessment_id, args.domain, workers=args.workers, whois_options=whois_options,
+                         prober=prober, output_format=args.output_format, enum_timeout=args.enum_timeout or None)
+
+    if pool is not None:
+        pool.close()
+    if isinstance(whois_options.get('backend'), throttle.WhoisScheduler):
+        for server, count in whois_options['backend'].throttle_counts().items():
+            print(f"{Bcolors.WARNING}{server} throttled {count} whois queries{Bcolors.ENDC}", file=sys.stderr)
+    if whois_options.get('cache'):
+        whois_options['cache'].close()
+    if whois_options.get('netblocks') is not None:
+        whois_options['netblocks'].save()
+
+    if profiler is not None:
+        profile_path = f"{OUTPUT_PATHS[getattr(args, 'source', args.cmd)]}/{args.assessment_id}-profile.json"
+        profiler.write(profile_path)
+        print()
+        for line in profiler.report_lines():
+            print(f"{Bcolors.OKBLUE}{line}{Bcolors.ENDC}")
+        print(f"{Bcolors.OKBLUE}Profile saved to: {profile_path}{Bcolors.ENDC}")
 
     # TODO: We need a new option to install dependencies
+    return status
 
 
 if __name__ == '__main__':
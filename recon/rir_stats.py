@@ -0,0 +1,202 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import array
+import bisect
+import collections
+import glob
+import ipaddress
+import os
+import struct
+import sys
+
+DEFAULT_INDEX_PATH = "recon-output/cache/rir-country-index.bin"
+
+REGISTRIES = ("afrinic", "apnic", "arin", "lacnic", "ripencc", "iana")
+STATUSES = ("allocated", "assigned", "available", "reserved")
+ALLOCATED = ("allocated", "assigned")
+
+MAGIC = b"RIRIDX1\n"
+
+Delegation = collections.namedtuple("Delegation", ("registry", "country", "status", "first", "last"))
+
+
+def stats_files(paths):
+    """ Expands directories in paths to the delegated-*-extended* files they hold """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, "delegated-*extended*")))
+        else:
+            yield path
+
+
+def parse_stats(lines):
+    """ Yields (version, registry, country, status, first, last) for the ipv4 / ipv6 records of a
+    delegated-<registry>-extended file. first and last are ints. IPv6 ranges are cut to their top 64 bits, RIRs
+    never delegate anything smaller than a /64
+    """
+
+    for line in lines:
+        if line.startswith("#"):
+            continue
+        fields = line.strip().split("|")
+        if len(fields) < 7 or fields[2] not in ("ipv4", "ipv6") or fields[1] == "*":
+            continue  # version line, summary lines, asn records
+
+        registry, country, kind, start, value, status = fields[0], fields[1], fields[2], fields[3], fields[4], fields[6]
+        try:
+            if kind == "ipv4":
+                first = int(ipaddress.IPv4Address(start))
+                yield 4, registry, country, status, first, first + int(value) - 1
+            else:
+                network = ipaddress.IPv6Network(f"{start}/{value}")
+                yield 6, registry, country, status, int(network.network_address) >> 64, \
+                    int(network.broadcast_address) >> 64
+        except ValueError:
+            print(f"rir_stats.parse_stats() Warning: skipping bad record {line.strip()!r}", file=sys.stderr)
+
+
+class CountryIndex:
+    """ Offline IP -> country / allocation status index built from the RIRs' delegated-*-extended stats files.
+
+    Each IP version is kept as sorted, disjoint start / end arrays plus parallel code arrays (array module), looked
+    up with bisect. The whole index is a few MB and loads from its binary file in milliseconds.
+    """
+
+    def __init__(self):
+        self.tables = {4: self._empty(), 6: self._empty()}
+
+    def __len__(self):
+        return len(self.tables[4]["starts"]) + len(self.tables[6]["starts"])
+
+    @staticmethod
+    def _empty():
+        return {"starts": array.array("Q"), "ends": array.array("Q"), "countries": array.array("H"),
+                "statuses": array.array("B"), "registries": array.array("B")}
+
+    @classmethod
+    def build(cls, paths):
+        """ Builds the index from stats files or directories holding them. Where records overlap, an allocated
+        or assigned one wins over available / reserved space, even one nested inside it, otherwise the one starting
+        first
+        """
+
+        records = {4: [], 6: []}
+        for path in stats_files(paths):
+            with open(path, encoding="utf-8", errors="replace") as stats:
+                for version, registry, country, status, first, last in parse_stats(stats):
+                    rank = 0 if status in ALLOCATED else 1
+                    records[version].append((first, rank, last, registry, country, status))
+
+        index = cls()
+        for version, rows in records.items():
+            table = index.tables[version]
+            for first, last, registry, country, status in cls.disjoint(rows):
+                table["starts"].append(first)
+                table["ends"].append(last)
+                table["countries"].append(cls.pack_country(country))
+                table["statuses"].append(STATUSES.index(status) if status in STATUSES else len(STATUSES))
+                table["registries"].append(REGISTRIES.index(registry) if registry in REGISTRIES else
+                                           len(REGISTRIES))
+        return index
+
+    @staticmethod
+    def disjoint(rows):
+        """ Sorted, disjoint (first, last, registry, country, status) blocks of build()'s (first, rank, last, ...)
+        rows. Allocated / assigned rows (rank 0) are laid down first, each keeping what the ones before it left
+        free. Available / reserved rows only fill the gaps between them, so a reserved block holding an
+        allocation is split around it
+        """
+
+        allocated = []
+        end = -1
+        for first, rank, last, registry, country, status in sorted(row for row in rows if row[1] == 0):
+            first = max(first, end + 1)
+            if first <= last:
+                allocated.append((first, last, registry, country, status))
+                end = last
+
+        starts = [block[0] for block in allocated]
+        gaps = []
+        end = -1
+        for first, rank, last, registry, country, status in sorted(row for row in rows if row[1] != 0):
+            cursor = max(first, end + 1)
+            end = max(end, last)
+            pos = max(0, bisect.bisect_right(starts, cursor) - 1)
+            while cursor <= last:
+                while pos < len(allocated) and allocated[pos][1] < cursor:
+                    pos += 1
+                if pos == len(allocated) or allocated[pos][0] > last:
+                    gaps.append((cursor, last, registry, country, status))
+                    break
+                if allocated[pos][0] > cursor:
+                    gaps.append((cursor, allocated[pos][0] - 1, registry, country, status))
+                cursor = allocated[pos][1] + 1
+
+        return sorted(allocated + gaps)
+
+    @staticmethod
+    def pack_country(country):
+        country = (country or "").upper()
+        if len(country) != 2 or country == "ZZ":
+            return 0
+        return ord(country[0]) << 8 | ord(country[1])
+
+    @staticmethod
+    def unpack_country(code):
+        return chr(code >> 8) + chr(code & 0xFF) if code else None
+
+    def lookup(self, address):
+        """ Returns the Delegation holding address (str or ipaddress object), or None """
+
+        address = ipaddress.ip_address(address)
+        key = int(address) if address.version == 4 else int(address) >> 64
+        table = self.tables[address.version]
+
+        pos = bisect.bisect_right(table["starts"], key) - 1
+        if pos < 0 or key > table["ends"][pos]:
+            return None
+
+        status = table["statuses"][pos]
+        registry = table["registries"][pos]
+        return Delegation(registry=REGISTRIES[registry] if registry < len(REGISTRIES) else None,
+                          country=self.unpack_country(table["countries"][pos]),
+                          status=STATUSES[status] if status < len(STATUSES) else None,
+                          first=table["starts"][pos], last=table["ends"][pos])
+
+    def save(self, path=DEFAULT_INDEX_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with open(path, "wb") as index_file:
+            index_file.write(MAGIC)
+            for version in (4, 6):
+                table = self.tables[version]
+                index_file.write(struct.pack("<Q", len(table["starts"])))
+                for name in ("starts", "ends", "countries", "statuses", "registries"):
+                    table[name].tofile(index_file)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH):
+        index = cls()
+        with open(path, "rb") as index_file:
+            if index_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a recon RIR country index")
+            for version in (4, 6):
+                count, = struct.unpack("<Q", index_file.read(8))
+                table = index.tables[version]
+                for name in ("starts", "ends", "countries", "statuses", "registries"):
+                    table[name].fromfile(index_file, count)
+        return index
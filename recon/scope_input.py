@@ -0,0 +1,171 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import bisect
+import ipaddress
+import sys
+
+from recon.netblocks import address_key, IPV6_OFFSET
+
+
+def is_ip_address(value):
+    """ True if value is an IPv4 or IPv6 address """
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+def parse_range(entry):
+    """ '10.0.0.1-10.0.0.50' or the short form '10.0.0.1-50' -> (first, last) ipaddress objects, None otherwise """
+
+    first, separator, last = entry.partition("-")
+    if not separator:
+        return None
+
+    try:
+        first = ipaddress.ip_address(first.strip())
+    except ValueError:
+        return None
+
+    last = last.strip()
+    if first.version == 4 and last.isdigit():  # short form, only the last octet given
+        last = first.exploded.rsplit(".", 1)[0] + "." + last
+    try:
+        last = ipaddress.ip_address(last)
+    except ValueError:
+        return None
+
+    if last.version != first.version or last < first:
+        return None
+    return first, last
+
+
+def classify(entry):
+    """ Normalises one scope entry and says what it is.
+
+    Return:
+        ("ip", address) | ("range", (first, last)) | ("domain", name) | ("invalid", entry)
+        CIDRs are returned as ranges, addresses are ipaddress objects and names are lowercase without the
+        trailing dot
+    """
+
+    entry = entry.split("#", 1)[0].strip()  # drop comments and whitespace
+
+    try:
+        return "ip", ipaddress.ip_address(entry)
+    except ValueError:
+        pass
+
+    if "/" in entry:
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            return "invalid", entry
+        return "range", (network.network_address, network.broadcast_address)
+
+    if "-" in entry and is_ip_address(entry.partition("-")[0].strip()):
+        address_range = parse_range(entry)
+        return ("range", address_range) if address_range else ("invalid", entry)
+
+    name = entry.lower().rstrip(".")
+    if not name or any(char.isspace() for char in name):
+        return "invalid", entry
+    return "domain", name
+
+
+class AddressSet:
+    """ Set of IP addresses stored as sorted, merged [start, end] integer intervals, so a whole /12 takes two
+    integers instead of a million set entries. IPv6 keys are offset past the IPv4 space, see recon.netblocks
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __contains__(self, key):
+        pos = bisect.bisect_right(self.starts, key) - 1
+        return pos >= 0 and key <= self.ends[pos]
+
+    def add(self, start, end):
+        """ Adds [start, end] and returns the list of (start, end) sub-ranges that were not in the set yet """
+
+        # intervals overlapping or touching [start, end] are merged into one
+        low = bisect.bisect_left(self.ends, start - 1)
+        high = bisect.bisect_right(self.starts, end + 1)
+
+        new = []
+        cursor = start
+        for i in range(low, high):
+            if self.starts[i] > cursor:
+                new.append((cursor, min(end, self.starts[i] - 1)))
+            cursor = max(cursor, self.ends[i] + 1)
+        if cursor <= end:
+            new.append((cursor, end))
+
+        if low < high:
+            start = min(start, self.starts[low])
+            end = max(end, self.ends[high - 1])
+        self.starts[low:high] = [start]
+        self.ends[low:high] = [end]
+        return new
+
+
+def iter_scope(lines, expand=True):
+    """ Lazily turns the lines of a scope file into normalised, deduplicated entries.
+
+    Params:
+        lines :: any iterable of text lines, e.g. an open file
+        expand :: yield every address of CIDRs and ranges (10.0.0.0/24, 10.0.0.1-10.0.0.50). When False they are
+                  yielded as ("range", (first, last)) instead
+
+    Yields:
+        ("ip", str) and ("domain", str) pairs. Blank lines, comments and duplicates are skipped, invalid entries are
+        reported on stderr. Memory stays flat: ranges are walked address by address and the seen addresses are
+        kept as intervals
+    """
+
+    seen_addresses = AddressSet()
+    seen_domains = set()
+
+    for line in lines:
+        kind, value = classify(line)
+
+        if kind == "invalid":
+            if value:  # blank lines and comments are not worth a warning
+                print(f"scope_input.iter_scope() Warning: skipping invalid entry {value!r}", file=sys.stderr)
+            continue
+
+        if kind == "domain":
+            if value not in seen_domains:
+                seen_domains.add(value)
+                yield kind, value
+            continue
+
+        first, last = (value, value) if kind == "ip" else value
+        new_ranges = seen_addresses.add(address_key(first), address_key(last))
+
+        address_class = type(first)
+        offset = IPV6_OFFSET if first.version == 6 else 0
+
+        for start, end in new_ranges:
+            if kind == "ip" or expand:
+                for key in range(start, end + 1):
+                    yield "ip", str(address_class(key - offset))
+            else:
+                yield "range", (address_class(start - offset), address_class(end - offset))
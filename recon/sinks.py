@@ -0,0 +1,301 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import json
+import os
+import signal
+import sqlite3
+import threading
+import time
+import weakref
+
+from recon import profiling
+
+FORMATS = ("csv", "jsonl", "sqlite")
+
+_open_sinks = weakref.WeakSet()  # every sink not closed yet, flushed by the signal handler
+_handlers_installed = False
+_exiting = False  # set by the signal handler, from then on flush() leaves a busy sink to close()
+
+
+def column_key(column):
+    """ 'ip custName' -> 'ip_custname', used as JSON key / sqlite column name """
+    return "_".join(column.lower().replace(",", " ").split())
+
+
+def flush_all():
+    """ Flushes every open sink """
+    for sink in list(_open_sinks):
+        sink.flush()
+
+
+def _flush_and_exit(signum, frame):
+    global _exiting
+    # the handler runs between two bytecodes of the main thread, possibly in the middle of a write() or flush().
+    # Sinks that are busy, there or in another thread, are skipped, their final flush happens in close()
+    _exiting = True
+    flush_all()
+    raise SystemExit(128 + signum)  # unwinds through the callers' finally blocks, which close the sinks
+
+
+def install_signal_handlers():
+    """ Makes SIGTERM and SIGHUP flush buffered rows before the run exits. Ctrl-C (SIGINT) already raises
+    KeyboardInterrupt, which closes the sinks on its way out
+    """
+    global _handlers_installed
+    if _handlers_installed or threading.current_thread() is not threading.main_thread():
+        return
+
+    for name in ("SIGTERM", "SIGHUP"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), _flush_and_exit)
+    _handlers_installed = True
+
+
+class ResultSink:
+    """ Base class of the output writers. Keeps its file open for the whole run and buffers rows, which are
+    written out every flush_every rows, every flush_interval seconds (checked on write), on close() and on
+    SIGTERM/SIGHUP. Safe to share between threads.
+
+    Subclasses implement _open(), _write_rows() and _close()
+    """
+
+    extension = ""
+
+    def __init__(self, path, columns, flush_every=100, flush_interval=2.0):
+        """
+        Params:
+            path :: output file
+            columns :: column names, in the order rows are given to write()
+            flush_every :: rows buffered before they are written out
+            flush_interval :: seconds a row may wait in the buffer
+        """
+        self.path = path
+        self.columns = list(columns)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()  # not reentrant, the signal handler must not flush in the middle of a write
+        self._flush_hooks = []
+        self.closed = False
+
+        self._open()
+        _open_sinks.add(self)
+        install_signal_handlers()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def on_flush(self, hook):
+        """ Registers hook() to be called each time buffered rows have reached the file """
+        self._flush_hooks.append(hook)
+
+    def write(self, row):
+        """ Buffers one row, a sequence of values matching self.columns """
+        self.write_many([row])
+
+    def write_many(self, rows, on_written=None):
+        """ Buffers rows as one unit: on_written() is called under the lock once they are all buffered and before
+        any of them can be flushed, so what it records for the flush hooks (e.g. a journal mark) reaches them in the
+        same flush as the rows
+        """
+
+        with self._lock:
+            self._buffer.extend(rows)
+            if on_written is not None:
+                on_written()
+            if len(self._buffer) >= self.flush_every or \
+                    time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        if not self._lock.acquire(blocking=not _exiting):
+            return  # busy while the run is exiting, close() flushes it
+        try:
+            self._flush()
+        finally:
+            self._lock.release()
+
+    def _flush(self):
+        """ flush() with self._lock held """
+        if self.closed:
+            return
+        if self._buffer:
+            with profiling.timer("output_write", os.path.basename(self.path)):
+                self._write_rows(self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+        for hook in self._flush_hooks:
+            hook()
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self._flush()
+            self._close()
+            self.closed = True
+        _open_sinks.discard(self)
+
+    @staticmethod
+    def json_value(value):
+        """ Whois.Set -> sorted list, None stays None, numbers stay numbers, anything else becomes str """
+        if value is None or isinstance(value, (int, float)):
+            return value
+        if isinstance(value, (set, frozenset, list, tuple)):
+            return sorted(str(item) for item in value)
+        return str(value)
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _write_rows(self, rows):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+
+class CsvSink(ResultSink):
+    """ Delimiter separated text, the format recon has always written: values printed with str(), so a Whois.Set
+    reads 'a', 'b' and a missing value reads None. The header is written once, when the file is new or empty
+    """
+
+    extension = ".csv"
+
+    def __init__(self, path, columns, delimiter="; ", **kwargs):
+        self.delimiter = delimiter
+        super().__init__(path, columns, **kwargs)
+
+    def _open(self):
+        self._file = open(self.path, "a")
+        if self._file.tell() == 0:  # set headers
+            self._file.write(self.delimiter.join(self.columns) + "\n")
+            self._file.flush()
+
+    def _write_rows(self, rows):
+        self._file.write("".join(self.delimiter.join(str(value) for value in row) + "\n" for row in rows))
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class JsonlSink(ResultSink):
+    """ One JSON object per row, keys from column_key() """
+
+    extension = ".jsonl"
+
+    def _open(self):
+        self._keys = [column_key(column) for column in self.columns]
+        self._file = open(self.path, "a")
+
+    def _write_rows(self, rows):
+        self._file.write("".join(json.dumps(dict(zip(self._keys, map(self.json_value, row)))) + "\n"
+                                 for row in rows))
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class SqliteSink(ResultSink):
+    """ Rows of table `results` in a sqlite file, inserted in one transaction per flush. Sets are stored as the
+    same text the CSV holds
+    """
+
+    extension = ".sqlite"
+    table = "results"
+
+    def _open(self):
+        keys = [column_key(column) for column in self.columns]
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ({', '.join(k + ' TEXT' for k in keys)})")
+        self._insert = f"INSERT INTO {self.table} ({', '.join(keys)}) VALUES ({', '.join('?' * len(keys))})"
+        self._conn.commit()
+
+    def _write_rows(self, rows):
+        with self._conn:  # one transaction for the whole batch
+            self._conn.executemany(self._insert, [[None if value is None else str(value) for value in row]
+                                                  for row in rows])
+
+    def _close(self):
+        self._conn.close()
+
+
+SINK_CLASSES = {"csv": CsvSink, "jsonl": JsonlSink, "sqlite": SqliteSink}
+
+
+def open_sink(output_format, base_path, columns, extension=None, truncate=False, **kwargs):
+    """ Opens the sink for output_format (one of FORMATS) at base_path + extension.
+
+    extension :: overrides the format's own extension, e.g. ".txt" for the web service lists
+    truncate :: start from an empty file instead of appending to an existing one
+    kwargs :: passed on to the sink, e.g. delimiter for csv
+    """
+
+    sink_class = SINK_CLASSES[output_format]
+    if sink_class is not CsvSink:
+        kwargs.pop("delimiter", None)
+        extension = None
+
+    directory = os.path.dirname(base_path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    path = base_path + (extension or sink_class.extension)
+    if truncate and os.path.exists(path):
+        os.remove(path)
+    return sink_class(path, columns, **kwargs)
+
+
+class SinkGroup:
+    """ Sinks opened on first use, one per name, all sharing format and columns. Used where rows are spread over
+    several files, like the web service status buckets
+    """
+
+    def __init__(self, output_format, base_path, columns, **kwargs):
+        self.output_format = output_format
+        self.base_path = base_path
+        self.columns = columns
+        self.kwargs = kwargs
+        self.sinks = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, name, row):
+        with self._lock:
+            sink = self.sinks.get(name)
+            if sink is None:
+                sink = open_sink(self.output_format, self.base_path + name, self.columns, **self.kwargs)
+                self.sinks[name] = sink
+        sink.write(row)
+
+    def flush(self):
+        for sink in list(self.sinks.values()):
+            sink.flush()
+
+    def close(self):
+        for sink in list(self.sinks.values()):
+            sink.close()
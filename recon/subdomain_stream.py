@@ -0,0 +1,119 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+SUBDOMAIN_COMMAND = ["assetfinder", "-subs-only"]
+SUBDOMAIN_TIMEOUT = 600.0  # seconds assetfinder may run for one domain
+
+_echo_lock = threading.Lock()
+
+
+def name_hash(name):
+    """ 64-bit hash of a name, what SeenNames stores instead of the name itself """
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8", errors="replace"), digest_size=8).digest(), "little")
+
+
+class SeenNames:
+    """ Set of names kept as 64-bit hashes, so a wildcard-heavy domain with hundreds of thousands of names costs an
+    int per name rather than the name. Two different names sharing a hash would need around 2**32 names to be
+    likely, far beyond what one domain returns
+    """
+
+    def __init__(self):
+        self._hashes = set()
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add(self, name):
+        """ Adds name and returns True if it was not in the set yet """
+        key = name_hash(name)
+        if key in self._hashes:
+            return False
+        self._hashes.add(key)
+        return True
+
+
+def stream_names(domain, command=SUBDOMAIN_COMMAND, timeout=SUBDOMAIN_TIMEOUT):
+    """ Yields the lines assetfinder prints for domain as they arrive, stripped and lowercased, empty lines skipped.
+    After timeout seconds (None for no limit) assetfinder is killed and the names printed so far are kept
+    """
+
+    # in a session of its own, so the deadline also stops whatever the command started
+    process = subprocess.Popen(command + [domain], stdout=subprocess.PIPE, text=True, errors="replace", bufsize=1,
+                               start_new_session=True)
+    expired = threading.Event()
+
+    def expire():
+        expired.set()
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    deadline = threading.Timer(timeout, expire) if timeout else None
+    if deadline is not None:
+        deadline.daemon = True
+        deadline.start()
+    try:
+        for line in process.stdout:
+            name = line.strip().lower()
+            if name:
+                yield name
+    finally:
+        if deadline is not None:
+            deadline.cancel()
+        process.stdout.close()
+        if process.wait() != 0:
+            reason = f"was stopped after {timeout:g}s" if expired.is_set() else f"exited with {process.returncode}"
+            print(f"subdomain_stream.stream_names() Warning: {command[0]} {reason} for {domain}", file=sys.stderr)
+
+
+def echo(name):
+    """ Prints name on its own line, whole lines only when several domains stream at once """
+    with _echo_lock:
+        sys.stdout.write(name + "\n")
+        sys.stdout.flush()
+
+
+def stream_subdomains(domain, output_file, command=SUBDOMAIN_COMMAND, timeout=SUBDOMAIN_TIMEOUT):
+    """ Yields the subdomains of domain as assetfinder finds them, each name once, writing them to output_file too """
+
+    seen = SeenNames()
+    with open(output_file, "w") as file_to_write:
+        for name in stream_names(domain, command, timeout):
+            if seen.add(name):
+                file_to_write.write(name + "\n")
+                yield name
+
+
+def write_subdomains(domain, output_file, on_name=echo, command=SUBDOMAIN_COMMAND, timeout=SUBDOMAIN_TIMEOUT):
+    """ Streams the subdomains of domain into output_file, each name once, and returns how many were written.
+
+    on_name :: called with every new name as it is written, None to stay quiet
+    timeout :: seconds assetfinder may run, None for no limit
+    """
+
+    count = 0
+    for name in stream_subdomains(domain, output_file, command, timeout):
+        count += 1
+        if on_name:
+            on_name(name)
+    return count
@@ -0,0 +1,212 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import contextlib
+import random
+import sys
+import threading
+import time
+
+from recon.whois_client import WhoisClient, WhoisError, rir_server
+
+# lowercase text whois servers answer with instead of the record when a client asks too fast, or is blocked for it
+THROTTLE_MARKERS = ("query limit exceeded",  # ARIN, LACNIC
+                    "limit exceeded",
+                    "too many requests",
+                    "too many queries",
+                    "quota exceeded",
+                    "access denied",  # RIPE, APNIC, AFRINIC: %ERROR:201: access denied
+                    "access control limit",  # DENIC
+                    "temporarily denied",
+                    "please try again later",
+                    "you have exceeded")
+
+# only the head of an answer is checked, a real record can mention these words further down (e.g. in remarks)
+THROTTLE_SCAN = 512
+
+# limiter key of the queries whose server the whois binary picks is not known, they share one rate limit
+UNKNOWN_SERVER = "unknown"
+
+
+def is_throttled(text):
+    """ True if a whois answer is a rate limit / block notice rather than a record """
+    head = text[:THROTTLE_SCAN].lower()
+    return any(marker in head for marker in THROTTLE_MARKERS)
+
+
+class ThrottledError(WhoisError):
+    """ Raised when a whois server kept refusing or failing a query after every retry """
+
+
+class TokenBucket:
+    """ Allows rate acquisitions per second on average, and bursts of up to burst at once """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ Takes one token, sleeping until there is one """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ServerLimiter:
+    """ Limits for one whois server: a token bucket for the query rate, and an AIMD concurrency limit that grows by
+    about one query per round of successes and halves on every throttle or failure. After either, the server
+    also gets a pause that doubles with each failure in a row, up to max_backoff. Queries waiting out the pause
+    each wait up to half of it longer at random, so they do not all hit the server again at the same moment
+    """
+
+    def __init__(self, rate, burst, max_concurrency, backoff, max_backoff=120.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.limit = min(2.0, max_concurrency)
+        self.in_flight = 0
+        self.strikes = 0  # failures in a row
+        self.paused_until = 0.0
+        self.throttles = 0
+        self._condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def slot(self):
+        """ Holds one of the server's concurrency slots, and one token, for the duration of a query """
+
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        try:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                time.sleep(pause + random.uniform(0, pause / 2))
+            self.bucket.acquire()
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def succeeded(self):
+        with self._condition:
+            self.strikes = 0
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)  # additive increase
+            self._condition.notify_all()
+
+    def failed(self, throttled=False):
+        """ A throttle notice, or a timeout / error / empty answer, which overloaded servers also produce """
+        with self._condition:
+            self.limit = max(1.0, self.limit / 2)  # multiplicative decrease
+            self.strikes += 1
+            self.paused_until = time.monotonic() + min(self.max_backoff, self.backoff * 2 ** (self.strikes - 1))
+            if throttled:
+                self.throttles += 1
+
+
+class WhoisScheduler:
+    """ Wraps a whois backend (the whois binary or a recon.whois_client.WhoisClient) with a ServerLimiter per
+    whois server. Throttle notices, errors and empty answers are retried once the server's backoff has passed,
+    so they never reach the parser or the cache. A query that still fails raises ThrottledError.
+
+    Queries are attributed to the server the backend will ask first: the registry / RIR a WhoisClient has learnt
+    for the zone. The whois binary picks its servers itself, so for it the limiting is approximate: IPv4 queries
+    go to the RIR IANA delegated their /8 to (see recon.whois_client.rir_server()) and domains to their TLD, while
+    IPv6 and anything else whose server is not known share one limiter, which rate then applies to globally.
+    Referrals the binary follows (e.g. ARIN to RIPE for transferred legacy space) count against the first server.
+
+    Callable like the backend it wraps and safe to share between worker threads.
+    """
+
+    def __init__(self, backend, rate=4.0, burst=8, max_concurrency=8, max_retries=3, backoff=5.0, max_backoff=120.0):
+        """
+        Params:
+            backend :: callable returning the raw whois text of a query
+            rate :: queries per second allowed to one server
+            burst :: queries allowed to one server at once after a quiet period
+            max_concurrency :: queries in flight to one server that the AIMD limit may grow to
+            max_retries :: retries of a throttled or failed query
+            backoff :: seconds a server is left alone after its first failure, doubled for each one in a row
+            max_backoff :: most seconds a server is left alone
+        """
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.limiters = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, query):
+        return self.query(query)
+
+    def server_for(self, query):
+        if hasattr(self.backend, "server_for"):
+            return self.backend.server_for(query)
+        zone = WhoisClient.zone_key(query)
+        if zone.startswith("tld:"):
+            return zone
+        return rir_server(query) or UNKNOWN_SERVER
+
+    def limiter(self, server):
+        with self._lock:
+            limiter = self.limiters.get(server)
+            if limiter is None:
+                limiter = self.limiters[server] = ServerLimiter(self.rate, self.burst, self.max_concurrency,
+                                                                self.backoff, self.max_backoff)
+            return limiter
+
+    def query(self, query):
+        server = self.server_for(query)
+        limiter = self.limiter(server)
+
+        problem = None
+        for attempt in range(self.max_retries + 1):
+            with limiter.slot():
+                try:
+                    text = self.backend(query)
+                except WhoisError as e:
+                    text, problem = "", str(e)
+
+            if text and not is_throttled(text):
+                limiter.succeeded()
+                return text
+
+            throttled = bool(text)
+            problem = "throttled" if throttled else problem or "empty answer"
+            limiter.failed(throttled=throttled)
+            print(f"WhoisScheduler Warning: {query} via {server}: {problem}, attempt {attempt + 1} of "
+                  f"{self.max_retries + 1}", file=sys.stderr)
+
+        raise ThrottledError(f"{query} via {server}: {problem} after {self.max_retries + 1} attempts")
+
+    def throttle_counts(self):
+        """ {server: throttle notices seen}, for the servers that sent any """
+        return {server: limiter.throttles for server, limiter in self.limiters.items() if limiter.throttles}
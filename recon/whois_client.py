@@ -0,0 +1,324 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import collections
+import concurrent.futures
+import ipaddress
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from recon import profiling
+
+WHOIS_PORT = 43
+IANA_SERVER = "whois.iana.org"
+SYSTEM_WHOIS_TIMEOUT = 30.0  # seconds the whois binary may take, referrals included
+
+# a server needs this many recent answers before a late one is hedged, and only the last HEDGE_WINDOW count
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+HEDGE_THREADS = 256  # queries in flight through send_hedged(), threads are only started when needed
+
+# servers that only answer the way we parse them when the query is decorated, same as the Linux whois client does.
+# ARIN needs "n +" to return the full network record including CustName
+QUERY_FORMATS = {"whois.arin.net": "n + {query}",
+                 "whois.verisign-grs.com": "domain {query}"}
+
+# lines that point to the next server to ask, tried in order. A port may follow the host, e.g. whois://host:4343.
+# Other schemes such as rwhois:// speak a different protocol and are not followed
+REFERRAL_PATTERNS = [re.compile(r"^\s*" + prefix +
+                                r"[ \t]*(?:whois://)?(?P<host>[^\s:/]+)(?::(?P<port>\d+))?/?[ \t\r]*$",
+                                re.IGNORECASE | re.MULTILINE)
+                     for prefix in ("refer:", "ReferralServer:", "Registrar WHOIS Server:", "Whois Server:")]
+
+# RIR whois server of each IPv4 /8 as IANA delegated it (the IANA IPv4 address space registry), legacy /8s under the
+# RIR administering them. The /8s not listed are reserved, private, loopback or multicast
+IPV4_RIR_BLOCKS = {
+    "whois.afrinic.net": "41 102 105 154 196-197",
+    "whois.apnic.net": "1 14 27 36 39 42-43 49 58-61 101 103 106 110-126 133 150 153 163 171 175 180 182-183 202-203 "
+                       "210-211 218-223",
+    "whois.arin.net": "3-4 6-9 11-13 15-24 26 28-30 32-35 38 40 44-45 47-48 50 52 54-56 63-76 96-100 104 107-108 "
+                      "128-132 134-140 142-144 146-149 152 155-162 164-170 172-174 184 192 198-199 204-209 214-216",
+    "whois.lacnic.net": "177 179 181 186-187 189-191 200-201",
+    "whois.ripe.net": "2 5 25 31 37 46 51 53 57 62 77-95 109 141 145 151 176 178 185 188 193-195 212-213 217",
+}
+
+
+def _octets(blocks):
+    """ '3-4 6' -> 3, 4, 6 """
+    for block in blocks.split():
+        first, _, last = block.partition("-")
+        yield from range(int(first), int(last or first) + 1)
+
+
+IPV4_RIR_SERVERS = {octet: host for host, blocks in IPV4_RIR_BLOCKS.items() for octet in _octets(blocks)}
+
+
+class WhoisError(Exception):
+    """ Raised when a whois server cannot be reached or does not answer in time """
+
+
+def system_whois(query, timeout=SYSTEM_WHOIS_TIMEOUT):
+    """ Default backend: the whois binary installed on the machine. Raises WhoisError when it has not finished
+    within timeout seconds, the binary is killed then
+    """
+    try:
+        return subprocess.run(['whois', query], capture_output=True, text=True, timeout=timeout).stdout
+    except subprocess.TimeoutExpired as e:
+        raise WhoisError(f"whois {query} did not finish within {timeout:g}s") from e
+
+
+def rir_server(query):
+    """ (host, port) of the RIR whois server IANA delegated the IPv4 /8 of query to. None for domains, IPv6 and
+    IPv4 space no RIR holds
+    """
+    try:
+        address = ipaddress.ip_address(query)
+    except ValueError:
+        return None
+    host = IPV4_RIR_SERVERS.get(int(address) >> 24) if address.version == 4 else None
+    return (host, WHOIS_PORT) if host else None
+
+
+def server_name(backend, query):
+    """ Name of the whois server backend asks first for query, for reports: host:port when the backend knows it (a
+    WhoisClient or recon.throttle.WhoisScheduler), otherwise the zone (see WhoisClient.zone_key())
+    """
+    server = backend.server_for(query) if hasattr(backend, "server_for") else WhoisClient.zone_key(query)
+    return "%s:%s" % server if isinstance(server, tuple) else server
+
+
+def parse_server(value, default_port=WHOIS_PORT):
+    """ 'host' or 'host:port' -> (host, port) """
+    host, _, port = value.partition(":")
+    return host, int(port) if port else default_port
+
+
+def parse_mirror(value):
+    """ 'primary=host[:port]' -> (primary host, (host, port)) """
+    primary, separator, mirror = value.partition("=")
+    if not separator or not primary or not mirror:
+        raise ValueError(f"expected PRIMARY=HOST[:PORT], got {value!r}")
+    return primary.lower(), parse_server(mirror)
+
+
+class LatencyTracker:
+    """ The last window answer times of every server, to tell when an answer is late. Safe to share between threads """
+
+    def __init__(self, window=HEDGE_WINDOW, min_samples=HEDGE_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, server, seconds):
+        with self._lock:
+            samples = self._samples.get(server)
+            if samples is None:
+                samples = self._samples[server] = collections.deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, server, fraction):
+        """ The fraction percentile of server's recent answer times, None before min_samples answers """
+        with self._lock:
+            samples = self._samples.get(server)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return profiling.percentile(ordered, fraction)
+
+
+class WhoisClient:
+    """ Pure python whois client speaking the port 43 protocol (RFC 3912).
+
+    A query starts at IANA, or at a server already learnt for the same TLD / address block, and follows
+    refer: / ReferralServer: / Registrar WHOIS Server: lines to the registry and registrar. The text of every
+    server after IANA is returned joined together, which is what the whois binary prints too.
+
+    Instances are callable so they can be used as a Whois backend, and are safe to share between worker threads.
+    """
+
+    def __init__(self, connect_timeout=5.0, read_timeout=10.0, max_referrals=3, server=None, deadline=None,
+                 mirrors=None, hedge=False):
+        """
+        Params:
+            connect_timeout :: seconds to wait for the TCP connection
+            read_timeout :: seconds to wait for each read from the server
+            max_referrals :: how many referrals to follow after the first server
+            server :: (host, port) to send every query to first instead of IANA, e.g. a local stand-in server
+            deadline :: seconds one server may take for its whole answer, connect included. None for no limit
+                        beyond the connect and read timeouts, which a server trickling its answer never reaches
+            mirrors :: {host: [(host, port)]} of servers holding the same data as host
+            hedge :: when a server has not answered within its p95 answer time, also send the query to its first
+                     mirror and use whichever answer comes first
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_referrals = max_referrals
+        self.server = server
+        self.deadline = deadline
+        self.mirrors = mirrors or {}
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self.hedged = 0  # queries sent to a mirror as well
+        self._hedge_pool = None
+
+        self._servers = {}  # zone key (see zone_key()) -> (host, port) of the registry / RIR
+        self._lock = threading.Lock()
+
+    def __call__(self, query):
+        return self.query(query)
+
+    @staticmethod
+    def zone_key(query):
+        """ Key under which the authoritative server for query is remembered: the TLD for domains, the /8 for
+        IPv4 and the /32 for IPv6 (the granularity IANA delegates at)
+        """
+        try:
+            address = ipaddress.ip_address(query)
+        except ValueError:
+            return "tld:" + query.rstrip(".").rsplit(".", 1)[-1].lower()
+
+        if address.version == 4:
+            return f"ip4:{int(address) >> 24}"
+        return f"ip6:{int(address) >> 96}"
+
+    def server_for(self, query):
+        """ The server query is sent to first: the registry / RIR learnt for its zone, else self.server or IANA """
+        with self._lock:
+            server = self._servers.get(self.zone_key(query))
+        return server or self.server or (IANA_SERVER, WHOIS_PORT)
+
+    def send(self, server, query, query_format=None):
+        """ Sends one query to server and returns the whole answer as text. Raises WhoisError when the server
+        cannot be reached, stops answering for read_timeout or takes longer than self.deadline overall
+
+        query_format :: format of the query line, defaults to the one for server's host in QUERY_FORMATS
+        """
+
+        host, port = server
+        text = (query_format or QUERY_FORMATS.get(host.lower(), "{query}")).format(query=query)
+        started = time.monotonic()
+        expires = started + self.deadline if self.deadline else None
+
+        try:
+            connect_timeout = self.connect_timeout if expires is None else min(self.connect_timeout, self.deadline)
+            with socket.create_connection((host, port), timeout=connect_timeout) as sock:
+                sock.sendall(text.encode("utf-8") + b"\r\n")
+
+                chunks = []
+                while True:
+                    if expires is not None:
+                        left = expires - time.monotonic()
+                        if left <= 0:
+                            raise WhoisError(f"{host}:{port} did not finish answering within {self.deadline:g}s")
+                        sock.settimeout(min(self.read_timeout, left))
+                    else:
+                        sock.settimeout(self.read_timeout)
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+        except OSError as e:  # includes socket.timeout and DNS failures of the server name
+            raise WhoisError(f"{host}:{port} {e}") from e
+
+        self.latency.add(server, time.monotonic() - started)
+        return b"".join(chunks).decode("utf-8", errors="replace")
+
+    def send_hedged(self, server, query):
+        """ send(), and when server has a mirror and is late by its own p95, the same query to the mirror too. The
+        first answer wins, the other one is left to finish or time out in the background
+        """
+
+        mirrors = self.mirrors.get(server[0].lower()) if self.hedge else None
+        late = self.latency.percentile(server, 0.95) if mirrors else None
+        if late is None:
+            return self.send(server, query)
+
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = concurrent.futures.ThreadPoolExecutor(HEDGE_THREADS,
+                                                                         thread_name_prefix="whois-hedge")
+        query_format = QUERY_FORMATS.get(server[0].lower())  # a mirror wants the query the way its primary does
+        primary = self._hedge_pool.submit(self.send, server, query)
+        try:
+            return primary.result(timeout=late)
+        except concurrent.futures.TimeoutError:
+            pass
+
+        with self._lock:
+            self.hedged += 1
+        backup = self._hedge_pool.submit(self.send, mirrors[0], query, query_format)
+        error = None
+        for future in concurrent.futures.as_completed((primary, backup)):
+            try:
+                return future.result()
+            except WhoisError as e:
+                error = e
+        raise error
+
+    @staticmethod
+    def referral(answer, current):
+        """ Returns the (host, port) the answer refers to, or None if it does not refer anywhere new """
+
+        for pattern in REFERRAL_PATTERNS:
+            match = pattern.search(answer)
+            if match:
+                server = (match.group("host").lower(), int(match.group("port") or WHOIS_PORT))
+                if server != current:
+                    return server
+        return None
+
+    def query(self, query):
+        """ Returns the raw whois text for query. Servers that fail are reported on stderr, and whatever was
+        collected before the failure is returned
+        """
+
+        key = self.zone_key(query)
+        with self._lock:
+            server = self._servers.get(key)
+
+        from_iana = False
+        if server is None:
+            server = self.server or (IANA_SERVER, WHOIS_PORT)
+            from_iana = self.server is None
+
+        answers = []
+        for hop in range(self.max_referrals + 1):
+            try:
+                answer = self.send_hedged(server, query)
+            except WhoisError as e:
+                print("WhoisClient.query() Warning:", e, file=sys.stderr)
+                break
+
+            next_server = self.referral(answer, server)
+
+            if hop == 0 and from_iana:
+                # IANA only says who to ask, and the registry / RIR it names is the same for the whole zone
+                if next_server is None:
+                    answers.append(answer)
+                    break
+                with self._lock:
+                    self._servers[key] = next_server
+            else:
+                answers.append(answer)
+
+            if next_server is None:
+                break
+            server = next_server
+
+        return "\n".join(answers)
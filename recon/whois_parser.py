@@ -117,3 +117,26 @@ ip_regex_dict = {"ip_cidr": ['CIDR:\s*(?P<val>.+)'],
                  "ip_city": ['City:\s*(?P<val>.+)'],
                  "ip_country": ['country:\s*(?P<val>.+)'],
                  "ip_custname": ['CustName:\s*(?P<val>.+)']}  # only appears if running whois on Kali not MacOS
+
+# Registry specific patterns. recon.parser_engine only tries these when fingerprint() recognised the registry format
+# of the response (or could not recognise any format at all), every other pattern is tried on every response
+format_specific_patterns = {"g\. \[Organization\]               (?P<organization>.+)\n": "jprs",
+                            "    Registrant:\n        (?P<name>.+)\n\n    Registrant type:\n        .*\n\n    Registrant's address:\n        The registrant .* opted to have": "nominet",
+                            "owner:\s+(?P<name>.+)": "br",
+                            "person:\s+(?P<name>.+)": ("br", "ru"),  # .br names its registrant contact person too
+                            "org:\s+(?P<organization>.+)": "ru"}
+
+# Fingerprints of the response formats: lowercase text that only shows up in answers of that registry. A response
+# holding the answers of several servers (registry + registrar, ARIN + RIPE) can match more than one
+format_signatures = {"arin": ("arin whois data", "american registry for internet numbers", "netrange:"),
+                     "ripe": ("ripe network coordination centre", "ripe database"),
+                     "apnic": ("asia pacific network information centre", "whois.apnic.net"),
+                     "lacnic": ("lacnic",),
+                     "afrinic": ("afrinic",),
+                     "verisign": ("verisign global registry services", "whois.verisign-grs.com"),
+                     "icann": ("registry domain id:",),
+                     "nominet": ("nominet", "registrant type:"),
+                     "jprs": ("jprs",),
+                     "au": ("auda", "eligibility type:"),
+                     "br": ("registro.br", "nic.br"),
+                     "ru": ("ripn", "tcinet.ru")}
@@ -13,7 +13,7 @@ DM22-0416
 """
 
 from setuptools import find_packages, setup
-REQUIRED = ["argparse", "dnspython"]
+REQUIRED = ["argparse", "dnspython>=2.4"]  # dns.nameserver.Do53Nameserver
 
 setup(
     name='recon',
@@ -26,11 +26,18 @@ setup(
     },
     install_requires=REQUIRED,
     include_package_data=True,
+    package_data={'recon': ['data/*.dat']},
     license='MIT',
+    python_requires='>=3.7',
     classifiers=[
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
 
 
@@ -0,0 +1,63 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import contextlib
+import ipaddress
+import socket
+
+import pytest
+
+from benchmarks import stand_ins
+from recon import bulk_whois
+from recon.whois_client import WhoisError
+
+
+@contextlib.contextmanager
+def bulk_stand_in():
+    server = stand_ins.BulkWhoisStandIn(stand_ins.Behaviour(latency=0.0, jitter=0.0))
+    port = stand_ins.serve(server)
+    try:
+        yield server, ("127.0.0.1", port)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_answers_come_back_in_order_over_one_connection(capsys):
+    ips = ["8.8.8.8", "not-an-ip", "10.1.2.3", "2001:db8::1", "193.0.6.139"]
+    with bulk_stand_in() as (server, address):
+        answers = list(bulk_whois.BulkWhois(server=address).lookup(ips))
+        assert (server.connections.value, server.queries.value) == (1, 4)
+
+    assert answers == [(ip, bulk_whois.parse_answer(stand_ins.bulk_answer(ip)))
+                       for ip in ("8.8.8.8", "10.1.2.3", "2001:db8::1", "193.0.6.139")]
+    assert answers[0][1].prefix == "8.8.8.0/24" and answers[0][1].as_name.startswith("EXAMPLE-AS-")
+    assert answers[1][1] == bulk_whois.BulkAnswer(None, "10.1.2.3", None, None, "other", None, None)  # unrouted
+    assert "not-an-ip is not an IP, skipped" in capsys.readouterr().err
+
+
+def test_long_lists_stream_while_they_are_sent():
+    ips = [str(ipaddress.IPv4Address("198.51.0.0") + i) for i in range(5000)]
+    with bulk_stand_in() as (_, address):
+        answers = bulk_whois.BulkWhois(server=address).lookup(iter(ips))
+        assert [ip for ip, answer in answers if answer is not None] == ips
+
+
+def test_unreachable_server_raises():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        closed = unused.getsockname()[1]
+
+    with pytest.raises(WhoisError):
+        list(bulk_whois.BulkWhois(server=("127.0.0.1", closed), connect_timeout=1.0).lookup(["8.8.8.8"]))
@@ -0,0 +1,70 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import sys
+import threading
+
+import pytest
+
+from recon import recon
+from recon import throttle
+
+
+def run(monkeypatch, tmp_path, *argv):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["recon", "T1", *argv, "--no-cache"])
+    return recon.main()
+
+
+@pytest.mark.parametrize("argv", [("verify_ip", "-i", "8.8.8.8"), ("verify_domain", "-d", "example.com")])
+def test_single_query_whois_failure_ends_with_a_message(monkeypatch, tmp_path, capsys, argv):
+    def throttled(whois_query, **kwargs):
+        raise throttle.ThrottledError(f"{whois_query} via ('whois.arin.net', 43): timed out after 4 attempts")
+
+    monkeypatch.setattr(recon.who, "Whois", throttled)
+    assert run(monkeypatch, tmp_path, *argv) == 1
+    assert "Whois failed:" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("flags, reused", [((), False), (("--netblock-reuse",), True)])
+def test_netblock_reuse_is_opt_in(monkeypatch, tmp_path, flags, reused):
+    seen = {}
+
+    def capture(whois_query, **kwargs):
+        seen.update(kwargs)
+        raise throttle.ThrottledError("stop here")
+
+    monkeypatch.setattr(recon.who, "Whois", capture)
+    run(monkeypatch, tmp_path, "verify_ip", "-i", "192.0.2.1", *flags)
+    assert (seen.get("netblocks") is not None) == reused
+
+
+def test_bulk_scope_reads_the_scope_in_chunks_on_the_callers_thread(monkeypatch):
+    monkeypatch.setattr(recon, "BULK_WHOIS_CHUNK", 2)
+    readers, chunks, answers = set(), [], {}
+
+    def scope():
+        for last in range(1, 6):
+            readers.add(threading.get_ident())
+            yield f"192.0.2.{last}"
+
+    class Bulk:
+        def lookup(self, ips):
+            chunks.append(ips)
+            return ((ip, f"answer {ip}") for ip in ips)
+
+    for ip in recon.bulk_scope(Bulk(), scope(), answers):
+        assert answers.pop(ip) == f"answer {ip}"
+    assert chunks == [["192.0.2.1", "192.0.2.2"], ["192.0.2.3", "192.0.2.4"], ["192.0.2.5"]]
+    assert readers == {threading.get_ident()}
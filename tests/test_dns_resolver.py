@@ -0,0 +1,89 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import contextlib
+import time
+
+import pytest
+
+from benchmarks import stand_ins
+from recon import dns_resolver
+
+
+def test_cached_batch_looks_each_entry_up_once(monkeypatch):
+    resolver = dns_resolver.DnsResolver(nameservers=[("127.0.0.1", 9)])
+    resolver.remember("example.com", "A", ("192.0.2.1",), 60)
+    resolver.remember("example.com", "AAAA", (), 60)
+
+    lookups = []
+    cached = resolver.cached
+
+    def counting(name, rdtype):
+        lookups.append((name, rdtype))
+        return cached(name, rdtype)
+
+    monkeypatch.setattr(resolver, "cached", counting)
+    assert resolver.resolve([("example.com", "A"), ("example.com", "AAAA")]) == [("192.0.2.1",), ()]
+    assert lookups == [("example.com", "A"), ("example.com", "AAAA")]
+
+
+def test_addresses_are_ipv4_only_unless_asked():
+    for rdtypes, expected in ((("A",), ["192.0.2.1"]), (("A", "AAAA"), ["192.0.2.1", "2001:db8::1"])):
+        resolver = dns_resolver.DnsResolver(nameservers=[("127.0.0.1", 9)], rdtypes=rdtypes)
+        resolver.remember("example.com", "A", ("192.0.2.1",), 60)
+        resolver.remember("example.com", "AAAA", ("2001:db8::1",), 60)
+        assert resolver.addresses("example.com") == expected
+
+
+class Clock:
+    """ time for recon.dns_resolver, moved forward by hand """
+
+    def __init__(self):
+        self.offset = 0
+
+    def time(self):
+        return time.time() + self.offset
+
+
+@contextlib.contextmanager
+def dns_stand_in():
+    server = stand_ins.DnsStandIn(stand_ins.Behaviour(latency=0.0, jitter=0.0), nx_rate=0.0)
+    port = stand_ins.serve(server)
+    try:
+        yield server, port
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("name, rdtype, ttl", [("www.example.com", "A", 300),  # the record TTL
+                                               ("nx.example.com", "A", 120),  # NXDOMAIN, the SOA minimum
+                                               ("www.example.com", "AAAA", 120)])  # NODATA, the SOA minimum
+def test_answers_are_remembered_for_their_ttl(monkeypatch, name, rdtype, ttl):
+    clock = Clock()
+    monkeypatch.setattr(dns_resolver, "time", clock)
+
+    with dns_stand_in() as (server, port):
+        resolver = dns_resolver.DnsResolver(nameservers=[("127.0.0.1", port)])
+        first = resolver.resolve([(name, rdtype)])
+        assert sorted(first[0]) == (sorted(server.addresses(name)) if ttl == 300 else [])
+        assert server.queries.value == 1
+
+        clock.offset = ttl - 5
+        assert resolver.resolve([(name, rdtype)]) == first
+        assert server.queries.value == 1
+
+        clock.offset = ttl + 5
+        assert resolver.resolve([(name, rdtype)]) == first
+        assert server.queries.value == 2
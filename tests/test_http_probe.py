@@ -0,0 +1,63 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import socket
+
+import pytest
+
+from benchmarks import stand_ins
+from recon import http_probe
+
+ADDRESSES = [f"127.0.0.{last}" for last in range(1, 21)]
+
+
+@pytest.fixture(scope="module")
+def stand_in(tmp_path_factory):
+    behaviour = stand_ins.Behaviour(latency=0.0, jitter=0.0, hang_rate=0.2, hang_seconds=2.0)
+    return stand_ins.HttpStandIn(behaviour, stand_ins.self_signed_context(str(tmp_path_factory.mktemp("tls")))).start()
+
+
+def expected(stand_in, address):
+    if stand_in.behaviour.hangs(address):
+        return None
+    return stand_ins.STATUS_CODES[stand_ins.name_hash(address) % len(stand_ins.STATUS_CODES)]
+
+
+def test_status_codes_come_back_in_input_order(stand_in):
+    prober = http_probe.HttpProber(timeout=0.5, ports={"http": stand_in.http_port})
+    assert any(stand_in.behaviour.hangs(address) for address in ADDRESSES)
+
+    assert prober.probe(f"http://{address}/" for address in ADDRESSES) == [expected(stand_in, address)
+                                                                           for address in ADDRESSES]
+
+
+def test_https_ignores_the_self_signed_certificate(stand_in):
+    if stand_in.https_port is None:
+        pytest.skip("openssl is not installed")
+    prober = http_probe.HttpProber(timeout=0.5, ports={"https": stand_in.https_port})
+    address = next(address for address in ADDRESSES if not stand_in.behaviour.hangs(address))
+
+    assert prober.probe([f"https://{address}/"]) == [expected(stand_in, address)]
+
+
+def test_closed_port_is_skipped_without_a_request(stand_in):
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        closed = unused.getsockname()[1]
+    prober = http_probe.HttpProber(timeout=0.5, ports={"http": stand_in.http_port})
+    before = stand_in.requests.value
+
+    statuses = prober.probe([f"http://127.0.0.1:{closed}/", "http://127.0.0.1/"])
+    assert statuses == [None, expected(stand_in, "127.0.0.1")]
+    assert stand_in.requests.value == before + 1
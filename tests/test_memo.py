@@ -0,0 +1,79 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import os
+
+from recon import memo
+from recon.Whois import Whois
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures", "whois")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fixture_file:
+        return fixture_file.read()
+
+
+class StubResolver:
+    def addresses(self, name):
+        return ["198.51.100.7"]
+
+    def reverse(self, ip):
+        return None
+
+
+def stored(single_flight, key):
+    def missing():
+        raise AssertionError(f"{key} is not in the memo")
+    return single_flight.get(key, missing)
+
+
+def deferred(query, backend, **options):
+    return Whois(whois_query=query, defer=True, backend=backend, resolver=StubResolver(), **options)
+
+
+def test_memo_holds_parsed_fields_not_raw_text():
+    answers = {"198.51.100.7": fixture("arin.ip.txt"), "example.com": fixture("verisign.domain.txt")}
+    calls = []
+
+    def backend(query):
+        calls.append(query)
+        return answers[query]
+
+    ip_memo, domain_memo = memo.SingleFlight(), memo.SingleFlight()
+    first = deferred("example.com", backend, ip_memo=ip_memo, domain_memo=domain_memo).fetch().parse()
+
+    for single_flight, key in ((ip_memo, "198.51.100.7"), (domain_memo, "example.com")):
+        value = stored(single_flight, key)
+        assert isinstance(value, dict)
+        assert "raw" not in value
+
+    # a later domain on the same IP and apex gets the parsed fields, without a whois or a parse
+    second = deferred("example.com", backend, ip_memo=ip_memo, domain_memo=domain_memo).fetch()
+    assert not second.unparsed
+    assert calls == ["example.com", "198.51.100.7"]
+    assert second.parse().record() == first.record()
+
+
+def test_memo_keeps_raw_text_for_keep_raw():
+    def backend(query):
+        return fixture("arin.ip.txt")
+
+    ip_memo = memo.SingleFlight()
+    deferred("198.51.100.7", backend, ip_memo=ip_memo, keep_raw=True).fetch().parse()
+
+    value = stored(ip_memo, "198.51.100.7")
+    assert isinstance(value, dict) and value["raw"] == fixture("arin.ip.txt")
+    again = deferred("198.51.100.7", backend, ip_memo=ip_memo, keep_raw=True).fetch()
+    assert again.record(keep_raw=True).raw_ip_whois == fixture("arin.ip.txt")
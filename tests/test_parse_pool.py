@@ -0,0 +1,43 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import os
+
+from recon import parse_pool
+from recon import profiling
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures", "whois")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fixture_file:
+        return fixture_file.read()
+
+
+def test_worker_parse_timings_reach_the_profiler():
+    jobs = [("example.com", [("domain", fixture("verisign.domain.txt")), ("ip", fixture("arin.ip.txt"))]),
+            ("example.net", [("ip", fixture("ripe.ip.txt"))])]
+
+    profiler = profiling.enable()
+    try:
+        with parse_pool.ParsePool(processes=1, chunk_size=1) as pool:
+            results = list(pool.map(jobs))
+    finally:
+        profiling.disable()
+
+    assert [payload for payload, parsed in results] == ["example.com", "example.net"]
+    assert results[0][1] == parse_pool.parse_texts(jobs[0][1])
+    stages = profiler.summary()["stages"]
+    assert stages["parse_domain"]["count"] == 1
+    assert stages["parse_ip"]["count"] == 2
@@ -0,0 +1,66 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import os
+
+import pytest
+
+from recon import parser_engine
+from recon.Whois import Whois
+from recon.whois_parser import domain_regex_dict, ip_regex_dict
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures", "whois")
+
+# <name>.domain.txt / <name>.ip.txt -> fields, pattern lists and parser for that kind of answer
+KINDS = {"domain": (parser_engine.DOMAIN_FIELDS, domain_regex_dict, parser_engine.parse_domain_whois),
+         "ip": (parser_engine.IP_FIELDS, ip_regex_dict, parser_engine.parse_ip_whois)}
+
+
+@pytest.mark.parametrize("name", sorted(os.listdir(FIXTURES)))
+def test_engine_matches_baseline_regex_path(name):
+    """ Fingerprinting and literal prefixes only skip patterns that cannot match, every recorded answer parses to
+    what running each pattern list through Whois.whois_regex_process() gives
+    """
+
+    fields, regex_dict, parse = KINDS[name.split(".")[-2]]
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fixture_file:
+        text = fixture_file.read()
+
+    parsed = parse(text)
+    for attribute, key in fields.items():
+        baseline = Whois.whois_regex_process(regex_dict[key], text) if text else None
+        assert parsed[attribute] == baseline, attribute
+
+
+def test_br_registrant_person_is_kept():
+    with open(os.path.join(FIXTURES, "br.domain.txt"), encoding="utf-8") as fixture_file:
+        parsed = parser_engine.parse_domain_whois(fixture_file.read())
+    assert "exemplo ltda" in parsed["registrant_organization"]
+
+
+@pytest.mark.parametrize("source, prefix", [("registrar:\\s*(?P<val>.+)", "registrar:"),
+                                            ("owner|holder:\\s*(?P<val>.+)", ""),
+                                            ("(?:owner|holder):\\s*(?P<val>.+)", ""),
+                                            ("(?:owner):\\s*(?P<val>.+)|holder:\\s*(?P<val2>.+)", ""),
+                                            ("org(?:anization|anisation):\\s*(?P<val>.+)", "org"),
+                                            ("name[|]server:\\s*(?P<val>.+)", "name"),
+                                            ("name\\|server:\\s*(?P<val>.+)", "name|server:")])
+def test_literal_prefix(source, prefix):
+    assert parser_engine.literal_prefix(source) == prefix
+
+
+def test_top_level_alternative_is_not_skipped():
+    patterns = [parser_engine.CompiledPattern("(?:Owner Name|Holder):\\s*(?P<val>.+)")]
+    text = "Holder: Example Ltd\n"
+    assert parser_engine.extract(patterns, text, lowered=text.lower()) == {"example ltd"}
@@ -0,0 +1,46 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import ipaddress
+
+from recon import range_plan
+from recon.Whois import WhoisRecord, Whois
+
+
+def allocation(first, last):
+    return WhoisRecord(raw_ip_whois=f"NetRange:       {first} - {last}\n", ip_cidr=Whois.Set())
+
+
+def test_cache_hits_do_not_count_against_max_queries():
+    # four /26 allocations, the first three already in the cache
+    answers = {f"192.0.2.{start}": (allocation(f"192.0.2.{start}", f"192.0.2.{start + 63}"), start == 192)
+               for start in (0, 64, 128, 192)}
+
+    blocks = list(range_plan.walk_range(ipaddress.ip_address("192.0.2.0"), ipaddress.ip_address("192.0.2.255"),
+                                        answers.__getitem__, max_queries=1))
+
+    assert [(block.first, block.last, block.fetched) for block in blocks] == [
+        ("192.0.2.0", "192.0.2.63", False), ("192.0.2.64", "192.0.2.127", False),
+        ("192.0.2.128", "192.0.2.191", False), ("192.0.2.192", "192.0.2.255", True)]
+
+
+def test_budget_stops_at_fetched_answers():
+    def lookup(address):
+        return allocation(address, address), True  # every answer covers one address and came from the network
+
+    blocks = list(range_plan.walk_range(ipaddress.ip_address("192.0.2.0"), ipaddress.ip_address("192.0.2.9"),
+                                        lookup, max_queries=3))
+
+    assert [block.fetched for block in blocks] == [True, True, True, False]
+    assert (blocks[-1].first, blocks[-1].last, blocks[-1].whois) == ("192.0.2.3", "192.0.2.9", None)
@@ -0,0 +1,48 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+from recon.rir_stats import CountryIndex
+
+
+def build(tmp_path, *records):
+    stats = tmp_path / "delegated-test"
+    stats.write_text("".join(f"{record}\n" for record in records), encoding="utf-8")
+    return CountryIndex.build([str(stats)])
+
+
+def test_allocation_nested_in_reserved_block_splits_it(tmp_path):
+    index = build(tmp_path,
+                  "arin||ipv4|10.0.0.0|65536|20100101|reserved",
+                  "arin|US|ipv4|10.0.5.0|256|20120101|allocated")
+
+    inside = index.lookup("10.0.5.77")
+    assert (inside.country, inside.status) == ("US", "allocated")
+    assert index.lookup("10.0.4.255").status == "reserved"
+    assert index.lookup("10.0.6.0").status == "reserved"
+    assert index.lookup("10.0.0.0").status == "reserved"
+    assert index.lookup("10.0.255.255").status == "reserved"
+    assert len(index) == 3
+
+
+def test_allocations_keep_their_own_ranges_inside_available_space(tmp_path):
+    index = build(tmp_path,
+                  "ripencc||ipv4|192.0.0.0|1024|20100101|available",
+                  "ripencc|DE|ipv4|192.0.0.0|256|20110101|allocated",
+                  "ripencc|FR|ipv4|192.0.2.0|256|20120101|assigned")
+
+    assert index.lookup("192.0.0.1").country == "DE"
+    assert index.lookup("192.0.1.1").status == "available"
+    assert index.lookup("192.0.2.1").country == "FR"
+    assert index.lookup("192.0.3.255").status == "available"
+    assert index.lookup("192.0.4.0") is None
@@ -0,0 +1,75 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+from recon import journal
+from recon import sinks
+
+
+def test_journal_mark_lands_in_the_flush_of_its_rows(tmp_path):
+    run_journal = journal.Journal(str(tmp_path / "journal.txt"))
+    sink = sinks.open_sink("jsonl", str(tmp_path / "out"), ["domain", "ip"], flush_every=2, flush_interval=3600)
+    sink.on_flush(run_journal.flush)
+
+    # the second row fills the buffer, the flush it triggers must carry the mark too
+    sink.write_many([["example.com", "192.0.2.1"], ["example.com", "192.0.2.2"]],
+                    on_written=lambda: run_journal.mark("example.com"))
+
+    assert len((tmp_path / "out.jsonl").read_text().splitlines()) == 2
+    assert (tmp_path / "journal.txt").read_text().splitlines() == ["example.com"]
+
+    sink.close()
+    run_journal.close()
+
+
+def test_open_sink_truncates(tmp_path):
+    for rows in (3, 1):
+        with sinks.open_sink("csv", str(tmp_path / "out"), ["ip"], truncate=True) as sink:
+            for row in range(rows):
+                sink.write([f"192.0.2.{row}"])
+    assert (tmp_path / "out.csv").read_text().splitlines() == ["ip", "192.0.2.0"]
+
+
+def test_signal_during_write_leaves_the_final_flush_to_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(sinks, "_exiting", False)
+    sink = sinks.open_sink("jsonl", str(tmp_path / "out"), ["ip"], flush_every=10, flush_interval=3600)
+    flushed = []
+    sink.on_flush(lambda: flushed.append(len(sink._buffer)))
+
+    def interrupted():  # the handler running in the middle of a write, with the sink lock held
+        try:
+            sinks._flush_and_exit(15, None)
+        except SystemExit as e:
+            assert e.code == 128 + 15
+        else:
+            raise AssertionError("the handler did not exit")
+
+    sink.write_many([["192.0.2.1"]], on_written=interrupted)
+    assert flushed == []  # the busy sink was not flushed again from inside the write
+
+    sink.write(["192.0.2.2"])
+    sink.close()
+    assert len((tmp_path / "out.jsonl").read_text().splitlines()) == 2
+
+
+def test_signal_flushes_idle_sinks(tmp_path, monkeypatch):
+    monkeypatch.setattr(sinks, "_exiting", False)
+    sink = sinks.open_sink("jsonl", str(tmp_path / "out"), ["ip"], flush_every=10, flush_interval=3600)
+    sink.write(["192.0.2.1"])
+
+    try:
+        sinks._flush_and_exit(15, None)
+    except SystemExit:
+        pass
+    assert len((tmp_path / "out.jsonl").read_text().splitlines()) == 1
+    sink.close()
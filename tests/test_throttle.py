@@ -0,0 +1,33 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+from recon import throttle
+from recon import whois_client
+
+
+def test_system_backend_is_limited_per_rir():
+    scheduler = throttle.WhoisScheduler(whois_client.system_whois)
+
+    # different /8s of one RIR share its limiter
+    assert scheduler.server_for("8.8.8.8") == scheduler.server_for("216.58.192.1") == ("whois.arin.net", 43)
+    assert scheduler.server_for("193.0.6.139") == ("whois.ripe.net", 43)
+    assert scheduler.server_for("example.com") == "tld:com"
+    assert scheduler.server_for("2001:db8::1") == scheduler.server_for("10.0.0.1") == throttle.UNKNOWN_SERVER
+
+
+def test_every_public_ipv4_slash8_has_one_rir():
+    public = set(range(1, 224)) - {10, 127}
+    assert set(whois_client.IPV4_RIR_SERVERS) == public
+    assert sum(len(list(whois_client._octets(blocks))) for blocks in whois_client.IPV4_RIR_BLOCKS.values()) == \
+        len(public)
@@ -0,0 +1,69 @@
+"""
+Scope Validation Tool v1.2.0
+
+Copyright 2022 Scope Validation Tool Contributors, All Rights Reserved
+
+License-Identifier: MIT (SEI)-style
+
+Please see additional acknowledgments (including references to third party source code, object code, documentation and other files) in the license.txt file or contact permission@sei.cmu.edu for full terms.
+
+Created, in part, with funding and support from the United States Government. (see Acknowledgments file).
+
+DM22-0416
+"""
+
+import contextlib
+import time
+
+from benchmarks import stand_ins
+from recon import whois_client
+
+
+@contextlib.contextmanager
+def whois_stand_in(behaviour=None, handler=None):
+    server = stand_ins.WhoisStandIn(behaviour or stand_ins.Behaviour(latency=0.0, jitter=0.0))
+    if handler is not None:
+        server.RequestHandlerClass = handler
+    port = stand_ins.serve(server)
+    try:
+        yield server, ("127.0.0.1", port)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_referral_is_followed_and_answers_joined():
+    with whois_stand_in() as (registrar, registrar_address):
+        class ReferringHandler(stand_ins.WhoisHandler):
+            def handle(self):
+                self.wfile.write(f"ReferralServer:  whois://127.0.0.1:{registrar_address[1]}\n".encode())
+                super().handle()
+
+        with whois_stand_in(handler=ReferringHandler) as (registry, registry_address):
+            answer = whois_client.WhoisClient(server=registry_address).query("192.0.2.1")
+
+    assert answer.count("NetRange:       192.0.2.0 - 192.0.2.255") == 2
+    assert registry.queries.value == registrar.queries.value == 1
+
+
+def test_deadline_ends_a_server_that_never_answers(capsys):
+    with whois_stand_in(stand_ins.Behaviour(hang_rate=1.0, hang_seconds=2.0)) as (_, address):
+        client = whois_client.WhoisClient(server=address, read_timeout=10.0, deadline=0.3)
+        started = time.monotonic()
+        assert client.query("192.0.2.1") == ""
+        assert time.monotonic() - started < 1.5
+
+    assert "WhoisClient.query() Warning: 127.0.0.1" in capsys.readouterr().err
+
+
+def test_late_answer_is_hedged_to_the_mirror():
+    with whois_stand_in(stand_ins.Behaviour(hang_rate=1.0, hang_seconds=1.0)) as (_, primary), \
+            whois_stand_in() as (mirror, mirror_address):
+        client = whois_client.WhoisClient(server=primary, read_timeout=1.0, mirrors={"127.0.0.1": [mirror_address]},
+                                          hedge=True)
+        for _ in range(whois_client.HEDGE_MIN_SAMPLES):
+            client.latency.add(primary, 0.05)  # the primary usually answers in 50ms
+
+        assert "CIDR:           192.0.2.0/24" in client.query("192.0.2.1")
+        assert client.hedged == 1
+        assert mirror.queries.value == 1